@@ -1,60 +1,138 @@
 # app/__init__.py
 
-from flask import Flask
+from flask import Flask, jsonify
 import os
-import json
+from .logging_setup import configure_logging
+from .metrics import init_metrics
 from .ml_engine.meal_planner import MealPlanner
-from .models import db
+from .ml_engine.plan_cache import RankingCache
+from .ml_engine.plan_optimizer import PlanOptimizer
+from .ml_engine.item_recommender import ItemRecommender
+from .engine_reloader import EngineReloader
+from .plan_jobs import PlanJobQueue
+from .auth import AuthError, ProfileCache, LoginRateLimiter, load_or_create_secret_key
+from .db_config import configure_database, init_engine, WriteBehindBatcher
+from .restaurant_catalog import catalog_for
+from .models import db, dedupe_reviews, ensure_indexes, backfill_menu_ratings, menu_rating_totals
 
-menu_reviews_db = {}
-restaurants_data_list = []
-users_db = {} 
-
-def load_processed_restaurants(data_path):
-    try:
-        with open(data_path, 'r', encoding='utf-8') as f: raw_data = json.load(f)
-        processed_restaurants = [{"id": i + 1, "nama_warung": r.get('nama_restoran'), "rating": r.get('rating'), "kategori": "Umum", "koordinat": {"latitude": r.get('latitude'), "longitude": r.get('longitude')}} for i, r in enumerate(raw_data)]
-        return processed_restaurants
-    except Exception as e:
-        print(f"ERROR saat memuat data restoran untuk API: {e}"); return []
-
-def create_app():
+# `config`: override app.config (mis. SQLALCHEMY_DATABASE_URI / MEAL_PLANNER_DATA_PATH untuk benchmark)
+def create_app(config=None):
     app = Flask(__name__)
+    logger = configure_logging(app)
+    init_metrics(app)
 
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(base_dir, 'kosankenyang.db')
+    # DATABASE_URL: engine alternatif (mis. postgresql://...); default file SQLite di direktori backend
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(base_dir, 'kosankenyang.db'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    # Kunci HMAC token login; wajib sama di semua worker (tanpa env: file SECRET_KEY_FILE, hanya satu mesin)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+    app.config['SECRET_KEY_FILE'] = os.environ.get('SECRET_KEY_FILE', os.path.join(base_dir, 'data', '.secret_key'))
+    # Usang: akses route hanya dengan parameter email tanpa Bearer token (klien lama)
+    app.config['ALLOW_EMAIL_AUTH'] = os.environ.get('ALLOW_EMAIL_AUTH', '0') in ('1', 'true')
+    app.config['AUTH_TOKEN_TTL'] = int(os.environ.get('AUTH_TOKEN_TTL', 30 * 24 * 3600))
+    # Mode default generate meal plan ('greedy' / 'optimal'); bisa dioverride per request lewat field `mode`
+    app.config['PLANNER_MODE'] = os.environ.get('PLANNER_MODE', 'greedy')
+    app.config['MEAL_PLANNER_DATA_PATH'] = os.environ.get('MEAL_PLANNER_DATA_PATH', os.path.join(base_dir, 'data', 'dataset_restoran_sidoarjo_enriched.json'))
+    # Model rekomendasi hasil train_recommender.py (tanpa model: /recommendations memakai fallback populer)
+    app.config['RECOMMENDER_MODEL_DIR'] = os.environ.get('RECOMMENDER_MODEL_DIR', os.path.join(base_dir, 'data', '.recommender'))
+    if config:
+        app.config.update(config)
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = load_or_create_secret_key(app.config['SECRET_KEY_FILE'])
+        logger.warning("SECRET_KEY tidak diset: memakai kunci dari %s (hanya berlaku untuk worker di mesin ini).", app.config['SECRET_KEY_FILE'])
+    app.config['PROFILE_CACHE'] = ProfileCache(maxsize=int(os.environ.get('PROFILE_CACHE_SIZE', 1024)), ttl=float(os.environ.get('PROFILE_CACHE_TTL', 60)),
+                                               check_interval=float(os.environ.get('PROFILE_CACHE_CHECK_INTERVAL', 1)))
+    app.config['LOGIN_RATE_LIMITER'] = LoginRateLimiter(max_failures=int(os.environ.get('LOGIN_MAX_FAILURES', 5)),
+                                                        max_failures_ip=int(os.environ.get('LOGIN_MAX_FAILURES_IP', 30)),
+                                                        window=float(os.environ.get('LOGIN_RATE_WINDOW', 300)))
+    configure_database(app)
     db.init_app(app)
 
+    @app.errorhandler(AuthError)
+    def handle_auth_error(e):
+        return jsonify({"status": "error", "message": e.message}), e.status
+
     try:
-        data_path = os.path.join(base_dir, 'data', 'dataset_restoran_sidoarjo_enriched.json')
-        app.config['MEAL_PLANNER_ENGINE'] = MealPlanner(data_path=data_path)
-        global restaurants_data_list
-        restaurants_data_list = load_processed_restaurants(data_path)
+        data_path = app.config['MEAL_PLANNER_DATA_PATH']
+        # Snapshot engine (frame olahan + TF-IDF) agar worker baru tidak membangun ulang; kosongkan env untuk menonaktifkan
+        snapshot_dir = os.environ.get('MEAL_PLANNER_SNAPSHOT_DIR', os.path.join(base_dir, 'data', '.snapshot')) or None
+        # Opsional: direktori (mis. /dev/shm/kosankenyang) untuk berbagi array engine antar worker via mmap
+        shared_dir = os.environ.get('MEAL_PLANNER_SHARED_DIR') or None
+        ranking_cache = RankingCache(maxsize=int(os.environ.get('PLANNER_CACHE_SIZE', 4096)), ttl=float(os.environ.get('PLANNER_CACHE_TTL', 600)))
+        # Bobot skor rating menu (rata-rata Bayesian ulasan + rating restoran) di samping w_taste/w_calorie
+        w_rating = float(os.environ.get('PLANNER_W_RATING', 0.2))
+        rating_prior_weight = float(os.environ.get('PLANNER_RATING_PRIOR_WEIGHT', 5))
+        optimizer = PlanOptimizer(top_k=int(os.environ.get('PLANNER_OPTIMIZER_TOP_K', 8)), beam_width=int(os.environ.get('PLANNER_OPTIMIZER_BEAM', 32)),
+                                  time_limit_ms=float(os.environ.get('PLANNER_OPTIMIZER_TIME_LIMIT_MS', 50)))
+        # Dipakai juga oleh proses worker PlanJobQueue untuk membangun engine yang sama
+        engine_kwargs = dict(snapshot_dir=snapshot_dir, shared_dir=shared_dir, max_pelengkap=int(os.environ.get('PLANNER_MAX_COMPLEMENTS', 1)),
+                             optimizer=optimizer, w_rating=w_rating, rating_prior_weight=rating_prior_weight)
+        app.config['MEAL_PLANNER_ENGINE'] = MealPlanner(data_path=data_path, ranking_cache=ranking_cache, **engine_kwargs)
     except Exception as e:
-        print(f"FATAL ERROR: Gagal memuat Meal Planner Engine: {e}"); exit()
+        logger.critical("Gagal memuat Meal Planner Engine: %s", e, exc_info=True); exit()
+
+    app.config['RECOMMENDER_MODEL'] = ItemRecommender.load(app.config['RECOMMENDER_MODEL_DIR'])
+    # Payload /restaurants di-encode (dan dikompres) sekali; setelah reload dibangun ulang saat request pertama
+    catalog_for(app)
+
+    engine_reloader = EngineReloader(app, snapshot_dir=snapshot_dir, shared_dir=shared_dir)
+    # POST /generate-meal-plan?async=1: process pool terpisah, nonaktif secara default. Pool dibuat per
+    # proses aplikasi (N worker gunicorn x PLAN_JOB_WORKERS proses engine); status job disimpan di tabel
+    # PlanJob, lihat PlanJobQueue.
+    plan_job_workers = int(os.environ.get('PLAN_JOB_WORKERS', 0))
+    plan_jobs = PlanJobQueue(app, engine_kwargs, max_workers=plan_job_workers, max_pending=int(os.environ.get('PLAN_JOB_MAX_PENDING', 32)),
+                             result_ttl=float(os.environ.get('PLAN_JOB_RESULT_TTL', 600))) if plan_job_workers > 0 else None
+    reload_interval = float(os.environ.get('DATASET_RELOAD_INTERVAL', 0))
+    if reload_interval > 0:
+        engine_reloader.start_watcher(reload_interval)
+
+    # Opsional: INSERT pengeluaran & ulasan digabung per DB_WRITE_BEHIND_MS ke satu transaksi
+    app.config['WRITE_BATCHER'] = None
+    if os.environ.get('DB_WRITE_BEHIND', '0') in ('1', 'true'):
+        app.config['WRITE_BATCHER'] = WriteBehindBatcher(app, flush_interval=float(os.environ.get('DB_WRITE_BEHIND_MS', 200)) / 1000,
+                                                         max_batch=int(os.environ.get('DB_WRITE_BEHIND_MAX_BATCH', 500)))
 
     with app.app_context():
+        init_engine(app)
         db.create_all() 
+        dedupe_reviews()
+        ensure_indexes()
+        backfill_menu_ratings()
+        app.config['MEAL_PLANNER_ENGINE'].menu_ratings.load(menu_rating_totals())
+
+    # Ulasan yang masuk lewat worker lain (dan model rekomendasi baru) hanya terlihat lewat refresh berkala
+    rating_refresh_interval = float(os.environ.get('RATING_REFRESH_INTERVAL', 300))
+    if rating_refresh_interval > 0:
+        engine_reloader.start_refresher(rating_refresh_interval)
+
+    with app.app_context():
 
         from .routes.auth_routes import create_auth_blueprint
         from .routes.meal_plan_routes import create_meal_plan_blueprint
         from .routes.resto_routes import create_resto_blueprint
         from .routes.recommendation_routes import create_recommendation_blueprint
         from .routes.finance_routes import create_finance_blueprint
+        from .routes.admin_routes import create_admin_blueprint
+        from .routes.metrics_routes import create_metrics_blueprint
 
         auth_bp = create_auth_blueprint()
-        meal_plan_bp = create_meal_plan_blueprint()
+        meal_plan_bp = create_meal_plan_blueprint(plan_jobs)
         finance_bp = create_finance_blueprint()
+        admin_bp = create_admin_blueprint(engine_reloader)
+        metrics_bp = create_metrics_blueprint()
         
-        resto_bp = create_resto_blueprint(menu_reviews_db, restaurants_data_list, users_db)
-        reco_bp = create_recommendation_blueprint(users_db, restaurants_data_list)
+        resto_bp = create_resto_blueprint()
+        reco_bp = create_recommendation_blueprint()
         
         app.register_blueprint(auth_bp)
         app.register_blueprint(meal_plan_bp)
         app.register_blueprint(resto_bp)
         app.register_blueprint(reco_bp)
         app.register_blueprint(finance_bp)
+        app.register_blueprint(admin_bp)
+        app.register_blueprint(metrics_bp)
 
     @app.route("/")
     def index():
@@ -0,0 +1,225 @@
+# app/auth.py
+
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from flask import current_app, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+from .models import db, User, cache_generation
+
+log = logging.getLogger(__name__)
+
+TOKEN_SALT = 'kosankenyang-auth'
+# Nama generasi cache_generation untuk ProfileCache (dinaikkan oleh route yang mengubah profil)
+PROFILE_GENERATION = 'profile'
+# Jumlah key pembatas login sebelum key yang sudah lewat jendela waktunya dibersihkan
+RATE_LIMIT_SWEEP_KEYS = 10000
+
+# Field profil yang dipakai route planner & keuangan (tanpa password_hash)
+UserProfile = namedtuple('UserProfile', ['id', 'email', 'nama', 'target_calories', 'daily_budget', 'monthly_budget', 'preferences', 'allergies'])
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+# --- Token stateless: {"uid": id} ditandatangani HMAC (itsdangerous), diverifikasi tanpa DB ---
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+def issue_token(user_id):
+    return _serializer().dumps({'uid': user_id})
+
+# user_id dari token; AuthError bila tanda tangan salah atau kedaluwarsa.
+def verify_token(token):
+    try:
+        payload = _serializer().loads(token, max_age=current_app.config['AUTH_TOKEN_TTL'])
+    except SignatureExpired:
+        raise AuthError("Token kedaluwarsa, silakan login ulang.")
+    except BadSignature:
+        raise AuthError("Token tidak valid.")
+    if not isinstance(payload, dict) or not isinstance(payload.get('uid'), int):
+        raise AuthError("Token tidak valid.")
+    return payload['uid']
+
+# Kunci HMAC bersama untuk semua worker di mesin ini bila SECRET_KEY tidak diset: dibuat sekali
+# (file sementara lalu os.link, atomik: worker yang kalah memakai kunci pemenang) dan dibaca ulang
+# saat restart. Deploy multi-mesin tetap wajib memakai SECRET_KEY yang sama.
+def load_or_create_secret_key(path):
+    try:
+        with open(path) as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+# --- Cache LRU profil user per proses ---
+# Perubahan profil di worker mana pun menaikkan generasi 'profile' di tabel cache_generation
+# (bump_cache_generation, satu transaksi dengan UPDATE user). Setiap proses membaca generasi itu
+# paling sering tiap `check_interval` detik dan membuang seluruh cache bila berubah, jadi profil
+# basi (mis. daily_budget lama) di worker lain paling lama `check_interval`, bukan `ttl`.
+# Biayanya: satu SELECT primary key kecil per proses per `check_interval` di jalur baca (bukan per
+# request); interval lebih besar = lebih sedikit query tapi profil basi lebih lama.
+
+class ProfileCache:
+    def __init__(self, maxsize=1024, ttl=60.0, check_interval=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._profiles = OrderedDict()
+        self._email_index = {}
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked_at = None
+        self.hits = self.misses = self.flushes = 0
+
+    def _sync_generation(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        generation = cache_generation(PROFILE_GENERATION)
+        with self._lock:
+            self._checked_at = now
+            if generation != self._generation:
+                if self._generation is not None:
+                    self._profiles.clear()
+                    self._email_index.clear()
+                    self.flushes += 1
+                self._generation = generation
+
+    def _get(self, user_id):
+        entry = self._profiles.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        self._profiles.move_to_end(user_id)
+        return entry[1]
+
+    def _put(self, profile):
+        self._profiles[profile.id] = (time.monotonic() + self.ttl, profile)
+        self._profiles.move_to_end(profile.id)
+        self._email_index[profile.email] = profile.id
+        while len(self._profiles) > self.maxsize:
+            _, (_, old) = self._profiles.popitem(last=False)
+            self._email_index.pop(old.email, None)
+
+    # Profil berdasarkan id atau email; query ke DB hanya saat miss. None = user tidak ada.
+    def get(self, user_id=None, email=None):
+        self._sync_generation()
+        with self._lock:
+            if user_id is None:
+                user_id = self._email_index.get(email)
+            profile = self._get(user_id) if user_id is not None else None
+            if profile is not None and (email is None or profile.email == email):
+                self.hits += 1
+                return profile
+            self.misses += 1
+        user = db.session.get(User, user_id) if user_id is not None and email is None else User.query.filter_by(email=email).first()
+        if user is None:
+            return None
+        profile = UserProfile(
+            user.id, user.email, user.nama, user.target_calories, user.daily_budget, user.monthly_budget,
+            json.loads(user.preferences) if user.preferences else [], json.loads(user.allergies) if user.allergies else [],
+        )
+        with self._lock:
+            self._put(profile)
+        return profile
+
+    def invalidate(self, user_id):
+        with self._lock:
+            entry = self._profiles.pop(user_id, None)
+            if entry is not None:
+                self._email_index.pop(entry[1].email, None)
+
+    def stats(self):
+        return {'size': len(self._profiles), 'hits': self.hits, 'misses': self.misses, 'flushes': self.flushes}
+
+# Profil user request ini dari Bearer token. Tanpa token, parameter email hanya diterima bila
+# ALLOW_EMAIL_AUTH aktif (kompatibilitas klien lama, usang dan nonaktif secara default): email saja
+# bukan bukti identitas. AuthError bila token tidak ada/tidak valid atau milik user lain.
+def current_profile(email=None):
+    cache = current_app.config['PROFILE_CACHE']
+    token = bearer_token()
+    if token is None:
+        if not current_app.config['ALLOW_EMAIL_AUTH']:
+            raise AuthError("Token login dibutuhkan.")
+        return cache.get(email=email) if email else None
+    profile = cache.get(user_id=verify_token(token))
+    if profile is None:
+        raise AuthError("Pengguna tidak ditemukan.", 404)
+    if email and email != profile.email:
+        raise AuthError("Token bukan milik pengguna ini.", 403)
+    return profile
+
+# --- Pembatas login gagal (sliding window per email dan per IP, per proses) ---
+# Hanya kegagalan yang dihitung, juga per IP: banyak user sah di balik satu NAT/IP kampus tidak
+# terblokir oleh login yang berhasil.
+
+class LoginRateLimiter:
+    def __init__(self, max_failures=5, max_failures_ip=30, window=300.0):
+        self.max_failures = max_failures
+        self.max_failures_ip = max_failures_ip
+        self.window = window
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        events = self._events.get(key)
+        if events is None:
+            return 0
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return 0
+        return len(events)
+
+    # Detik tunggu bila diblokir, None bila boleh mencoba.
+    def check(self, email, ip):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._events) > RATE_LIMIT_SWEEP_KEYS:
+                for key in list(self._events):
+                    self._recent(key, now)
+            blocked = [key for key, limit in ((('email', email), self.max_failures), (('ip', ip), self.max_failures_ip)) if self._recent(key, now) >= limit]
+            if blocked:
+                return max(int(self._events[key][0] + self.window - now) + 1 for key in blocked)
+        return None
+
+    def failure(self, email, ip):
+        now = time.monotonic()
+        with self._lock:
+            self._events.setdefault(('email', email), deque()).append(now)
+            self._events.setdefault(('ip', ip), deque()).append(now)
+
+    def success(self, email):
+        with self._lock:
+            self._events.pop(('email', email), None)
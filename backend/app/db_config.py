@@ -0,0 +1,192 @@
+# app/db_config.py
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from .models import db
+
+log = logging.getLogger(__name__)
+
+# --- Konfigurasi engine: URL alternatif (DATABASE_URL), pool, dan PRAGMA SQLite ---
+
+def database_settings():
+    return {
+        'busy_timeout_ms': int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size_kib': int(os.environ.get('DB_CACHE_SIZE_KIB', 16384)),
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    }
+
+def _is_file_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') and not url.database.startswith('file::memory:')
+
+# Opsi create_engine untuk URL yang dipakai; dipanggil sebelum db.init_app.
+def engine_options(uri, settings):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return {
+            'pool_size': settings['pool_size'], 'max_overflow': settings['max_overflow'], 'pool_timeout': settings['pool_timeout'],
+            'pool_recycle': settings['pool_recycle'], 'pool_pre_ping': True,
+        }
+    if not _is_file_sqlite(url):
+        # SQLite in-memory: satu koneksi bersama (StaticPool default Flask-SQLAlchemy)
+        return {'connect_args': {'check_same_thread': False}}
+    # timeout driver sqlite3 = busy timeout saat file terkunci writer lain
+    return {
+        'connect_args': {'timeout': settings['busy_timeout_ms'] / 1000, 'check_same_thread': False},
+        'pool_size': settings['pool_size'], 'max_overflow': settings['max_overflow'], 'pool_timeout': settings['pool_timeout'],
+    }
+
+def _sqlite_pragmas(settings):
+    return [
+        # WAL: pembaca tidak memblokir penulis (dan sebaliknya); NORMAL aman di WAL dan jauh lebih murah dari FULL
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={settings['busy_timeout_ms']}",
+        f"PRAGMA mmap_size={settings['mmap_size']}",
+        f"PRAGMA cache_size=-{settings['cache_size_kib']}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+# Opsi engine untuk SQLALCHEMY_DATABASE_URI yang sudah final (opsi eksplisit di config tetap menang);
+# PRAGMA dipasang di init_engine. Dipanggil sebelum db.init_app.
+def configure_database(app):
+    settings = database_settings()
+    app.config['DATABASE_SETTINGS'] = settings
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], settings)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+# Dipanggil dalam app context setelah db.init_app, sebelum query pertama.
+def init_engine(app):
+    engine = db.engine
+    if not _is_file_sqlite(engine.url):
+        return engine
+    pragmas = _sqlite_pragmas(app.config['DATABASE_SETTINGS'])
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+    log.info("Database SQLite siap.", extra={'journal_mode': journal_mode, 'database': engine.url.database})
+    return engine
+
+# --- Write-behind: operasi tulis kecil digabung ke satu transaksi periodik ---
+
+# `insert(table, row)` untuk INSERT murni (dieksekusi sebagai executemany per tabel);
+# `submit(fn)` untuk operasi lain: fn(session) dijalankan dalam transaksi batch dan boleh
+# mengembalikan callable yang dipanggil setelah commit. Bila satu batch gagal, setiap
+# operasi diulang dalam transaksinya sendiri agar satu baris buruk tidak membuang yang lain.
+class WriteBehindBatcher:
+    def __init__(self, app, flush_interval=0.2, max_batch=500, max_queue=10000):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+        self.flushed = self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # False bila antrian penuh / batcher berhenti: pemanggil menulis langsung.
+    def insert(self, table, row):
+        return self._put(('insert', table, row))
+
+    def submit(self, fn):
+        return self._put(('call', fn, None))
+
+    def _put(self, op):
+        if self._stopped:
+            return False
+        try:
+            self._queue.put_nowait(op)
+            return True
+        except queue.Full:
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            deadline = time.monotonic() + self.flush_interval
+            batch = [first]
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._flush(batch)
+                    return
+                batch.append(op)
+            self._flush(batch)
+
+    def _apply(self, ops):
+        callbacks = []
+        inserts = {}
+        for kind, target, row in ops:
+            if kind == 'insert':
+                inserts.setdefault(target, []).append(row)
+            else:
+                callback = target(db.session)
+                if callback is not None:
+                    callbacks.append(callback)
+        for table, rows in inserts.items():
+            db.session.execute(table.insert(), rows)
+        db.session.commit()
+        # Sudah ter-commit: kegagalan callback tidak boleh membuat operasi diulang
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                log.exception("Callback write-behind gagal: %s", e)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                self._apply(batch)
+                self.flushed += len(batch)
+            except Exception as e:
+                db.session.rollback()
+                log.warning("Batch write-behind gagal (%s), diulang per operasi.", e)
+                for op in batch:
+                    try:
+                        self._apply([op])
+                        self.flushed += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        self.failed += 1
+                        log.exception("Operasi write-behind gagal: %s", e)
+        log.debug("Batch write-behind ditulis.", extra={'ops': len(batch), 'duration_ms': round((time.perf_counter() - started) * 1000, 3)})
+
+    # Tulis sisa antrian lalu hentikan thread (dipanggil saat proses keluar).
+    def stop(self, timeout=10.0):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,104 @@
+# app/engine_reloader.py
+
+import logging
+import os
+import threading
+import time
+
+from .ml_engine.meal_planner import MealPlanner
+from .ml_engine.item_recommender import ItemRecommender
+from .models import menu_rating_totals
+from .ml_engine.snapshot import snapshot_key
+from .ml_engine.shared_arrays import prune_shared
+
+log = logging.getLogger(__name__)
+
+# Hot reload dataset restoran: engine baru dibangun di thread latar (memakai ulang bagian
+# yang tidak berubah dari engine lama), lalu app.config['MEAL_PLANNER_ENGINE'] ditukar dalam
+# satu assignment. Request yang sedang berjalan tetap memegang engine lama sampai selesai.
+class EngineReloader:
+    def __init__(self, app, snapshot_dir=None, shared_dir=None):
+        self.app = app
+        self.snapshot_dir = snapshot_dir
+        self.shared_dir = shared_dir
+        self.last_status = {"status": "idle"}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Mulai reload di latar; False jika reload lain masih berjalan.
+    def trigger(self):
+        with self._lock:
+            if self.is_running():
+                return False
+            self._thread = threading.Thread(target=self.reload, name='dataset-reload', daemon=True)
+            self._thread.start()
+            return True
+
+    def reload(self):
+        engine = self.app.config['MEAL_PLANNER_ENGINE']
+        started = time.perf_counter()
+        try:
+            new_version = snapshot_key(engine.data_path)
+            if new_version == engine.dataset_version:
+                self.last_status = {"status": "unchanged", "dataset_version": engine.dataset_version}
+                return
+            new_engine = MealPlanner(data_path=engine.data_path, snapshot_dir=self.snapshot_dir, shared_dir=self.shared_dir, previous=engine)
+            self.app.config['MEAL_PLANNER_ENGINE'] = new_engine
+            if self.shared_dir:
+                prune_shared(self.shared_dir, keep=new_engine.dataset_version)
+            # Ulasan yang masuk selama engine baru dibangun
+            self.refresh_ratings()
+            self.last_status = {
+                "status": "reloaded", "dataset_version": new_engine.dataset_version,
+                "previous_version": engine.dataset_version, "diff": new_engine.reload_diff,
+                "duration_s": round(time.perf_counter() - started, 3),
+            }
+            log.info("Dataset restoran dimuat ulang (%s -> %s).", engine.dataset_version, new_engine.dataset_version, extra={'diff': new_engine.reload_diff})
+        except Exception as e:
+            self.last_status = {"status": "error", "message": str(e)}
+            log.exception("Gagal memuat ulang dataset restoran: %s", e)
+
+    # Polling mtime file dataset; reload dipicu saat file berubah.
+    def start_watcher(self, interval):
+        def watch():
+            last_mtime = os.stat(self.app.config['MEAL_PLANNER_ENGINE'].data_path).st_mtime
+            while True:
+                time.sleep(interval)
+                try:
+                    mtime = os.stat(self.app.config['MEAL_PLANNER_ENGINE'].data_path).st_mtime
+                except OSError:
+                    continue
+                if mtime != last_mtime and self.trigger():
+                    last_mtime = mtime
+
+        threading.Thread(target=watch, name='dataset-watcher', daemon=True).start()
+
+    # Muat ulang seluruh agregat rating menu dari DB secara berkala (sinkronisasi antar worker).
+    def refresh_ratings(self):
+        try:
+            with self.app.app_context():
+                totals = menu_rating_totals()
+            if self.app.config['MEAL_PLANNER_ENGINE'].menu_ratings.load(totals):
+                log.debug("Skor rating menu diperbarui.", extra={'menu_count': len(totals)})
+        except Exception as e:
+            log.exception("Gagal memuat agregat rating menu: %s", e)
+
+    # Muat model rekomendasi bila train_recommender.py sudah menulis versi baru.
+    def refresh_recommender(self):
+        try:
+            current = self.app.config.get('RECOMMENDER_MODEL')
+            self.app.config['RECOMMENDER_MODEL'] = ItemRecommender.load(self.app.config['RECOMMENDER_MODEL_DIR'], current=current)
+        except Exception as e:
+            log.exception("Gagal memuat model rekomendasi: %s", e)
+
+    def start_refresher(self, interval):
+        def refresh():
+            while True:
+                time.sleep(interval)
+                self.refresh_ratings()
+                self.refresh_recommender()
+
+        threading.Thread(target=refresh, name='rating-refresher', daemon=True).start()
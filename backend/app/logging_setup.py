@@ -0,0 +1,80 @@
+# app/logging_setup.py
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+# Atribut bawaan LogRecord; sisanya dianggap field tambahan dari `extra=...`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+REQUEST_ID_MAX_LEN = 64
+
+def get_request_id():
+    return g.get('request_id') if has_request_context() else None
+
+# Satu baris JSON per record: waktu, level, logger, pesan, request_id, dan field `extra`
+# (mis. stage_ms, duration_ms) apa adanya.
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname, 'logger': record.name, 'msg': record.getMessage(),
+        }
+        payload.update((k, v) for k, v in vars(record).items() if k not in _STANDARD_ATTRS and v is not None)
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+# QueueHandler yang menempelkan request_id dan memformat pesan/exception di thread pemanggil
+# (request context dan traceback tidak tersedia lagi di thread QueueListener).
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = get_request_id()
+        return record
+
+# Logger paket `app` (juga app.logger Flask) ditulis lewat antrean ke stderr oleh QueueListener,
+# jadi request hanya membayar enqueue; record di bawah LOG_LEVEL dibuang sebelum dibuat.
+# Log akses per request ("Request selesai.") berlevel DEBUG; ACCESS_LOG=1 menaikkannya ke INFO.
+def configure_logging(app):
+    logger = logging.getLogger('app')
+    logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    logger.propagate = False
+    if not any(isinstance(h, RequestQueueHandler) for h in logger.handlers):
+        log_queue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter())
+        listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(RequestQueueHandler(log_queue))
+    access_level = logging.INFO if os.environ.get('ACCESS_LOG', '0') in ('1', 'true') else logging.DEBUG
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID', '')[:REQUEST_ID_MAX_LEN] or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        response.headers['X-Request-ID'] = g.request_id
+        if logger.isEnabledFor(access_level):
+            logger.log(access_level, "Request selesai.", extra={
+                'method': request.method, 'path': request.path, 'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 3),
+            })
+        return response
+
+    return logger
@@ -0,0 +1,185 @@
+# app/metrics.py
+
+import bisect
+import cProfile
+import functools
+import hmac
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, request, current_app
+
+REQUEST_METRIC = 'kosankenyang_request_duration_seconds'
+STAGE_METRIC = 'kosankenyang_stage_duration_seconds'
+METRIC_HELP = {
+    REQUEST_METRIC: 'Durasi request per route.',
+    STAGE_METRIC: 'Durasi tahap MealPlanner dan route (filter, skor, slot, serialisasi, tulis DB).',
+}
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Persentil dihitung dari N observasi terakhir per seri (jendela geser)
+WINDOW_SIZE = 1024
+PROFILE_TOP_N = 40
+
+# Histogram latensi dengan bucket kumulatif ala Prometheus + jendela observasi terakhir untuk p50/p95/p99.
+class LatencyHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.window = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.window.append(seconds)
+
+    def quantiles(self):
+        data = sorted(self.window)
+        return {q: data[min(int(q * len(data)), len(data) - 1)] for q in QUANTILES} if data else {}
+
+# Registry per proses (tiap worker gunicorn punya registry sendiri; agregasi lintas worker
+# dilakukan Prometheus lewat bucket histogram).
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    # Ringkasan p50/p95/p99 (ms) per seri, untuk benchmark / endpoint JSON
+    def summary(self, name):
+        with self._lock:
+            items = [(dict(labels), h.count, h.quantiles()) for (n, labels), h in self._histograms.items() if n == name]
+        return [{**labels, 'count': count, **{f'p{int(q * 100)}_ms': round(v * 1000, 3) for q, v in quantiles.items()}} for labels, count, quantiles in items]
+
+    # Format teks Prometheus; `gauges` = list (nama, tipe, help, nilai, labels) tambahan (mis. statistik cache).
+    def render(self, gauges=()):
+        with self._lock:
+            series = sorted(
+                ((name, labels, list(h.bucket_counts), h.count, h.sum, h.quantiles(), sum(h.window), len(h.window))
+                 for (name, labels), h in self._histograms.items()), key=lambda s: (s[0], s[1])
+            )
+        lines = []
+        for name in sorted({s[0] for s in series}):
+            lines += [f'# HELP {name} {METRIC_HELP.get(name, name)}', f'# TYPE {name} histogram']
+            for _, labels, bucket_counts, count, total, _, _, _ in (s for s in series if s[0] == name):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + (float('inf'),), bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf" if bound == float("inf") else repr(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {total!r}')
+                lines.append(f'{name}_count{_labels(labels)} {count}')
+            window_name = f'{name}_window'
+            lines += [f'# HELP {window_name} Persentil {METRIC_HELP.get(name, name)[:-1].lower()} atas {WINDOW_SIZE} observasi terakhir.', f'# TYPE {window_name} summary']
+            for _, labels, _, _, _, quantiles, window_sum, window_count in (s for s in series if s[0] == name):
+                for q, value in quantiles.items():
+                    lines.append(f'{window_name}{_labels(labels + (("quantile", repr(q)),))} {value!r}')
+                lines.append(f'{window_name}_sum{_labels(labels)} {window_sum!r}')
+                lines.append(f'{window_name}_count{_labels(labels)} {window_count}')
+        for name, metric_type, help_text, value, labels in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name}{_labels(tuple(sorted(labels.items())))} {value!r}']
+        return '\n'.join(lines) + '\n'
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+REGISTRY = MetricsRegistry()
+
+def stage_timer(stage):
+    return REGISTRY.timer(STAGE_METRIC, stage=stage)
+
+def observe_stage(stage, seconds):
+    REGISTRY.observe(STAGE_METRIC, seconds, stage=stage)
+
+# Dekorator untuk method/fungsi yang seluruh durasinya dihitung sebagai satu tahap
+def timed_stage(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe_stage(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def _profiling_allowed():
+    admin_token = current_app.config.get('ADMIN_TOKEN')
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+def _start_profiler(mode):
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            mode = 'cprofile'
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return mode, profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return 'cprofile', profiler
+
+def _stop_profiler(mode, profiler):
+    if mode == 'pyinstrument':
+        profiler.stop()
+        return profiler.output_text(unicode=True, color=False)
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+    return out.getvalue()
+
+# Durasi setiap route ke histogram REQUEST_METRIC. Header `X-Profile: cprofile|pyinstrument`
+# (hanya dengan X-Admin-Token yang valid) menjalankan profiler untuk request tersebut dan
+# mengganti body respons dengan hasil profil; status aslinya ada di header X-Profile-Status.
+def init_metrics(app):
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        profile_mode = request.headers.get('X-Profile')
+        if profile_mode and _profiling_allowed():
+            g.profiler = _start_profiler(profile_mode.lower())
+
+    @app.after_request
+    def record_request_duration(response):
+        status = str(response.status_code)
+        started = g.get('metrics_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REGISTRY.observe(REQUEST_METRIC, time.perf_counter() - started, route=route, method=request.method, status=status)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            response.set_data(_stop_profiler(*profiler))
+            response.headers['X-Profile-Status'] = status
+            response.mimetype = 'text/plain'
+            response.status_code = 200
+        return response
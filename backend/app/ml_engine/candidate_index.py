@@ -0,0 +1,78 @@
+# app/ml_engine/candidate_index.py
+
+import numpy as np
+import pandas as pd
+
+SLOT_TAGS = {'sarapan': 'sarapan', 'maincourse': 'maincourse'}
+
+# Indeks mask boolean (NumPy) yang dibangun sekali saat engine dimuat:
+# satu mask per tag dan per slot makan. Filter alergen ada di ScoringEngine (bit alergen).
+class CandidateIndex:
+    def __init__(self, df):
+        tag_lists = [tags if isinstance(tags, list) else [] for tags in df['tags']]
+        vocab = {}
+        row_ids, tag_ids = [], []
+        for row, tags in enumerate(tag_lists):
+            for tag in tags:
+                row_ids.append(row)
+                tag_ids.append(vocab.setdefault(tag, len(vocab)))
+
+        tag_matrix = np.zeros((len(vocab), len(df)), dtype=bool)
+        tag_matrix[tag_ids, row_ids] = True
+
+        # Kode nama menu (lowercase) untuk aturan variasi lintas hari
+        name_codes, name_uniques = pd.factorize(df['Nama'].str.lower())
+        self._set_arrays(tag_matrix, name_codes, list(vocab), list(name_uniques))
+
+    def _set_arrays(self, tag_matrix, name_codes, vocab, names):
+        self.tag_matrix = tag_matrix
+        self.name_codes = name_codes
+        self.n_rows = tag_matrix.shape[1]
+        self.vocab = {tag: i for i, tag in enumerate(vocab)}
+        self.name_lookup = {name: code for code, name in enumerate(names)}
+        # Baris per kode nama (urut kode) + offset: baris satu menu tanpa scan seluruh df
+        self.rows_by_name = np.argsort(name_codes, kind='stable')
+        self.name_offsets = np.searchsorted(np.asarray(name_codes)[self.rows_by_name], np.arange(len(names) + 1))
+        self._empty = np.zeros(self.n_rows, dtype=bool)
+        self.slot_masks = {slot: self.tag_mask(tag) for slot, tag in SLOT_TAGS.items()}
+
+    # Array numerik + metadata kecil (untuk shared_arrays)
+    def to_arrays(self):
+        names = [None] * len(self.name_lookup)
+        for name, code in self.name_lookup.items():
+            names[code] = name
+        return {'tag_matrix': self.tag_matrix, 'name_codes': self.name_codes}, {'vocab': list(self.vocab), 'names': names}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        index = cls.__new__(cls)
+        index._set_arrays(arrays['tag_matrix'], arrays['name_codes'], meta['vocab'], meta['names'])
+        return index
+
+    def tag_mask(self, tag):
+        tag_id = self.vocab.get(tag)
+        return self.tag_matrix[tag_id] if tag_id is not None else self._empty
+
+    def any_tag_mask(self, tags):
+        tag_ids = [self.vocab[t] for t in tags if t in self.vocab]
+        if not tag_ids:
+            return self._empty
+        return self.tag_matrix[tag_ids].any(axis=0)
+
+    def name_mask(self, names):
+        codes = [self.name_lookup[n.lower()] for n in names if isinstance(n, str) and n.lower() in self.name_lookup]
+        return np.isin(self.name_codes, codes)
+
+    def code_rows(self, code):
+        return self.rows_by_name[self.name_offsets[code]:self.name_offsets[code + 1]]
+
+    def name_rows(self, name):
+        code = self.name_lookup.get(name.lower()) if isinstance(name, str) else None
+        return self.code_rows(code) if code is not None else self.rows_by_name[:0]
+
+    # Posisi baris untuk slot makan, dikurangi baris yang memuat salah satu `exclude_tags`.
+    def slot_rows(self, slot, exclude_tags=()):
+        mask = self.slot_masks[slot]
+        if exclude_tags:
+            mask = mask & ~self.any_tag_mask(exclude_tags)
+        return np.flatnonzero(mask)
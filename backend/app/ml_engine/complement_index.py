@@ -0,0 +1,113 @@
+# app/ml_engine/complement_index.py
+
+from itertools import combinations, product
+
+import numpy as np
+import pandas as pd
+
+KATEGORI_PELENGKAP = ['minuman', 'nasi', 'lauk tambahan', 'sayur', 'cemilan', 'sambal', 'kerupuk', 'kuah']
+POOL_PER_KATEGORI = 4
+
+# Indeks pelengkap (nasi, minuman, sambal, ...) per restoran: baris dikelompokkan per
+# (restoran, Kategori ter-normalisasi) dan diurutkan berdasarkan kalori, sehingga pelengkap
+# terbaik untuk selisih kalori + sisa budget dicari dengan binary search.
+class ComplementIndex:
+    def __init__(self, df):
+        kategori = df['Kategori'].str.lower()
+        rows = np.flatnonzero(kategori.isin(KATEGORI_PELENGKAP).to_numpy())
+
+        resto_codes, resto_names = pd.factorize(df['nama_restoran'].iloc[rows])
+        kategori_codes = np.array([KATEGORI_PELENGKAP.index(k) for k in kategori.iloc[rows]], dtype=np.int64)
+        name_codes, names = pd.factorize(df['Nama'].iloc[rows])
+        kalori = df['kalori'].to_numpy(dtype=np.int64)[rows]
+
+        order = np.lexsort((rows, kalori, kategori_codes, resto_codes))
+        resto_codes, kategori_codes = resto_codes[order], kategori_codes[order]
+
+        # Batas grup (restoran, kategori) dan daftar grup per restoran
+        group_starts = np.flatnonzero(np.r_[True, (np.diff(resto_codes) != 0) | (np.diff(kategori_codes) != 0)]) if len(rows) else np.empty(0, dtype=np.int64)
+        group_offsets = np.r_[group_starts, len(rows)].astype(np.int64)
+        group_resto = resto_codes[group_starts]
+        resto_group_offsets = np.searchsorted(group_resto, np.arange(len(resto_names) + 1)).astype(np.int64)
+
+        arrays = {
+            'rows': rows[order], 'kalori': kalori[order], 'harga': df['Harga'].to_numpy(dtype=np.int64)[rows][order],
+            'name_codes': name_codes[order], 'group_offsets': group_offsets, 'resto_group_offsets': resto_group_offsets,
+        }
+        self._set_arrays(arrays, list(resto_names), list(names))
+
+    def _set_arrays(self, arrays, resto_names, names):
+        self.rows, self.kalori, self.harga = arrays['rows'], arrays['kalori'], arrays['harga']
+        self.name_codes = arrays['name_codes']
+        self.group_offsets, self.resto_group_offsets = arrays['group_offsets'], arrays['resto_group_offsets']
+        self.resto_names, self.names = resto_names, names
+        self.resto_lookup = {name: code for code, name in enumerate(resto_names)}
+        self.name_lookup = {name: code for code, name in enumerate(names)}
+
+    def to_arrays(self):
+        arrays = {
+            'rows': self.rows, 'kalori': self.kalori, 'harga': self.harga, 'name_codes': self.name_codes,
+            'group_offsets': self.group_offsets, 'resto_group_offsets': self.resto_group_offsets,
+        }
+        return arrays, {'resto_names': self.resto_names, 'names': self.names}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        index = cls.__new__(cls)
+        index._set_arrays(arrays, meta['resto_names'], meta['names'])
+        return index
+
+    def _groups(self, nama_restoran):
+        code = self.resto_lookup.get(nama_restoran)
+        if code is None:
+            return []
+        g_lo, g_hi = self.resto_group_offsets[code], self.resto_group_offsets[code + 1]
+        return [(self.group_offsets[g], self.group_offsets[g + 1]) for g in range(g_lo, g_hi)]
+
+    # Hingga `limit` posisi (di array indeks) terdekat ke `target` kalori dalam satu grup,
+    # berurutan dari yang terdekat, yang lolos budget dan bukan menu `exclude_code`.
+    def _nearest_in_group(self, lo, hi, target, budget, exclude_code, limit):
+        i = lo + int(np.searchsorted(self.kalori[lo:hi], target))
+        left, right = i - 1, i
+        found = []
+        while len(found) < limit and (left >= lo or right < hi):
+            if right >= hi or (left >= lo and target - self.kalori[left] <= self.kalori[right] - target):
+                pos, left = left, left - 1
+            else:
+                pos, right = right, right + 1
+            if self.harga[pos] <= budget and self.name_codes[pos] != exclude_code:
+                found.append(pos)
+        return found
+
+    # Baris df pelengkap untuk menutup `gap_kalori` dengan total harga <= `budget`.
+    # max_items=1: satu pelengkap dengan selisih kalori terkecil (perilaku lama);
+    # max_items>1: knapsack kecil lintas kategori (mis. nasi + minuman) atas pool kandidat terdekat.
+    def best_combo(self, nama_restoran, gap_kalori, budget, exclude_nama=None, max_items=1):
+        groups = self._groups(nama_restoran)
+        exclude_code = self.name_lookup.get(exclude_nama, -1)
+        if max_items <= 1:
+            best = None
+            for lo, hi in groups:
+                found = self._nearest_in_group(lo, hi, gap_kalori, budget, exclude_code, limit=1)
+                if found and (best is None or abs(self.kalori[found[0]] - gap_kalori) < abs(self.kalori[best] - gap_kalori)):
+                    best = found[0]
+            return [] if best is None else [int(self.rows[best])]
+
+        pools = []
+        for lo, hi in groups:
+            pool = set()
+            for k in range(1, max_items + 1):
+                pool.update(self._nearest_in_group(lo, hi, gap_kalori / k, budget, exclude_code, limit=POOL_PER_KATEGORI))
+            if pool:
+                pools.append(sorted(pool))
+
+        best, best_diff = (), None
+        for n_items in range(1, min(max_items, len(pools)) + 1):
+            for chosen_groups in combinations(pools, n_items):
+                for combo in product(*chosen_groups):
+                    if sum(self.harga[p] for p in combo) > budget:
+                        continue
+                    diff = abs(sum(self.kalori[p] for p in combo) - gap_kalori)
+                    if best_diff is None or diff < best_diff:
+                        best, best_diff = combo, diff
+        return [int(self.rows[p]) for p in best]
@@ -0,0 +1,39 @@
+# app/ml_engine/dataset_diff.py
+
+import pandas as pd
+
+MENU_KEY = ['nama_restoran', 'Nama']
+MENU_VALUE_COLUMNS = ['Harga', 'kalori', 'fitur_model', 'Kategori', 'latitude', 'longitude']
+
+# True bila kolom-kolom ini identik baris per baris (urutan sama), artinya
+# struktur turunan dari kolom tersebut (TF-IDF, mask, indeks spasial) bisa dipakai ulang.
+def same_columns(old_df, new_df, columns):
+    if old_df is None or len(old_df) != len(new_df):
+        return False
+    return all(
+        col in old_df.columns and col in new_df.columns
+        and old_df[col].reset_index(drop=True).equals(new_df[col].reset_index(drop=True))
+        for col in columns
+    )
+
+# Ringkasan perubahan per restoran dan per item menu (kunci: nama_restoran + Nama).
+def diff_datasets(old_df, new_df):
+    columns = MENU_KEY + [c for c in MENU_VALUE_COLUMNS if c in old_df.columns and c in new_df.columns]
+    old_menu = old_df[columns].drop_duplicates(subset=MENU_KEY, keep='last')
+    new_menu = new_df[columns].drop_duplicates(subset=MENU_KEY, keep='last')
+    merged = old_menu.merge(new_menu, on=MENU_KEY, how='outer', suffixes=('_lama', '_baru'), indicator=True)
+
+    both = merged[merged['_merge'] == 'both']
+    changed = pd.Series(False, index=both.index)
+    for col in columns[len(MENU_KEY):]:
+        lama, baru = both[f'{col}_lama'], both[f'{col}_baru']
+        changed |= ~((lama == baru) | (lama.isna() & baru.isna()))
+
+    old_resto, new_resto = set(old_df['nama_restoran']), set(new_df['nama_restoran'])
+    return {
+        'restoran_baru': len(new_resto - old_resto),
+        'restoran_hilang': len(old_resto - new_resto),
+        'menu_baru': int((merged['_merge'] == 'right_only').sum()),
+        'menu_hilang': int((merged['_merge'] == 'left_only').sum()),
+        'menu_berubah': int(changed.sum()),
+    }
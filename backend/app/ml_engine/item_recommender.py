@@ -0,0 +1,145 @@
+# app/ml_engine/item_recommender.py
+
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from .shared_arrays import export_arrays, map_arrays
+
+log = logging.getLogger(__name__)
+
+# Nama file penunjuk model aktif di direktori model (isi: nama subdirektori versi)
+CURRENT_FILE = 'current'
+KEEP_VERSIONS = 2
+# Rating netral skala 1-5: ulasan di atasnya menaikkan tetangga, di bawahnya menurunkan
+RATING_NETRAL = 3.0
+
+# Rekomender item-item per nama menu (lowercase, sama dengan CandidateIndex.name_lookup).
+# Dilatih offline dari tabel review (adjusted cosine, di-shrink menurut jumlah user yang
+# sama-sama mengulas) dicampur kemiripan konten TF-IDF, lalu disimpan sebagai daftar
+# top-k tetangga (array int32/float32) yang di-mmap saat serving.
+class ItemRecommender:
+    def __init__(self, neighbors, weights, names, meta=None):
+        self.neighbors = neighbors
+        self.weights = weights
+        self.names = names
+        self.name_lookup = {name: i for i, name in enumerate(names)}
+        self.meta = meta or {}
+        self.version = self.meta.get('version')
+
+    # `reviews`: iterable (user_id, menu_name, rating). `alpha`: porsi kolaboratif vs konten.
+    @classmethod
+    def train(cls, df, tfidf_matrix, reviews, k=20, alpha=0.7, shrinkage=10.0, chunk_elements=1 << 24):
+        started = time.perf_counter()
+        name_codes, names = pd.factorize(df['Nama'].str.lower())
+        n_items = len(names)
+
+        # Konten: rata-rata vektor TF-IDF semua baris dengan nama yang sama
+        indicator = sp.csr_matrix((np.ones(len(name_codes)), (name_codes, np.arange(len(name_codes)))), shape=(n_items, len(name_codes)))
+        content = normalize(indicator @ normalize(tfidf_matrix, norm='l2'), norm='l2').astype(np.float32).tocsr()
+
+        reviews = pd.DataFrame(list(reviews), columns=['user_id', 'menu_name', 'rating'])
+        item_lookup = {name: i for i, name in enumerate(names)}
+        reviews['item'] = reviews['menu_name'].str.lower().map(item_lookup)
+        reviews = reviews.dropna(subset=['item', 'rating'])
+        collaborative = sp.csr_matrix((n_items, n_items), dtype=np.float32)
+        if len(reviews):
+            users, _ = pd.factorize(reviews['user_id'])
+            items = reviews['item'].to_numpy(dtype=np.int64)
+            # Adjusted cosine: rating dikurangi rata-rata rating user
+            centered = reviews['rating'].to_numpy(dtype=np.float64) - reviews.groupby('user_id')['rating'].transform('mean').to_numpy()
+            ratings = sp.csr_matrix((centered, (users, items)), shape=(users.max() + 1, n_items))
+            ratings.sum_duplicates()
+            rated = ratings.copy()
+            rated.data = np.ones_like(rated.data)
+            item_vectors = normalize(ratings.T.tocsr(), norm='l2')
+            # Pasangan dengan sedikit user bersama dipercaya lebih rendah: sim * n / (n + shrinkage)
+            shrunk = (rated.T @ rated).tocsr()
+            shrunk.data = shrunk.data / (shrunk.data + shrinkage)
+            collaborative = (item_vectors @ item_vectors.T).multiply(shrunk).astype(np.float32).tocsr()
+
+        k = min(k, max(n_items - 1, 0))
+        neighbors = np.zeros((n_items, k), dtype=np.int32)
+        weights = np.zeros((n_items, k), dtype=np.float32)
+        chunk = max(1, chunk_elements // max(n_items, 1))
+        for start in range(0, n_items, chunk):
+            stop = min(start + chunk, n_items)
+            sims = (1 - alpha) * (content[start:stop] @ content.T).toarray() + alpha * collaborative[start:stop].toarray()
+            sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            if k:
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                top_sims = np.take_along_axis(sims, top, axis=1)
+                order = np.argsort(-top_sims, axis=1, kind='stable')
+                neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+                # Kemiripan negatif tidak dipakai sebagai tetangga
+                weights[start:stop] = np.maximum(np.take_along_axis(top_sims, order, axis=1), 0)
+
+        meta = {
+            'names': list(names), 'k': k, 'alpha': alpha, 'shrinkage': shrinkage,
+            'n_reviews': int(len(reviews)), 'n_users': int(reviews['user_id'].nunique()),
+            'train_s': round(time.perf_counter() - started, 3),
+        }
+        log.info("Model rekomendasi dilatih.", extra={k_: v for k_, v in meta.items() if k_ != 'names'})
+        return cls(neighbors, weights, list(names), meta)
+
+    # Simpan sebagai versi baru di `model_dir`, lalu tukar penunjuk `current` secara atomik.
+    def save(self, model_dir, version=None):
+        version = version or time.strftime('%Y%m%d-%H%M%S')
+        self.meta['version'] = self.version = version
+        meta = {key: value for key, value in self.meta.items() if key != 'names'}
+        meta['names'] = self.names
+        if not export_arrays(os.path.join(model_dir, version), {'recommender': ({'neighbors': self.neighbors, 'weights': self.weights}, meta)}):
+            return None
+        tmp_path = os.path.join(model_dir, CURRENT_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+        # Versi lama dihapus; worker yang masih me-mmap tetap aman (file terbuka tidak hilang di POSIX)
+        versions = sorted(d for d in os.listdir(model_dir) if os.path.isdir(os.path.join(model_dir, d)) and not d.startswith('.'))
+        for old in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(model_dir, old), ignore_errors=True)
+        return version
+
+    # Model aktif di `model_dir`; `current` dikembalikan apa adanya bila versinya sama (None = belum ada model).
+    @classmethod
+    def load(cls, model_dir, current=None):
+        try:
+            with open(os.path.join(model_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+        except OSError:
+            return current
+        if current is not None and current.version == version:
+            return current
+        mapped = map_arrays(os.path.join(model_dir, version))
+        if mapped is None or 'recommender' not in mapped:
+            return current
+        arrays, meta = mapped['recommender']
+        meta = dict(meta, version=version)
+        log.info("Model rekomendasi '%s' dimuat.", version)
+        return cls(arrays['neighbors'], arrays['weights'], meta.pop('names'), meta)
+
+    # `rated`: {menu_name: rating} milik user. Hasil: [(nama lowercase, skor)] skor > 0, menurun,
+    # tanpa menu yang sudah diulas.
+    def recommend(self, rated, n=20):
+        items, deviations = [], []
+        for name, rating in rated.items():
+            item = self.name_lookup.get(name.lower()) if isinstance(name, str) else None
+            if item is not None:
+                items.append(item)
+                deviations.append(float(rating) - RATING_NETRAL)
+        if not items or self.neighbors.shape[1] == 0:
+            return []
+        neighbors = self.neighbors[items].ravel()
+        contributions = (self.weights[items] * np.asarray(deviations, dtype=np.float32)[:, None]).ravel()
+        candidates, inverse = np.unique(neighbors, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+        keep = (scores > 0) & ~np.isin(candidates, items)
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:n]
+        return [(self.names[item], float(score)) for item, score in zip(candidates[order], scores[order])]
@@ -2,21 +2,130 @@
 
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import io
 import json
+import logging
+import os
+import time
 import numpy as np
-import random
+import zlib
+from .spatial_index import RestaurantSpatialIndex
+from .candidate_index import CandidateIndex, SLOT_TAGS
+from .scoring import ScoringEngine
+from .complement_index import ComplementIndex
+from .menu_rating import MenuRatingVector, PRIOR_WEIGHT
+from .snapshot import snapshot_key, load_snapshot, save_snapshot
+from .shared_arrays import export_arrays, map_arrays, csr_to_arrays, csr_from_arrays
+from .dataset_diff import same_columns, diff_datasets
+from .plan_cache import profile_fingerprint
+from .plan_optimizer import PlanOptimizer, TAG_UTAMA_SARAPAN, TAG_UTAMA_MAKAN
+from ..metrics import stage_timer, observe_stage, timed_stage
+from ..serialization import clean_records
+
+# Seed default per user per tanggal: rencana yang sama untuk input yang sama (reproducible & bisa di-cache).
+# `salt` membedakan generate ulang untuk tanggal yang sama (mis. id plan sebelumnya).
+def plan_seed(user_id, plan_date, salt=None):
+    return zlib.crc32(f"{user_id}:{plan_date.isoformat()}:{salt if salt is not None else ''}".encode('utf-8'))
+
+# 'greedy': slot diisi berurutan (sarapan -> siang -> malam); 'optimal': dipilih bersamaan oleh PlanOptimizer.
+PLAN_MODES = ('greedy', 'optimal')
+
+# Porsi target kalori & budget harian per slot, dan jumlah kandidat sarapan yang diundi
+SARAPAN_PERCENT = 0.25
+MAKAN_SIANG_PERCENT = 0.40
+SARAPAN_TOP_N = 5
+# Elemen matriks skor (user x baris) per blok pada ranking sarapan mode batch
+BATCH_SCORE_ELEMENTS = 1 << 22
+
+# Rekomendasi tanpa riwayat ulasan: bobot (rasa, kalori, rating) dan jumlah baris terdekat yang dipertimbangkan
+COLD_START_WEIGHTS = (0.5, 0.2, 0.3)
+COLD_START_NEARBY_ROWS = 500
+
+log = logging.getLogger(__name__)
+
+SHARED_COMPONENTS = {'spatial_index': RestaurantSpatialIndex, 'candidate_index': CandidateIndex, 'scorer': ScoringEngine, 'complement_index': ComplementIndex}
 
 class MealPlanner:
-    def __init__(self, data_path):
-        print("Menginisialisasi Meal Planner Engine...")
-        self.df = self._load_and_process_data(data_path)
-        self.tfidf, self.tfidf_matrix = self._build_model()
-        print("✅ Meal Planner Engine siap digunakan.")
+    # `previous`: engine yang sedang melayani (hot reload); bagian yang tidak berubah dipakai ulang.
+    # `ranking_cache`: RankingCache untuk daftar kandidat terurut per slot (None = tanpa cache).
+    # `max_pelengkap`: jumlah maksimum pelengkap per paket (1 = satu pelengkap seperti sebelumnya).
+    # `optimizer`: PlanOptimizer untuk mode='optimal' (default: milik `previous` atau PlanOptimizer()).
+    # `w_rating`: bobot default skor rating menu (Bayesian) di samping w_taste/w_calorie; 0 = nonaktif.
+    # `rating_prior_weight`: bobot prior rating restoran dalam rata-rata Bayesian (lihat MenuRatingVector).
+    def __init__(self, data_path, snapshot_dir=None, shared_dir=None, previous=None, ranking_cache=None, max_pelengkap=None, optimizer=None,
+                 w_rating=None, rating_prior_weight=None):
+        log.info("Menginisialisasi Meal Planner Engine...")
+        self.data_path = data_path
+        if max_pelengkap is None:
+            max_pelengkap = previous.max_pelengkap if previous is not None else 1
+        self.max_pelengkap = max_pelengkap
+        if optimizer is None:
+            optimizer = previous.optimizer if previous is not None else PlanOptimizer()
+        self.optimizer = optimizer
+        if w_rating is None:
+            w_rating = previous.w_rating if previous is not None else 0.0
+        self.w_rating = float(w_rating)
+        if rating_prior_weight is None:
+            rating_prior_weight = previous.menu_ratings.prior_weight if previous is not None else PRIOR_WEIGHT
+        self.dataset_version = snapshot_key(data_path)
+        if ranking_cache is None and previous is not None:
+            # Statistik cache berlanjut, isinya dibuang karena terikat versi dataset lama
+            ranking_cache = previous.ranking_cache
+            if ranking_cache is not None:
+                ranking_cache.clear()
+        self.ranking_cache = ranking_cache
+        shared_path = os.path.join(shared_dir, self.dataset_version) if shared_dir else None
+        shared = map_arrays(shared_path) if shared_path else None
+        # Dengan shared arrays, matriks TF-IDF mentah di-mmap (tidak dibaca dari snapshot per worker)
+        snapshot = load_snapshot(snapshot_dir, self.dataset_version, tfidf_matrix=shared is None) if snapshot_dir else None
+        if snapshot:
+            log.info("Memuat snapshot engine '%s'...", snapshot['key'])
+            self.df, self.restaurants_data = snapshot['df'], snapshot['restaurants_data']
+            self.tfidf, self.tfidf_matrix = snapshot['tfidf'], snapshot['tfidf_matrix']
+        else:
+            self.df, self.restaurants_data = self._load_and_process_data(data_path)
+            self.tfidf, self.tfidf_matrix = self._build_model(previous)
+            if snapshot_dir:
+                save_snapshot(snapshot_dir, self.dataset_version, data_path, self.df, self.tfidf, self.tfidf_matrix, self.restaurants_data)
+        self.reload_diff = diff_datasets(previous.df, self.df) if previous is not None else None
+        self._build_indexes(shared_path, shared, previous)
+        # Tidak ikut shared arrays: diperbarui per proses saat ulasan masuk
+        self.menu_ratings = MenuRatingVector(self.df, self.candidate_index, prior_weight=rating_prior_weight,
+                                             totals=previous.menu_ratings.totals if previous is not None else None)
+        log.info("Meal Planner Engine siap digunakan.", extra={'dataset_version': self.dataset_version, 'menu_count': len(self.df)})
+
+    # Dengan `shared_path` (<shared_dir>/<dataset_version>), array numerik indeks dan matriks TF-IDF
+    # mentah di-mmap read-only; proses pertama yang tidak menemukannya membangun lalu menuliskannya
+    # untuk worker lain. `shared`: hasil map_arrays(shared_path) bila sudah ada.
+    def _build_indexes(self, shared_path=None, shared=None, previous=None):
+        if shared is None:
+            previous_df = previous.df if previous is not None else None
+            if same_columns(previous_df, self.df, ['latitude', 'longitude']):
+                self.spatial_index = previous.spatial_index
+            else:
+                self.spatial_index = RestaurantSpatialIndex(self.df)
+            if same_columns(previous_df, self.df, ['fitur_model', 'Nama']):
+                self.candidate_index = previous.candidate_index
+            else:
+                self.candidate_index = CandidateIndex(self.df)
+            self.scorer = ScoringEngine(self.df, self.tfidf_matrix)
+            self.complement_index = ComplementIndex(self.df)
+            components = {name: getattr(self, name).to_arrays() for name in SHARED_COMPONENTS}
+            components['tfidf_matrix'] = csr_to_arrays(self.tfidf_matrix)
+            if shared_path and export_arrays(shared_path, components):
+                shared = map_arrays(shared_path)
+        if shared is not None:
+            log.info("Memakai shared arrays dari '%s'...", shared_path)
+            for name, component_cls in SHARED_COMPONENTS.items():
+                setattr(self, name, component_cls.from_arrays(*shared[name]))
+            self.tfidf_matrix = csr_from_arrays(*shared['tfidf_matrix'])
+        self.kalori = self.scorer.kalori
 
     def _load_and_process_data(self, data_path):
-        print(f"Membaca dan memproses data dari '{data_path}'...")
-        df_resto = pd.read_json(data_path, orient='records')
+        log.info("Membaca dan memproses data dari '%s'...", data_path)
+        with open(data_path, 'r', encoding='utf-8') as f: raw_text = f.read()
+        restaurants_data = self._process_restaurants(json.loads(raw_text))
+        df_resto = pd.read_json(io.StringIO(raw_text), orient='records')
         
         rows = []
         for index, resto in df_resto.iterrows():
@@ -35,6 +144,8 @@ class MealPlanner:
         df['kalori'] = pd.to_numeric(df['kalori'], errors='coerce')
         
         df.dropna(subset=['Harga', 'kalori', 'tags', 'Kategori'], inplace=True)
+        # Label index = posisi baris (indeks numerik & optimizer memakai posisi)
+        df.reset_index(drop=True, inplace=True)
 
         df['Harga'] = df['Harga'].astype(np.int64)
         df['kalori'] = df['kalori'].astype(np.int64)
@@ -46,50 +157,110 @@ class MealPlanner:
         df['alergen_gluten'] = df['tags'].apply(lambda x: 'alergen gluten' in x if isinstance(x, list) else False)
         df['alergen_kedelai'] = df['tags'].apply(lambda x: 'alergen kedelai' in x if isinstance(x, list) else False)
         
-        return df
+        return df, restaurants_data
 
-    def _build_model(self):
-        print("Membangun model TF-IDF...")
+    # Ringkasan restoran untuk endpoint /restaurants
+    def _process_restaurants(self, raw_data):
+        return [{"id": i + 1, "nama_warung": r.get('nama_restoran'), "rating": r.get('rating'), "kategori": "Umum", "koordinat": {"latitude": r.get('latitude'), "longitude": r.get('longitude')}} for i, r in enumerate(raw_data)]
+
+    def _build_model(self, previous=None):
         self.df['fitur_model'] = self.df['tags'].apply(lambda x: ' '.join(x) if isinstance(x, list) else '')
+        if previous is not None and same_columns(previous.df, self.df, ['fitur_model']):
+            log.info("Tag menu tidak berubah, model TF-IDF lama dipakai ulang.")
+            return previous.tfidf, previous.tfidf_matrix
+        log.info("Membangun model TF-IDF...")
         tfidf = TfidfVectorizer()
         tfidf_matrix = tfidf.fit_transform(self.df['fitur_model'])
         return tfidf, tfidf_matrix
 
-    def _recommend_food(self, dataframe, target_kalori, preferensi, alergi, budget, top_n=10, w_taste=0.6, w_calorie=0.4):
-        df_filtered = dataframe.copy()
-        for a in alergi:
-            alergen_col = f'alergen_{a.lower()}'
-            if alergen_col in df_filtered.columns:
-                df_filtered = df_filtered[~df_filtered[alergen_col]]
-        
-        df_filtered = df_filtered[df_filtered['Harga'] <= budget]
-        
-        if df_filtered.empty:
-            return pd.DataFrame()
+    def find_nearby_foods(self, latitude, longitude, limit=20):
+        rows, distances = self.spatial_index.nearest_rows(latitude, longitude, limit=limit)
+        nearby_foods_df = self.df.iloc[rows].copy()
+        nearby_foods_df['jarak_km'] = distances
+        return nearby_foods_df
 
-        filtered_indices = df_filtered.index
-        user_pref_text = ' '.join(preferensi).lower()
-        user_vector = self.tfidf.transform([user_pref_text])
-        
-        taste_scores = cosine_similarity(user_vector, self.tfidf_matrix[filtered_indices])
-        
-        if target_kalori > 0:
-            calorie_diff = abs(df_filtered['kalori'] - target_kalori)
-            calorie_scores = 1 / (1 + calorie_diff / target_kalori)
+    # Satu baris per nama menu dari `scored_names` [(nama, skor)], urutan dipertahankan: baris yang lolos
+    # alergen & budget dengan skor rating tertinggi. Nama tanpa baris yang lolos dilewati.
+    def menu_rows(self, scored_names, alergi=(), budget=np.inf):
+        chosen, scores = [], []
+        for name, score in scored_names:
+            rows = self.scorer.filter_rows(self.candidate_index.name_rows(name), alergi, budget)
+            if len(rows):
+                chosen.append(rows[np.argmax(self.menu_ratings.scores[rows])])
+                scores.append(score)
+        return self.df.iloc[chosen].assign(skor_rekomendasi=scores)
+
+    # Rekomendasi cold start: skor rasa preferensi + kecocokan kalori + rating menu (Bayesian),
+    # opsional dibatasi ke menu terdekat (dengan jarak_km). Satu baris per nama menu, nama di `exclude` dilewati.
+    @timed_stage('recommend_popular')
+    def recommend_popular(self, target_kalori, preferensi, alergi, budget=np.inf, latitude=None, longitude=None, n=20, exclude=()):
+        distances = None
+        if latitude is not None and longitude is not None:
+            candidates, jarak = self.spatial_index.nearest_rows(latitude, longitude, limit=COLD_START_NEARBY_ROWS)
+            distances = pd.Series(jarak, index=candidates)
         else:
-            calorie_scores = pd.Series([0] * len(df_filtered), index=df_filtered.index)
-            
-        final_scores = (w_taste * taste_scores.flatten()) + (w_calorie * calorie_scores.values)
-        df_filtered['skor_akhir'] = final_scores
-        return df_filtered.sort_values(by='skor_akhir', ascending=False).head(top_n)
-
-    def _recommend_combo_meal(self, dataframe, target_kalori, preferensi, alergi, budget, w_taste=0.6, w_calorie=0.4):
-        anchor_recs = self._recommend_food(dataframe, target_kalori, preferensi, alergi, budget, top_n=3, w_taste=w_taste, w_calorie=w_calorie)
+            candidates = np.arange(len(self.df))
+        if exclude:
+            candidates = candidates[~self.candidate_index.name_mask(exclude)[candidates]]
+
+        w_taste, w_calorie, w_rating = COLD_START_WEIGHTS
+        recommendations = self._rank_food(candidates, target_kalori, preferensi, alergi, budget, n * 3, w_taste, w_calorie, None, w_rating)
+        if recommendations.empty:
+            return recommendations
+        recommendations = recommendations[~recommendations['Nama'].str.lower().duplicated()].head(n)
+        if distances is not None:
+            recommendations = recommendations.assign(jarak_km=distances.reindex(recommendations.index).to_numpy())
+        return recommendations
+
+    # `cache_key`: deskriptor himpunan kandidat (slot + tag yang dikecualikan); None = tidak di-cache.
+    # `w_rating`: None = self.w_rating.
+    @timed_stage('recommend_food')
+    def _recommend_food(self, candidates, target_kalori, preferensi, alergi, budget, top_n=10, w_taste=0.6, w_calorie=0.4, taste=None, cache_key=None, w_rating=None):
+        if w_rating is None:
+            w_rating = self.w_rating
+        key = None
+        if cache_key is not None and self.ranking_cache is not None:
+            # Versi skor rating ikut di key: ranking lama tidak dipakai lagi setelah ada ulasan baru
+            rating_version = self.menu_ratings.version if w_rating else None
+            key = (self.dataset_version, cache_key, profile_fingerprint(preferensi, alergi), round(float(target_kalori), 4), round(float(budget), 4), top_n, w_taste, w_calorie, w_rating, rating_version)
+            cached = self.ranking_cache.get(key)
+            if cached is not None:
+                return cached
+
+        recommendations = self._rank_food(candidates, target_kalori, preferensi, alergi, budget, top_n, w_taste, w_calorie, taste, w_rating)
+        if key is not None:
+            self.ranking_cache.set(key, recommendations)
+        return recommendations
+
+    def _rank_food(self, candidates, target_kalori, preferensi, alergi, budget, top_n, w_taste, w_calorie, taste, w_rating=0.0):
+        # `candidates` = posisi baris di self.df; hanya baris pemenang yang dijadikan DataFrame
+        with stage_timer('filter_rows'):
+            filtered_rows = self.scorer.filter_rows(candidates, alergi, budget)
+
+        if len(filtered_rows) == 0:
+            return pd.DataFrame()
+
+        user_vector = None
+        if taste is None:
+            user_pref_text = ' '.join(preferensi).lower()
+            with stage_timer('tfidf_transform'):
+                user_vector = self.tfidf.transform([user_pref_text])
+
+        with stage_timer('score'):
+            final_scores = self.scorer.score(filtered_rows, user_vector, target_kalori, w_taste=w_taste, w_calorie=w_calorie, taste=taste,
+                                             rating=self.menu_ratings.scores, w_rating=w_rating)
+        with stage_timer('top_n'):
+            top_rows, top_scores = self.scorer.top_n(filtered_rows, final_scores, top_n)
+        return self.df.iloc[top_rows].assign(skor_akhir=top_scores)
+
+    @timed_stage('recommend_combo_meal')
+    def _recommend_combo_meal(self, candidates, target_kalori, preferensi, alergi, budget, w_taste=0.6, w_calorie=0.4, taste=None, cache_key=None, rng=None):
+        anchor_recs = self._recommend_food(candidates, target_kalori, preferensi, alergi, budget, top_n=3, w_taste=w_taste, w_calorie=w_calorie, taste=taste, cache_key=cache_key)
         
         if anchor_recs.empty:
             return []
 
-        anchor_dish = anchor_recs.sample(1).iloc[0]
+        anchor_dish = self._pick(anchor_recs, rng)
         combo = [anchor_dish.to_dict()]
         
         gap_kalori = target_kalori - anchor_dish['kalori']
@@ -98,105 +269,243 @@ class MealPlanner:
         if gap_kalori < 100 or sisa_budget < 3000:
             return combo
 
-        nama_restoran_anchor = anchor_dish['nama_restoran']
-        df_complements = self.df[(self.df['nama_restoran'] == nama_restoran_anchor) & (self.df['Nama'] != anchor_dish['Nama'])].copy()
-        
-        kategori_pelengkap = ['minuman', 'nasi', 'lauk tambahan', 'sayur', 'cemilan', 'sambal', 'kerupuk', 'kuah']
-        df_complements = df_complements[df_complements['Kategori'].str.lower().isin(kategori_pelengkap)]
-        df_complements = df_complements[df_complements['Harga'] <= sisa_budget]
+        complement_rows = self.complement_index.best_combo(
+            anchor_dish['nama_restoran'], gap_kalori, sisa_budget, exclude_nama=anchor_dish['Nama'], max_items=self.max_pelengkap
+        )
+        combo.extend(self.df.iloc[row].to_dict() for row in complement_rows)
+        return combo
 
-        if df_complements.empty:
-            return combo
+    # Kandidat slot: `kandidat_slot` (sudah difilter alergen) dipakai ulang lintas hari bila ada,
+    # `blokir` = mask baris yang sudah dipakai di hari lain (diabaikan jika menghabiskan kandidat).
+    def _kandidat_slot(self, slot, tag_terpakai, kandidat_slot=None, blokir=None):
+        rows = self.candidate_index.slot_rows(slot) if kandidat_slot is None else kandidat_slot[slot]
+        if tag_terpakai:
+            rows = rows[~self.candidate_index.any_tag_mask(tag_terpakai)[rows]]
+        if blokir is not None:
+            rows_bebas = rows[~blokir[rows]]
+            if len(rows_bebas) > 0:
+                rows = rows_bebas
+        return rows
 
-        df_complements['calorie_fit_score'] = abs(df_complements['kalori'] - gap_kalori)
-        best_complement = df_complements.sort_values(by='calorie_fit_score').iloc[0]
-        combo.append(best_complement.to_dict())
-        return combo
+    # Kandidat dengan mask `blokir` (mode mingguan) bergantung pada riwayat, jadi tidak di-cache.
+    def _slot_cache_key(self, slot, tag_terpakai, blokir=None):
+        if blokir is not None:
+            return None
+        return (slot, tuple(sorted(tag_terpakai)))
+
+    # Pilih satu baris secara acak lewat indeks (tanpa DataFrame.sample)
+    def _pick(self, recommendations, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        return recommendations.iloc[rng.integers(len(recommendations))]
+
+    # `seed`: int atau np.random.Generator; None = acak. Lihat plan_seed() untuk seed per user/tanggal.
+    # `mode`: lihat PLAN_MODES; mode 'optimal' kembali ke greedy bila melewati batas waktu optimizer.
+    @timed_stage('create_daily_meal_plan')
+    def create_daily_meal_plan(self, target_kalori_harian, preferensi, alergi, budget_harian, taste=None, seed=None, mode='greedy'):
+        if mode == 'optimal':
+            meal_plan = self._plan_day_optimal(target_kalori_harian, preferensi, alergi, budget_harian, taste=taste)
+            if meal_plan is not None:
+                return meal_plan
+            log.warning("Optimizer melewati batas %s ms, memakai mode greedy.", self.optimizer.time_limit_ms)
+        rng = np.random.default_rng(seed)
+        meal_plan, _ = self._plan_day(target_kalori_harian, preferensi, alergi, budget_harian, taste=taste, rng=rng)
+        return meal_plan
 
-    def create_daily_meal_plan(self, target_kalori_harian, preferensi, alergi, budget_harian):
+    # `rekomendasi_sarapan`: ranking sarapan yang sudah dihitung (mode batch); None = dihitung di sini.
+    def _plan_day(self, target_kalori_harian, preferensi, alergi, budget_harian, taste=None, kandidat_slot=None, blokir=None, tag_terpakai=(), rng=None,
+                  rekomendasi_sarapan=None):
         meal_plan = {}
         sisa_kalori = target_kalori_harian
         sisa_budget = budget_harian
-        tag_utama_terpakai = []
-        SARAPAN_PERCENT = 0.25
-        MAKAN_SIANG_PERCENT = 0.40
+        tag_utama_terpakai = list(tag_terpakai)
+        # Durasi per slot (ms) untuk histogram metrics dan log debug
+        durasi_ms = {}
+        mulai = time.perf_counter()
 
-        print("\n1. Merencanakan Sarapan...")
-        df_sarapan = self.df[self.df['tags'].apply(lambda tags: 'sarapan' in tags if isinstance(tags, list) else False)].copy()
+        kandidat_sarapan = self._kandidat_slot('sarapan', tag_utama_terpakai, kandidat_slot, blokir)
     
-        rekomendasi_sarapan = self._recommend_food(df_sarapan, target_kalori_harian * SARAPAN_PERCENT, preferensi, alergi, budget_harian * SARAPAN_PERCENT, top_n=5)
+        if rekomendasi_sarapan is None:
+            rekomendasi_sarapan = self._recommend_food(kandidat_sarapan, target_kalori_harian * SARAPAN_PERCENT, preferensi, alergi, budget_harian * SARAPAN_PERCENT, top_n=SARAPAN_TOP_N, taste=taste, cache_key=self._slot_cache_key('sarapan', tag_utama_terpakai, blokir))
         
         if not rekomendasi_sarapan.empty:
-            pilihan = rekomendasi_sarapan.sample(1).iloc[0]
+            pilihan = self._pick(rekomendasi_sarapan, rng)
             meal_plan['sarapan'] = [pilihan.to_dict()]
             sisa_kalori -= pilihan['kalori']
             sisa_budget -= pilihan['Harga']
             for tag in pilihan['tags']:
-                if tag in ['bubur', 'soto', 'lontong', 'ketan', 'roti']:
+                if tag in TAG_UTAMA_SARAPAN:
                     tag_utama_terpakai.append(tag)
                     break
-            print(f"-> Sarapan terpilih: {pilihan['Nama']}")
+            # Mode mingguan: menu yang sama juga tidak dipakai dua kali dalam satu hari
+            if blokir is not None:
+                blokir = blokir | self.candidate_index.name_mask([pilihan['Nama']])
+            log.debug("Sarapan terpilih: %s", pilihan['Nama'])
         else:
             meal_plan['sarapan'] = []
-            print("-> Tidak ditemukan sarapan yang cocok.")
+            log.debug("Tidak ditemukan sarapan yang cocok.")
+        durasi_ms['sarapan'], mulai = (time.perf_counter() - mulai) * 1000, time.perf_counter()
 
         # --- MAKAN SIANG ---
-        print("\n2. Merencanakan Makan Siang...")
-        df_siang = self.df[self.df['tags'].apply(lambda tags: 'maincourse' in tags if isinstance(tags, list) else False)].copy()
-        if tag_utama_terpakai:
-            df_siang = df_siang[df_siang['tags'].apply(lambda tags: not any(t in tags for t in tag_utama_terpakai))]
+        kandidat_siang = self._kandidat_slot('maincourse', tag_utama_terpakai, kandidat_slot, blokir)
         
-        combo_siang = self._recommend_combo_meal(df_siang, target_kalori_harian * MAKAN_SIANG_PERCENT, preferensi, alergi, budget_harian * MAKAN_SIANG_PERCENT)
+        combo_siang = self._recommend_combo_meal(kandidat_siang, target_kalori_harian * MAKAN_SIANG_PERCENT, preferensi, alergi, budget_harian * MAKAN_SIANG_PERCENT, taste=taste, cache_key=self._slot_cache_key('maincourse', tag_utama_terpakai, blokir), rng=rng)
         meal_plan['makan_siang'] = combo_siang
         
         if combo_siang:
-            print(f"-> Paket Makan Siang terpilih:")
             for item in combo_siang:
                 sisa_kalori -= item['kalori']
                 sisa_budget -= item['Harga']
-                print(f"   - {item['Nama']}")
                 for tag in item.get('tags', []):
-                    if tag in ['ayam', 'sate', 'bakso', 'rawon', 'gulai', 'ikan', 'bebek', 'geprek', 'penyetan']:
+                    if tag in TAG_UTAMA_MAKAN:
                         tag_utama_terpakai.append(tag)
                         break
+            if blokir is not None:
+                blokir = blokir | self.candidate_index.name_mask([item['Nama'] for item in combo_siang])
+            log.debug("Paket makan siang terpilih: %s", [item['Nama'] for item in combo_siang])
         else:
-            print("-> Tidak ditemukan makan siang yang cocok.")
+            log.debug("Tidak ditemukan makan siang yang cocok.")
+        durasi_ms['makan_siang'], mulai = (time.perf_counter() - mulai) * 1000, time.perf_counter()
 
         # --- MAKAN MALAM ---
-        print("\n3. Merencanakan Makan Malam...")
-        df_malam_candidates = self.df[self.df['tags'].apply(lambda tags: 'maincourse' in tags if isinstance(tags, list) else False)].copy()
-        if tag_utama_terpakai:
-            df_malam_candidates = df_malam_candidates[df_malam_candidates['tags'].apply(lambda tags: not any(t in tags for t in tag_utama_terpakai))]
+        kandidat_malam = self._kandidat_slot('maincourse', tag_utama_terpakai, kandidat_slot, blokir)
 
         target_kalori_malam = sisa_kalori if sisa_kalori > 0 else 0
         budget_malam = sisa_budget if sisa_budget > 0 else 0
         
-        df_malam_strict = pd.DataFrame()
-        if target_kalori_malam > 0 and not df_malam_candidates.empty:
+        kandidat_malam_ketat = kandidat_malam[:0]
+        if target_kalori_malam > 0 and len(kandidat_malam) > 0:
             min_kalori, max_kalori = target_kalori_malam * 0.75, target_kalori_malam * 1.25
-            print(f"   Mencari makan malam dengan rentang kalori ketat: {min_kalori:.0f} - {max_kalori:.0f} kkal")
-            df_malam_strict = df_malam_candidates[(df_malam_candidates['kalori'] >= min_kalori) & (df_malam_candidates['kalori'] <= max_kalori)]
+            kalori_malam = self.kalori[kandidat_malam]
+            kandidat_malam_ketat = kandidat_malam[(kalori_malam >= min_kalori) & (kalori_malam <= max_kalori)]
         
-        if not df_malam_strict.empty:
-            print("   -> Kandidat ditemukan dalam rentang kalori ketat.")
-            combo_malam = self._recommend_combo_meal(df_malam_strict, target_kalori_malam, preferensi, alergi, budget_malam, w_taste=0.3, w_calorie=0.7)
+        if len(kandidat_malam_ketat) > 0:
+            combo_malam = self._recommend_combo_meal(kandidat_malam_ketat, target_kalori_malam, preferensi, alergi, budget_malam, w_taste=0.3, w_calorie=0.7, taste=taste, cache_key=self._slot_cache_key('maincourse-ketat', tag_utama_terpakai, blokir), rng=rng)
         else:
-            print("   -> Pencarian ketat gagal. Mencoba pencarian longgar...")
-            combo_malam = self._recommend_combo_meal(df_malam_candidates, target_kalori_malam, preferensi, alergi, budget_malam, w_taste=0.3, w_calorie=0.7)
+            log.debug("Pencarian makan malam ketat gagal, mencoba pencarian longgar.")
+            combo_malam = self._recommend_combo_meal(kandidat_malam, target_kalori_malam, preferensi, alergi, budget_malam, w_taste=0.3, w_calorie=0.7, taste=taste, cache_key=self._slot_cache_key('maincourse', tag_utama_terpakai, blokir), rng=rng)
         
         meal_plan['makan_malam'] = combo_malam
-        if combo_malam:
-            print(f"-> Paket Makan Malam terpilih:")
-            for item in combo_malam:
-                print(f"   - {item['Nama']}")
-        else:
-            print("-> Tidak ditemukan makan malam yang cocok.")
-            
-        for meal_type, meal_list in meal_plan.items():
-            if meal_list:
-                temp_df = pd.DataFrame(meal_list)
-                json_string = temp_df.to_json(orient='records')
-                cleaned_list = json.loads(json_string)
-                meal_plan[meal_type] = cleaned_list
-                
-        return meal_plan
\ No newline at end of file
+        durasi_ms['makan_malam'] = (time.perf_counter() - mulai) * 1000
+        for slot, ms in durasi_ms.items():
+            observe_stage(f'slot_{slot}', ms / 1000)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Meal plan greedy selesai.", extra={
+                'stage_ms': {slot: round(ms, 3) for slot, ms in durasi_ms.items()},
+                'makan_malam': [item['Nama'] for item in combo_malam], 'kandidat_malam_ketat': len(kandidat_malam_ketat),
+            })
+
+        return self._clean_meal_plan(meal_plan), tag_utama_terpakai[len(tag_terpakai):]
+
+    def _plan_day_optimal(self, target_kalori_harian, preferensi, alergi, budget_harian, taste=None):
+        mulai = time.perf_counter()
+        solusi = self.optimizer.solve(self, target_kalori_harian, preferensi, alergi, budget_harian, taste=taste)
+        durasi = time.perf_counter() - mulai
+        observe_stage('optimizer', durasi)
+        if solusi is None:
+            return None
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Meal plan optimal selesai.", extra={'stage_ms': {'optimizer': round(durasi * 1000, 3)}})
+        meal_plan = {}
+        for meal_type, opsi in solusi.items():
+            meal_plan[meal_type] = []
+            if opsi is not None:
+                meal_plan[meal_type] = [self.df.iloc[row].to_dict() for row in opsi.rows]
+                meal_plan[meal_type][0]['skor_akhir'] = opsi.skor
+        return self._clean_meal_plan(meal_plan)
+
+    # Item per slot -> dict native siap JSON (NaN -> None, tipe numpy -> Python) tanpa round-trip string
+    @timed_stage('clean_plan')
+    def _clean_meal_plan(self, meal_plan):
+        return {meal_type: clean_records(meal_list) for meal_type, meal_list in meal_plan.items()}
+
+    # Mode batch, per chunk user:
+    # - preferensi di-transform sekaligus, skor rasa = satu perkalian matriks;
+    # - slot sarapan (tidak bergantung pilihan sebelumnya) di-ranking untuk semua user sekaligus:
+    #   mask alergen per kombinasi alergi, mask budget, skor, dan top-n berupa operasi matriks.
+    # Makan siang & malam tetap per user karena sisa kalori/budget bergantung menu yang diundi
+    # sebelumnya; mode 'optimal' tetap per user lewat create_daily_meal_plan.
+    # Hasil sama dengan create_daily_meal_plan per profil (seed yang sama).
+    # `profiles` = list dict dengan key target_kalori_harian, preferensi, alergi, budget_harian (+ seed, mode opsional).
+    def create_daily_meal_plans_batch(self, profiles, chunk_size=512):
+        plans = []
+        for start in range(0, len(profiles), chunk_size):
+            chunk = profiles[start:start + chunk_size]
+            user_matrix = self.tfidf.transform([' '.join(p['preferensi']).lower() for p in chunk])
+            taste_matrix = self.scorer.taste_matrix(user_matrix)
+            sarapan = self._rank_sarapan_batch(chunk, taste_matrix)
+            for profile, taste, rekomendasi_sarapan in zip(chunk, taste_matrix, sarapan):
+                if rekomendasi_sarapan is None:
+                    plans.append(self.create_daily_meal_plan(
+                        target_kalori_harian=profile['target_kalori_harian'], preferensi=profile['preferensi'],
+                        alergi=profile['alergi'], budget_harian=profile['budget_harian'], taste=taste, seed=profile.get('seed'), mode=profile.get('mode', 'greedy')
+                    ))
+                    continue
+                meal_plan, _ = self._plan_day(
+                    profile['target_kalori_harian'], profile['preferensi'], profile['alergi'], profile['budget_harian'],
+                    taste=taste, rng=np.random.default_rng(profile.get('seed')), rekomendasi_sarapan=rekomendasi_sarapan
+                )
+                plans.append(meal_plan)
+        return plans
+
+    # Ranking sarapan semua profil greedy di chunk (None untuk profil mode 'optimal'), setara
+    # _rank_food per user: baris slot sarapan -> filter alergen & budget -> skor -> top-n.
+    @timed_stage('rank_sarapan_batch')
+    def _rank_sarapan_batch(self, chunk, taste_matrix):
+        rekomendasi = [None] * len(chunk)
+        winners = [None] * len(chunk)
+        groups = {}
+        for i, profile in enumerate(chunk):
+            if profile.get('mode', 'greedy') != 'optimal':
+                groups.setdefault(self.scorer.allergen_mask(profile['alergi']), []).append(i)
+        slot_rows = self.candidate_index.slot_rows('sarapan')
+        for members in groups.values():
+            rows = self.scorer.filter_rows(slot_rows, chunk[members[0]]['alergi'], np.inf)
+            harga = self.scorer.harga[rows]
+            block = max(1, BATCH_SCORE_ELEMENTS // max(len(rows), 1))
+            for block_start in range(0, len(members), block):
+                users = members[block_start:block_start + block]
+                targets = np.array([chunk[i]['target_kalori_harian'] * SARAPAN_PERCENT for i in users], dtype=np.float64)
+                budgets = np.array([chunk[i]['budget_harian'] * SARAPAN_PERCENT for i in users], dtype=np.float64)
+                scores = self.scorer.score_batch(rows, taste_matrix[users], targets, rating=self.menu_ratings.scores, w_rating=self.w_rating)
+                scores[harga[None, :] > budgets[:, None]] = -np.inf
+                for i, top in zip(users, self.scorer.top_n_batch(rows, scores, SARAPAN_TOP_N)):
+                    winners[i] = top
+        # Baris pemenang semua user dijadikan satu DataFrame, lalu diiris per user
+        users = [i for i, top in enumerate(winners) if top is not None and len(top[0])]
+        if users:
+            semua = self.df.iloc[np.concatenate([winners[i][0] for i in users])].assign(skor_akhir=np.concatenate([winners[i][1] for i in users]))
+            bounds = np.cumsum([0] + [len(winners[i][0]) for i in users])
+            for i, start, stop in zip(users, bounds[:-1], bounds[1:]):
+                rekomendasi[i] = semua.iloc[start:stop]
+        for i, top in enumerate(winners):
+            if top is not None and not len(top[0]):
+                rekomendasi[i] = pd.DataFrame()
+        return rekomendasi
+
+    # Rencana N hari dalam satu pass: vektor skor rasa dan kandidat slot (sudah difilter
+    # alergen) dihitung sekali. Menu yang sama tidak diulang selama periode, tag utama
+    # hari sebelumnya dihindari, dan budget mingguan dibagi rata ke sisa hari.
+    def create_weekly_meal_plan(self, target_kalori_harian, preferensi, alergi, budget_harian=None, n_hari=7, budget_mingguan=None, seed=None):
+        rng = np.random.default_rng(seed)
+        if budget_mingguan is None:
+            budget_mingguan = budget_harian * n_hari
+
+        user_vector = self.tfidf.transform([' '.join(preferensi).lower()])
+        taste = self.scorer.taste_matrix(user_vector)[0]
+        kandidat_slot = {slot: self.scorer.filter_rows(self.candidate_index.slot_rows(slot), alergi, np.inf) for slot in SLOT_TAGS}
+        blokir = np.zeros(len(self.df), dtype=bool)
+
+        weekly_plan = []
+        sisa_budget = budget_mingguan
+        tag_kemarin = []
+        for hari in range(n_hari):
+            budget_hari = max(sisa_budget, 0) / (n_hari - hari)
+            meal_plan, tag_kemarin = self._plan_day(
+                target_kalori_harian, preferensi, alergi, budget_hari,
+                taste=taste, kandidat_slot=kandidat_slot, blokir=blokir, tag_terpakai=tag_kemarin, rng=rng
+            )
+            items = [item for meal_list in meal_plan.values() for item in meal_list]
+            sisa_budget -= sum(item['Harga'] for item in items)
+            blokir |= self.candidate_index.name_mask([item['Nama'] for item in items])
+            weekly_plan.append(meal_plan)
+        return weekly_plan
\ No newline at end of file
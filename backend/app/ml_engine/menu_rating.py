@@ -0,0 +1,85 @@
+# app/ml_engine/menu_rating.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Bobot prior (setara jumlah ulasan "semu"): menu dengan sedikit ulasan tetap dekat ke rating restorannya.
+PRIOR_WEIGHT = 5.0
+# Prior bila restoran tidak punya rating sama sekali di dataset
+DEFAULT_PRIOR = 4.0
+RATING_MIN, RATING_MAX = 1.0, 5.0
+
+# Skor rating per baris self.df (array dense, sejajar baris): rata-rata Bayesian
+#   (C * rating_restoran + total_rating_menu) / (C + jumlah_ulasan_menu)
+# dinormalisasi ke [0, 1]. Agregat ulasan dikunci per nama menu (lowercase, sama dengan
+# CandidateIndex.name_lookup); perubahan satu menu hanya menghitung ulang baris menu tersebut.
+class MenuRatingVector:
+    def __init__(self, df, candidate_index, prior_weight=PRIOR_WEIGHT, totals=None):
+        self.prior_weight = float(prior_weight)
+        prior = pd.to_numeric(df['rating_restoran'], errors='coerce').to_numpy(dtype=np.float64)
+        valid = np.isfinite(prior)
+        fill = float(prior[valid].mean()) if valid.any() else DEFAULT_PRIOR
+        self.prior = np.clip(np.where(valid, prior, fill), RATING_MIN, RATING_MAX)
+
+        self.candidate_index = candidate_index
+        self.name_codes = np.asarray(candidate_index.name_codes)
+        self.name_lookup = candidate_index.name_lookup
+        n_names = len(self.name_lookup)
+
+        self.count = np.zeros(n_names, dtype=np.float64)
+        self.total = np.zeros(n_names, dtype=np.float64)
+        # Agregat mentah per nama (termasuk menu yang tidak ada di dataset, untuk hot reload)
+        self.totals = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self.scores = self._compute(np.arange(len(self.prior)))
+        if totals:
+            self.load(totals)
+
+    def _compute(self, rows):
+        codes = self.name_codes[rows]
+        mean = (self.prior_weight * self.prior[rows] + self.total[codes]) / (self.prior_weight + self.count[codes])
+        return (np.clip(mean, RATING_MIN, RATING_MAX) - RATING_MIN) / (RATING_MAX - RATING_MIN)
+
+    # Ganti seluruh agregat: `totals` = {menu_name: (jumlah_ulasan, total_rating)}.
+    # Versi hanya naik bila skor berubah (cache ranking tetap berlaku untuk refresh tanpa perubahan).
+    def load(self, totals):
+        merged = {}
+        for name, (count, total) in totals.items():
+            if not isinstance(name, str):
+                continue
+            entry = merged.setdefault(name.lower(), [0.0, 0.0])
+            entry[0] += float(count or 0)
+            entry[1] += float(total or 0)
+        count, total = np.zeros_like(self.count), np.zeros_like(self.total)
+        for name, (c, t) in merged.items():
+            code = self.name_lookup.get(name)
+            if code is not None:
+                count[code], total[code] = c, t
+        with self._lock:
+            self.totals = merged
+            if np.array_equal(count, self.count) and np.array_equal(total, self.total):
+                return False
+            self.count, self.total = count, total
+            self.scores = self._compute(np.arange(len(self.prior)))
+            self.version += 1
+        return True
+
+    # Update inkremental setelah ulasan disimpan (delta yang sama dengan apply_menu_rating_delta).
+    def apply(self, menu_name, count_delta, sum_delta):
+        if not isinstance(menu_name, str):
+            return
+        name = menu_name.lower()
+        with self._lock:
+            entry = self.totals.setdefault(name, [0.0, 0.0])
+            entry[0] += float(count_delta)
+            entry[1] += float(sum_delta)
+            code = self.name_lookup.get(name)
+            if code is None:
+                return
+            self.count[code], self.total[code] = entry
+            rows = self.candidate_index.code_rows(code)
+            self.scores[rows] = self._compute(rows)
+            self.version += 1
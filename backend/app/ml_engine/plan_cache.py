@@ -0,0 +1,59 @@
+# app/ml_engine/plan_cache.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Fingerprint profil untuk kunci cache: preferensi/alergi dinormalisasi (urutan & huruf
+# besar tidak berpengaruh pada TF-IDF maupun filter alergen).
+def profile_fingerprint(preferensi, alergi):
+    payload = json.dumps([sorted(p.lower() for p in preferensi), sorted(a.lower() for a in alergi)])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+# Cache LRU + TTL untuk daftar kandidat terurut per slot makan (bagian deterministik planner).
+# Pemilihan acak dari daftar tersebut tetap dilakukan per request.
+class RankingCache:
+    def __init__(self, maxsize=4096, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or entry[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
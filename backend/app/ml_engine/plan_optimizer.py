@@ -0,0 +1,100 @@
+# app/ml_engine/plan_optimizer.py
+
+import time
+from collections import namedtuple
+
+TAG_UTAMA_SARAPAN = ['bubur', 'soto', 'lontong', 'ketan', 'roti']
+TAG_UTAMA_MAKAN = ['ayam', 'sate', 'bakso', 'rawon', 'gulai', 'ikan', 'bebek', 'geprek', 'penyetan']
+
+# (key meal plan, slot kandidat, porsi target kalori/budget, w_taste, w_calorie, pakai pelengkap, tag utama)
+SLOT_OPTIMASI = [
+    ('sarapan', 'sarapan', 0.25, 0.6, 0.4, False, TAG_UTAMA_SARAPAN),
+    ('makan_siang', 'maincourse', 0.40, 0.6, 0.4, True, TAG_UTAMA_MAKAN),
+    ('makan_malam', 'maincourse', 0.35, 0.3, 0.7, True, TAG_UTAMA_MAKAN),
+]
+
+# Satu pilihan untuk satu slot: anchor (+ pelengkap). `rows` = posisi baris df, anchor di depan.
+Opsi = namedtuple('Opsi', 'skor harga kalori rows tag_utama tag_anchor nama')
+
+def kecocokan_kalori(kalori, target):
+    return 1 / (1 + abs(kalori - target) / target) if target > 0 else 0.0
+
+# Mode optimal: sarapan, makan siang, dan makan malam dipilih bersamaan dengan beam search atas
+# top-k kandidat per slot (daftar terurut yang sama dengan mode greedy, jadi ikut ter-cache).
+# Objektif = jumlah skor rasa+kalori tiap slot + kecocokan total kalori harian terhadap target,
+# dengan total harga <= budget harian dan menu tidak berulang. Tag utama yang sama antar slot
+# dikenai penalti (bukan dibuang) agar selalu ada solusi. Melewati `time_limit_ms` -> None
+# (pemanggil kembali ke mode greedy); batas waktu dicek saat ekspansi beam dan saat menyusun
+# varian pelengkap per anchor (langkah terberat bila max_pelengkap > 1).
+class PlanOptimizer:
+    def __init__(self, top_k=8, beam_width=32, time_limit_ms=50, w_total_kalori=1.0, penalti_tag=0.5):
+        self.top_k = top_k
+        self.beam_width = beam_width
+        self.time_limit_ms = time_limit_ms
+        self.w_total_kalori = w_total_kalori
+        self.penalti_tag = penalti_tag
+
+    def solve(self, planner, target_kalori_harian, preferensi, alergi, budget_harian, taste=None):
+        deadline = time.perf_counter() + self.time_limit_ms / 1000
+        # state: (skor, harga, kalori, opsi per slot, tag utama terpakai, nama menu terpakai)
+        beam = [(0.0, 0, 0, (), frozenset(), frozenset())]
+        porsi_kumulatif = 0.0
+        for _, slot, porsi, w_taste, w_calorie, pelengkap, tag_utama in SLOT_OPTIMASI:
+            opsi_slot = self._slot_options(planner, slot, target_kalori_harian * porsi, budget_harian * porsi, preferensi, alergi, budget_harian, w_taste, w_calorie, taste, pelengkap, tag_utama, deadline)
+            if opsi_slot is None:
+                return None
+            porsi_kumulatif += porsi
+            expanded = []
+            for skor, harga, kalori, pilihan, tags, nama in beam:
+                if time.perf_counter() > deadline:
+                    return None
+                for opsi in opsi_slot:
+                    if harga + opsi.harga > budget_harian or nama & opsi.nama:
+                        continue
+                    skor_baru = skor + opsi.skor - (self.penalti_tag if tags & opsi.tag_anchor else 0.0)
+                    expanded.append((skor_baru, harga + opsi.harga, kalori + opsi.kalori, pilihan + (opsi,), tags | opsi.tag_utama, nama | opsi.nama))
+            if not expanded:
+                # Tidak ada kandidat yang muat: slot dikosongkan seperti pada mode greedy
+                expanded = [(skor, harga, kalori, pilihan + (None,), tags, nama) for skor, harga, kalori, pilihan, tags, nama in beam]
+            target_kumulatif = target_kalori_harian * porsi_kumulatif
+            expanded.sort(key=lambda state: state[0] + self.w_total_kalori * kecocokan_kalori(state[2], target_kumulatif), reverse=True)
+            beam = expanded[:self.beam_width]
+        return {meal: opsi for (meal, *_), opsi in zip(SLOT_OPTIMASI, beam[0][3])}
+
+    # None bila `deadline` (time.perf_counter) terlewati sebelum semua opsi tersusun
+    def _slot_options(self, planner, slot, target_slot, budget_slot, preferensi, alergi, budget_harian, w_taste, w_calorie, taste, pelengkap, tag_utama, deadline=None):
+        recs = planner._recommend_food(
+            planner.candidate_index.slot_rows(slot), target_slot, preferensi, alergi, budget_harian, top_n=self.top_k,
+            w_taste=w_taste, w_calorie=w_calorie, taste=taste, cache_key=planner._slot_cache_key(slot, ())
+        )
+        if recs.empty:
+            return []
+        df, opsi_slot = planner.df, []
+        for row, skor in zip(recs.index, recs['skor_akhir']):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            harga, kalori = int(df['Harga'].iat[row]), int(df['kalori'].iat[row])
+            varian = [()]
+            gap_kalori = target_slot - kalori
+            if pelengkap and gap_kalori >= 100:
+                # Pelengkap dengan jatah budget slot dan dengan sisa budget harian (dipilih beam)
+                for budget_pelengkap in (budget_slot - harga, budget_harian - harga):
+                    if budget_pelengkap < 3000:
+                        continue
+                    rows = tuple(planner.complement_index.best_combo(df['nama_restoran'].iat[row], gap_kalori, budget_pelengkap, exclude_nama=df['Nama'].iat[row], max_items=planner.max_pelengkap))
+                    if rows and rows not in varian:
+                        varian.append(rows)
+            tags = df['tags'].iat[row]
+            for rows_pelengkap in varian:
+                rows = (int(row),) + rows_pelengkap
+                opsi_slot.append(Opsi(
+                    skor=float(skor), harga=harga + sum(int(df['Harga'].iat[r]) for r in rows_pelengkap),
+                    kalori=kalori + sum(int(df['kalori'].iat[r]) for r in rows_pelengkap), rows=rows,
+                    tag_utama=frozenset(tag for r in rows for tag in _tag_utama_pertama(df['tags'].iat[r], tag_utama)),
+                    tag_anchor=frozenset(tags), nama=frozenset(df['Nama'].iat[r] for r in rows),
+                ))
+        return opsi_slot
+
+# Tag utama pertama sebuah item (sama dengan pencatatan tag pada mode greedy)
+def _tag_utama_pertama(tags, tag_utama):
+    return [tag for tag in tags if tag in tag_utama][:1]
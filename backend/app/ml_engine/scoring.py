@@ -0,0 +1,127 @@
+# app/ml_engine/scoring.py
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+# Engine skoring berbasis array: harga, kalori, bit alergen dan matriks TF-IDF
+# (CSR, ter-normalisasi L2) disimpan sebagai array contiguous, sehingga skor
+# rasa + kalori dihitung dalam satu pass vektor tanpa menyalin DataFrame.
+class ScoringEngine:
+    def __init__(self, df, tfidf_matrix):
+        self.harga = np.ascontiguousarray(df['Harga'].to_numpy(dtype=np.int64))
+        self.kalori = np.ascontiguousarray(df['kalori'].to_numpy(dtype=np.int64))
+
+        self.allergen_names = [col[len('alergen_'):] for col in df.columns if col.startswith('alergen_')]
+        self.allergen_bits = np.zeros(len(df), dtype=np.uint32)
+        for bit, name in enumerate(self.allergen_names):
+            self.allergen_bits |= df[f'alergen_{name}'].to_numpy(dtype=bool).astype(np.uint32) << bit
+
+        # cosine_similarity = dot product setelah normalisasi L2
+        self.item_matrix = normalize(tfidf_matrix, norm='l2', copy=True).tocsr()
+
+    # Array numerik + metadata kecil (untuk shared_arrays)
+    def to_arrays(self):
+        arrays = {
+            'harga': self.harga, 'kalori': self.kalori, 'allergen_bits': self.allergen_bits,
+            'item_data': self.item_matrix.data, 'item_indices': self.item_matrix.indices, 'item_indptr': self.item_matrix.indptr,
+        }
+        return arrays, {'allergen_names': self.allergen_names, 'item_shape': list(self.item_matrix.shape)}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        scorer = cls.__new__(cls)
+        scorer.harga, scorer.kalori, scorer.allergen_bits = arrays['harga'], arrays['kalori'], arrays['allergen_bits']
+        scorer.allergen_names = meta['allergen_names']
+        scorer.item_matrix = sp.csr_matrix(
+            (arrays['item_data'], arrays['item_indices'], arrays['item_indptr']), shape=tuple(meta['item_shape']), copy=False
+        )
+        return scorer
+
+    def allergen_mask(self, alergi):
+        mask = 0
+        for a in alergi:
+            name = a.lower()
+            if name in self.allergen_names:
+                mask |= 1 << self.allergen_names.index(name)
+        return mask
+
+    # Posisi baris kandidat yang lolos filter alergen dan budget.
+    def filter_rows(self, candidates, alergi, budget):
+        keep = self.harga[candidates] <= budget
+        mask = self.allergen_mask(alergi)
+        if mask:
+            keep &= (self.allergen_bits[candidates] & mask) == 0
+        return candidates[keep]
+
+    def taste_scores(self, user_vector, rows):
+        user_vector = normalize(user_vector, norm='l2', copy=True)
+        return (self.item_matrix[rows] @ user_vector.T).toarray().ravel()
+
+    # Skor rasa banyak user sekaligus: satu perkalian sparse (n_user x n_baris).
+    def taste_matrix(self, user_matrix):
+        user_matrix = normalize(user_matrix, norm='l2', copy=True)
+        return (user_matrix @ self.item_matrix.T).toarray()
+
+    def calorie_scores(self, rows, target_kalori):
+        if target_kalori > 0:
+            calorie_diff = np.abs(self.kalori[rows] - target_kalori)
+            return 1 / (1 + calorie_diff / target_kalori)
+        return np.zeros(len(rows))
+
+    # `taste` opsional: vektor skor rasa penuh (hasil taste_matrix) untuk mode batch.
+    # `rating` opsional: vektor skor rating [0, 1] sejajar baris (MenuRatingVector.scores), dibobot `w_rating`.
+    def score(self, rows, user_vector, target_kalori, w_taste=0.6, w_calorie=0.4, taste=None, rating=None, w_rating=0.0):
+        taste_scores = taste[rows] if taste is not None else self.taste_scores(user_vector, rows)
+        scores = (w_taste * taste_scores) + (w_calorie * self.calorie_scores(rows, target_kalori))
+        if rating is not None and w_rating:
+            scores += w_rating * rating[rows]
+        return scores
+
+    # Mode batch: skor banyak user atas baris yang sama -> matriks (n_user x len(rows)).
+    # `taste`: baris taste_matrix per user, `target_kalori`: per user. Operasi per elemen sama
+    # dengan score(), jadi setiap baris matriks identik dengan skor per user.
+    def score_batch(self, rows, taste, target_kalori, w_taste=0.6, w_calorie=0.4, rating=None, w_rating=0.0):
+        target = np.asarray(target_kalori, dtype=np.float64)[:, None]
+        calorie_scores = np.zeros((len(target), len(rows)))
+        positive = target[:, 0] > 0
+        if positive.any():
+            calorie_scores[positive] = 1 / (1 + np.abs(self.kalori[rows] - target[positive]) / target[positive])
+        scores = (w_taste * taste[:, rows]) + (w_calorie * calorie_scores)
+        if rating is not None and w_rating:
+            scores += w_rating * rating[rows]
+        return scores
+
+    # Top-n per baris matriks skor (-inf = tidak lolos filter) dengan aturan urutan yang sama dengan
+    # top_n (seri = posisi baris). Hasil: list (rows, skor) per user.
+    def top_n_batch(self, rows, scores, n):
+        n_users, n_rows = scores.shape
+        n = min(n, n_rows)
+        if n <= 0:
+            return [(rows[:0], scores[i, :0]) for i in range(n_users)]
+        # Skor ke-n terbesar per user: kandidat = skor >= ambang (bisa > n bila ada seri)
+        kth = np.partition(scores, n_rows - n, axis=1)[:, n_rows - n]
+        users, cols = np.nonzero((scores >= kth[:, None]) & np.isfinite(scores))
+        top_scores = scores[users, cols]
+        order = np.lexsort((rows[cols], -top_scores, users))
+        users, cols, top_scores = users[order], cols[order], top_scores[order]
+        rank = np.arange(len(users)) - np.searchsorted(users, np.arange(n_users))[users]
+        keep = rank < n
+        users, cols, top_scores = users[keep], cols[keep], top_scores[keep]
+        bounds = np.searchsorted(users, np.arange(n_users + 1))
+        return [(rows[cols[start:stop]], top_scores[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    # Top-n dengan argpartition. Aturan urutan (dijaga tests/test_scoring.py): skor menurun, skor
+    # yang sama persis diurutkan menurut posisi baris di self.df (naik), termasuk seri di batas potong.
+    # Berbeda dengan sort_values versi DataFrame lama (quicksort, urutan seri tidak ditentukan);
+    # skor sendiri bisa beda ~1 ulp dari cosine_similarity karena urutan operasi float.
+    def top_n(self, rows, scores, n):
+        if n <= 0 or len(rows) == 0:
+            return rows[:0], scores[:0]
+        if len(scores) > n:
+            kth = np.argpartition(-scores, n - 1)[:n]
+            idx = np.flatnonzero(scores >= scores[kth].min())
+        else:
+            idx = np.arange(len(scores))
+        order = idx[np.lexsort((rows[idx], -scores[idx]))][:n]
+        return rows[order], scores[order]
@@ -0,0 +1,82 @@
+# app/ml_engine/shared_arrays.py
+
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+from .snapshot import prune_stale
+
+log = logging.getLogger(__name__)
+
+# Array numerik engine (skor, mask tag, indeks spasial, CSR TF-IDF) ditulis sekali sebagai
+# file .npy lalu di-mmap read-only oleh setiap worker, sehingga halaman memorinya dipakai
+# bersama lewat page cache OS. Taruh di /dev/shm untuk penyimpanan murni di RAM.
+
+def export_arrays(target_dir, components):
+    parent = os.path.dirname(os.path.abspath(target_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+    try:
+        layout = {}
+        for component, (arrays, meta) in components.items():
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f'{component}.{name}.npy'), np.ascontiguousarray(array))
+            layout[component] = {'arrays': list(arrays), 'meta': meta}
+        with open(os.path.join(tmp_dir, 'layout.json'), 'w', encoding='utf-8') as f:
+            json.dump(layout, f)
+        os.replace(tmp_dir, target_dir)
+    except OSError as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Worker lain mungkin sudah lebih dulu menulis direktori yang sama
+        if not os.path.isdir(target_dir):
+            log.warning("Gagal menulis shared arrays ke '%s': %s", target_dir, e)
+            return False
+    return True
+
+def map_arrays(target_dir):
+    layout_path = os.path.join(target_dir, 'layout.json')
+    if not os.path.isfile(layout_path):
+        return None
+    try:
+        with open(layout_path, 'r', encoding='utf-8') as f:
+            layout = json.load(f)
+        return {
+            component: ({name: np.load(os.path.join(target_dir, f'{component}.{name}.npy'), mmap_mode='r') for name in info['arrays']}, info['meta'])
+            for component, info in layout.items()
+        }
+    except (OSError, ValueError) as e:
+        log.warning("Shared arrays '%s' tidak bisa di-mmap: %s", target_dir, e)
+        return None
+
+# Matriks CSR <-> array data/indices/indptr + shape (komponen export_arrays / map_arrays)
+def csr_to_arrays(matrix):
+    matrix = matrix.tocsr()
+    return {'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr}, {'shape': list(matrix.shape)}
+
+def csr_from_arrays(arrays, meta):
+    return sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(meta['shape']), copy=False)
+
+# Array versi dataset lama tidak dipakai lagi setelah engine baru terpasang; worker yang masih
+# me-mmap file lama tetap aman (file yang terbuka tidak hilang di POSIX). Direktori dinamai kunci
+# snapshot, jadi hanya versi lama dataset yang sama yang dihapus (lihat snapshot.prune_stale).
+def prune_shared(shared_dir, keep):
+    prune_stale(shared_dir, keep)
+
+# Langkah preload (mis. sebelum gunicorn men-spawn worker):
+#   python -m app.ml_engine.shared_arrays <shared_dir> [data_path]
+if __name__ == '__main__':
+    from .meal_planner import MealPlanner
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    shared_dir = sys.argv[1]
+    data_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, 'data', 'dataset_restoran_sidoarjo_enriched.json')
+    engine = MealPlanner(data_path=data_path, shared_dir=shared_dir)
+    prune_shared(shared_dir, keep=engine.dataset_version)
+    log.info("Shared arrays siap di '%s'", os.path.join(shared_dir, engine.dataset_version))
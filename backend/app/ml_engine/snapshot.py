@@ -0,0 +1,94 @@
+# app/ml_engine/snapshot.py
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import joblib
+import pandas as pd
+import scipy.sparse as sp
+import sklearn
+
+log = logging.getLogger(__name__)
+
+# Naikkan versi ini setiap kali format data olahan MealPlanner berubah.
+# (Kunci snapshot juga menamai direktori shared arrays, jadi perubahan layout-nya ikut menaikkan versi.)
+SNAPSHOT_VERSION = 4
+
+def source_fingerprint(data_path):
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+# Identitas lokasi dataset: dua app/dataset yang berbagi MEAL_PLANNER_SNAPSHOT_DIR (mis. staging &
+# prod, atau benchmark) punya prefix kunci berbeda dan tidak saling menghapus snapshot.
+def source_id(data_path):
+    return hashlib.sha256(os.path.realpath(data_path).encode('utf-8')).hexdigest()[:8]
+
+def snapshot_key(data_path):
+    # pickle terikat versi library, jadi versi pandas/sklearn ikut masuk kunci
+    return f"v{SNAPSHOT_VERSION}-{source_id(data_path)}-{source_fingerprint(data_path)}-pd{pd.__version__}-sk{sklearn.__version__}"
+
+# "v<versi>-<source_id>-": kunci lain dengan prefix yang sama = versi lama dataset yang sama
+def key_prefix(key):
+    return '-'.join(key.split('-', 2)[:2]) + '-'
+
+# Hapus entri `directory` (snapshot / shared arrays) milik dataset yang sama selain `keep`;
+# entri dataset lain dan direktori sementara (".tmp-...") tidak disentuh.
+def prune_stale(directory, keep):
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    prefix = key_prefix(keep)
+    for name in names:
+        if name != keep and name.startswith(prefix):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+# `tfidf_matrix=False`: matriks TF-IDF mentah tidak dibaca (sudah di-mmap dari shared arrays).
+def load_snapshot(snapshot_dir, key, tfidf_matrix=True):
+    path = os.path.join(snapshot_dir, key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != SNAPSHOT_VERSION:
+            return None
+        return {
+            'key': key,
+            'df': pd.read_pickle(os.path.join(path, 'frame.pkl')),
+            'tfidf': joblib.load(os.path.join(path, 'tfidf.joblib')),
+            'tfidf_matrix': sp.load_npz(os.path.join(path, 'tfidf_matrix.npz')).tocsr() if tfidf_matrix else None,
+            'restaurants_data': joblib.load(os.path.join(path, 'restaurants.joblib')),
+        }
+    except Exception as e:
+        log.warning("Snapshot '%s' tidak bisa dibaca, membangun ulang: %s", path, e)
+        return None
+
+def save_snapshot(snapshot_dir, key, data_path, df, tfidf, tfidf_matrix, restaurants_data):
+    path = os.path.join(snapshot_dir, key)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # Tulis ke direktori sementara lalu rename, supaya worker lain tidak membaca snapshot setengah jadi
+    tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=snapshot_dir)
+    try:
+        df.to_pickle(os.path.join(tmp_path, 'frame.pkl'))
+        joblib.dump(tfidf, os.path.join(tmp_path, 'tfidf.joblib'))
+        sp.save_npz(os.path.join(tmp_path, 'tfidf_matrix.npz'), tfidf_matrix.tocsr(), compressed=False)
+        joblib.dump(restaurants_data, os.path.join(tmp_path, 'restaurants.joblib'))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'source': os.path.basename(data_path), 'key': key}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            log.warning("Gagal menyimpan snapshot engine: %s", e)
+            return None
+    # Snapshot versi lama dataset ini tidak akan pernah cocok lagi
+    prune_stale(snapshot_dir, keep=key)
+    return key
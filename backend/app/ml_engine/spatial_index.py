@@ -0,0 +1,66 @@
+# app/ml_engine/spatial_index.py
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat, lon, lats, lons):
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+# BallTree (haversine) di level restoran; baris menu dikelompokkan per koordinat restoran.
+class RestaurantSpatialIndex:
+    def __init__(self, df):
+        lat = df['latitude'].to_numpy(dtype=np.float64)
+        lon = df['longitude'].to_numpy(dtype=np.float64)
+        valid_rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+
+        coords, resto_of_row = np.unique(np.column_stack([lat[valid_rows], lon[valid_rows]]), axis=0, return_inverse=True)
+        resto_of_row = resto_of_row.ravel()
+
+        # Baris menu diurutkan per restoran (gaya CSR): rows[offsets[r]:offsets[r + 1]]
+        order = np.argsort(resto_of_row, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(resto_of_row, minlength=len(coords)))])
+        self._set_arrays(valid_rows[order], offsets, coords)
+
+    def _set_arrays(self, rows, offsets, coords):
+        self.rows, self.offsets, self.coords = rows, offsets, coords
+        self.tree = BallTree(np.radians(coords), metric='haversine') if len(coords) else None
+
+    # Array numerik (untuk shared_arrays); BallTree dibangun ulang dari koordinat restoran
+    def to_arrays(self):
+        return {'rows': self.rows, 'offsets': self.offsets, 'coords': self.coords}, {}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        index = cls.__new__(cls)
+        index._set_arrays(arrays['rows'], arrays['offsets'], arrays['coords'])
+        return index
+
+    def __len__(self):
+        return len(self.coords)
+
+    # Kembalikan (posisi baris df, jarak_km) untuk `limit` menu terdekat, urut dari yang terdekat.
+    def nearest_rows(self, lat, lon, limit=20):
+        if self.tree is None or limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        n_resto = len(self.coords)
+        k = min(n_resto, max(1, limit))
+        while True:
+            resto_idx = self.tree.query(np.radians([[lat, lon]]), k=k, return_distance=False)[0]
+            counts = self.offsets[resto_idx + 1] - self.offsets[resto_idx]
+            if counts.sum() >= limit or k == n_resto:
+                break
+            k = min(n_resto, k * 2)
+
+        # Refinement jarak secara vektor hanya untuk k restoran kandidat
+        resto_dist = haversine_km(lat, lon, self.coords[resto_idx, 0], self.coords[resto_idx, 1])
+        rows = np.concatenate([self.rows[self.offsets[r]:self.offsets[r + 1]] for r in resto_idx])
+        dist = np.repeat(resto_dist, counts)
+
+        order = np.lexsort((rows, dist))[:limit]
+        return rows[order], dist[order]
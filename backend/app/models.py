@@ -1,6 +1,10 @@
 # app/models.py (100% LENGKAP DENGAN SEMUA KOLOM)
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
 from datetime import datetime
@@ -56,16 +60,33 @@ class User(db.Model):
             'allergies': json.loads(self.allergies) if self.allergies else [],
         }
 
+# Satu ulasan per user per menu: indeks unik ini yang membuat upsert_review aman dijalankan bersamaan
+REVIEW_UNIQUE_INDEX = 'ux_review_user_menu'
+
 class Review(db.Model):
     __tablename__ = 'review'
+    __table_args__ = (db.Index(REVIEW_UNIQUE_INDEX, 'user_id', 'menu_name', unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     menu_name = db.Column(db.String(150), nullable=False, index=True)
     rating = db.Column(db.Float, nullable=False)
     review_text = db.Column(db.Text, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+# Agregat rating per menu (jumlah & total), dijaga oleh submit_rating_review; rata-rata = rating_sum / review_count.
+class MenuRating(db.Model):
+    __tablename__ = 'menu_rating'
+    menu_name = db.Column(db.String(150), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0.0
+
 class Expense(db.Model):
     __tablename__ = 'expense'
+    # Laporan per user memakai rentang timestamp (bukan date()/extract()) agar indeks ini terpakai
+    __table_args__ = (db.Index('ix_expense_user_timestamp', 'user_id', 'timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(200), nullable=False)
@@ -78,4 +99,141 @@ class MealPlan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     plan_date = db.Column(db.Date, nullable=False, index=True)
     plan_data = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
\ No newline at end of file
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+# Status job generate meal plan async (PlanJobQueue): ditulis proses yang menjalankan job,
+# dibaca worker mana pun lewat /meal-plan-jobs/<id>.
+class PlanJob(db.Model):
+    __tablename__ = 'plan_job'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    plan_date = db.Column(db.Date, nullable=False)
+    state = db.Column(db.String(10), nullable=False, default='queued')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+
+# Generasi cache per proses (mis. cache profil user): dinaikkan setiap ada perubahan, dibaca
+# worker lain untuk membuang salinan lokal yang sudah basi.
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generation'
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+# db.create_all() tidak menambahkan indeks baru ke tabel yang sudah ada; buat yang belum ada.
+def ensure_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+# DB lama (sebelum indeks unik review) bisa berisi ulasan ganda per user per menu: sisakan yang
+# terbaru dan kosongkan menu_rating agar backfill_menu_ratings membangunnya ulang. Dipanggil
+# sebelum ensure_indexes; tidak melakukan apa-apa bila indeks unik sudah ada.
+def dedupe_reviews():
+    if any(index['name'] == REVIEW_UNIQUE_INDEX for index in inspect(db.engine).get_indexes(Review.__tablename__)):
+        return
+    latest = db.select(db.func.max(Review.id)).group_by(Review.user_id, Review.menu_name).scalar_subquery()
+    result = db.session.execute(Review.__table__.delete().where(Review.id.not_in(latest)))
+    if result.rowcount:
+        db.session.execute(MenuRating.__table__.delete())
+    db.session.commit()
+
+MENU_RATING_QUERY_CHUNK = 500
+
+# Tambah `increments` ({kolom: delta}) ke baris dengan kunci `keys` dalam satu statement atomik:
+# INSERT ... ON CONFLICT DO UPDATE (SQLite/PostgreSQL) atau ON DUPLICATE KEY UPDATE (MySQL).
+# Baris yang belum ada dibuat dengan delta sebagai nilai awal. Dialect lain: UPDATE lalu INSERT
+# (tidak aman terhadap INSERT bersamaan untuk kunci yang sama).
+def upsert_increment(table, keys, increments):
+    values = {**keys, **increments}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        statement = (sqlite_insert if dialect == 'sqlite' else postgresql_insert)(table).values(**values)
+        statement = statement.on_conflict_do_update(index_elements=list(keys), set_={column: table.c[column] + statement.excluded[column] for column in increments})
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql_insert(table).values(**values)
+        statement = statement.on_duplicate_key_update({column: table.c[column] + statement.inserted[column] for column in increments})
+    else:
+        condition = db.and_(*(table.c[column] == value for column, value in keys.items()))
+        result = db.session.execute(table.update().where(condition).values({column: table.c[column] + delta for column, delta in increments.items()}))
+        if result.rowcount:
+            return
+        statement = table.insert().values(**values)
+    db.session.execute(statement)
+
+# INSERT yang dilewati bila baris dengan kunci unik `keys` sudah ada (ON CONFLICT DO NOTHING /
+# INSERT IGNORE). Hasil: True bila baris baru benar-benar dimasukkan. Pada PostgreSQL INSERT
+# bersamaan untuk kunci yang sama menunggu transaksi lain selesai, lalu dilewati.
+def insert_if_absent(table, keys, values):
+    values = {**keys, **values}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        statement = (sqlite_insert if dialect == 'sqlite' else postgresql_insert)(table).values(**values).on_conflict_do_nothing(index_elements=list(keys))
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql_insert(table).values(**values).prefix_with('IGNORE')
+    else:
+        condition = db.and_(*(table.c[column] == value for column, value in keys.items()))
+        if db.session.execute(db.select(table.c[next(iter(keys))]).where(condition)).first() is not None:
+            return False
+        statement = table.insert().values(**values)
+    return db.session.execute(statement).rowcount == 1
+
+# Naikkan generasi cache `name` di transaksi yang sedang berjalan (ikut ter-commit bersama perubahannya).
+def bump_cache_generation(name):
+    upsert_increment(CacheGeneration.__table__, {'name': name}, {'generation': 1})
+
+def cache_generation(name):
+    return db.session.query(CacheGeneration.generation).filter_by(name=name).scalar() or 0
+
+# Tambah delta ke agregat rating menu dengan satu upsert atomik (INSERT ... ON CONFLICT DO UPDATE):
+# ulasan pertama untuk menu yang sama dari dua worker tidak saling gagal di primary key.
+# Dipanggil di dalam transaksi yang sama dengan perubahan Review.
+def apply_menu_rating_delta(menu_name, count_delta, sum_delta):
+    upsert_increment(MenuRating.__table__, {'menu_name': menu_name}, {'review_count': count_delta, 'rating_sum': sum_delta})
+
+# Upsert ulasan (satu per user per menu) + agregat menu_rating dalam transaksi yang sedang berjalan.
+# INSERT dulu (dilewati bila sudah ada, lihat insert_if_absent); bila dilewati, baris yang ada
+# dikunci (FOR UPDATE) sebelum rating lamanya dibaca, jadi dua submit bersamaan tidak sama-sama
+# dihitung sebagai ulasan baru. Hasil: delta (jumlah, total) untuk MealPlanner setelah commit.
+def upsert_review(user_id, menu_name, rating, review_text):
+    table = Review.__table__
+    keys = {'user_id': user_id, 'menu_name': menu_name}
+    if insert_if_absent(table, keys, {'rating': rating, 'review_text': review_text}):
+        delta = (1, rating)
+    else:
+        condition = db.and_(table.c.user_id == user_id, table.c.menu_name == menu_name)
+        old_rating = db.session.execute(db.select(table.c.rating).where(condition).with_for_update()).scalar_one()
+        db.session.execute(table.update().where(condition).values(rating=rating, review_text=review_text))
+        delta = (0, rating - float(old_rating))
+    apply_menu_rating_delta(menu_name, *delta)
+    return delta
+
+# Isi menu_rating dari tabel review bila agregat belum pernah dibangun (tabel baru / DB lama).
+def backfill_menu_ratings():
+    if db.session.query(MenuRating.menu_name).first() is not None or db.session.query(Review.id).first() is None:
+        return
+    db.session.execute(MenuRating.__table__.insert().from_select(
+        ['menu_name', 'review_count', 'rating_sum'],
+        db.select(Review.menu_name, db.func.count(Review.id), db.func.sum(Review.rating)).group_by(Review.menu_name)
+    ))
+    db.session.commit()
+
+# {menu_name: (jumlah ulasan, total rating)} untuk semua menu (memuat skor rating di MealPlanner).
+def menu_rating_totals():
+    return {name: (count, total) for name, count, total in db.session.query(MenuRating.menu_name, MenuRating.review_count, MenuRating.rating_sum)}
+
+# {menu_name: (rata-rata, jumlah ulasan)} untuk banyak menu sekaligus (query IN per chunk).
+def menu_rating_map(menu_names):
+    names = list(set(menu_names))
+    ratings = {}
+    for start in range(0, len(names), MENU_RATING_QUERY_CHUNK):
+        for row in MenuRating.query.filter(MenuRating.menu_name.in_(names[start:start + MENU_RATING_QUERY_CHUNK])).all():
+            ratings[row.menu_name] = (row.average_rating, row.review_count)
+    return ratings
+
+# Tambahkan rating_menu & jumlah_ulasan ke setiap item menu (dict dengan key 'Nama').
+def attach_menu_ratings(items):
+    ratings = menu_rating_map(item.get('Nama') for item in items if item.get('Nama'))
+    for item in items:
+        item['rating_menu'], item['jumlah_ulasan'] = ratings.get(item.get('Nama'), (None, 0))
+    return items
\ No newline at end of file
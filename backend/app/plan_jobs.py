@@ -0,0 +1,234 @@
+# app/plan_jobs.py
+
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import create_engine, select
+
+from .metrics import stage_timer
+from .ml_engine.plan_cache import RankingCache
+from .ml_engine.snapshot import snapshot_key
+from .models import db, MealPlan, MenuRating, PlanJob, attach_menu_ratings, insert_if_absent
+from .serialization import dumps
+
+log = logging.getLogger(__name__)
+
+# Status job: 'queued' -> 'running' -> 'done' / 'failed'
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+
+class QueueFull(Exception):
+    pass
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None) if timestamp is not None else None
+
+# Tulis status job ke tabel PlanJob (belum di-commit). `overwrite=False`: baris yang sudah ada
+# tidak disentuh, supaya status 'queued' dari submit tidak menimpa status akhir yang ditulis
+# callback job yang kebetulan selesai lebih dulu.
+def save_job_status(job, overwrite=True):
+    values = {'state': job['state'], 'error': job['error'], 'finished_at': _utc(job['finished_at'])}
+    created = insert_if_absent(PlanJob.__table__, {'id': job['id']}, dict(
+        values, user_id=job['user_id'], plan_date=date.fromisoformat(job['plan_date']), created_at=_utc(job['created_at'])))
+    if not created and overwrite:
+        db.session.execute(PlanJob.__table__.update().where(PlanJob.id == job['id']).values(**values))
+
+# Rating menu + encode sekali + simpan (menggantikan plan lama di tanggal yang sama). Hasil: bytes JSON plan.
+# `job`: status job async yang ikut ter-commit di transaksi yang sama dengan plan-nya.
+def persist_meal_plan(user_id, plan_date, plan, job=None):
+    attach_menu_ratings([item for meal_list in plan.values() for item in meal_list])
+    with stage_timer('encode_plan'):
+        plan_json = dumps(plan)
+    with stage_timer('db_write'):
+        MealPlan.query.filter_by(user_id=user_id, plan_date=plan_date).delete()
+        db.session.add(MealPlan(user_id=user_id, plan_date=plan_date, plan_data=plan_json.decode('utf-8')))
+        if job is not None:
+            save_job_status(job)
+        db.session.commit()
+    return plan_json
+
+# --- Sisi proses worker: engine dibangun sekali per proses (dari snapshot / shared arrays) ---
+
+_worker_engine = None
+_worker_engine_kwargs = None
+_worker_database_uri = None
+_worker_db = None
+_worker_rating_key = None
+
+def _init_worker(engine_kwargs, database_uri):
+    global _worker_engine_kwargs, _worker_database_uri
+    _worker_engine_kwargs = dict(engine_kwargs, ranking_cache=RankingCache())
+    _worker_database_uri = database_uri
+    logging.basicConfig(level=logging.WARNING)
+
+# Agregat rating menu dibaca langsung dari DB oleh worker (tidak dikirim per job lewat pickle)
+def _worker_rating_totals():
+    global _worker_db
+    if _worker_db is None:
+        _worker_db = create_engine(_worker_database_uri)
+    table = MenuRating.__table__
+    with _worker_db.connect() as connection:
+        return {name: (count, total) for name, count, total in connection.execute(select(table.c.menu_name, table.c.review_count, table.c.rating_sum))}
+
+# `rating_key`: (versi dataset, versi skor rating) engine proses utama; agregat dimuat ulang hanya bila berubah.
+def _run_plan_job(data_path, dataset_version, rating_key, params):
+    global _worker_engine, _worker_rating_key
+    from .ml_engine.meal_planner import MealPlanner
+
+    started = time.perf_counter()
+    if _worker_engine is None or (_worker_engine.dataset_version != dataset_version and snapshot_key(data_path) != _worker_engine.dataset_version):
+        # Dataset di proses utama sudah di-reload: bangun ulang dengan memakai ulang engine lama
+        _worker_engine = MealPlanner(data_path=data_path, previous=_worker_engine, **_worker_engine_kwargs)
+    if rating_key != _worker_rating_key:
+        _worker_engine.menu_ratings.load(_worker_rating_totals())
+        _worker_rating_key = rating_key
+    plan = _worker_engine.create_daily_meal_plan(**params)
+    return plan, time.perf_counter() - started
+
+# Antrian generate meal plan di process pool: konkurensi dibatasi `max_workers`, job yang
+# belum selesai dibatasi `max_pending` (lebih dari itu ditolak -> 503), request identik yang
+# masih berjalan digabung ke job yang sama. Hasil disimpan ke MealPlan oleh proses utama.
+# Status job juga ditulis ke tabel PlanJob (status akhir satu transaksi dengan MealPlan-nya),
+# jadi /meal-plan-jobs/<id> bisa dilayani worker gunicorn mana pun; penggabungan request identik
+# tetap per proses. Setiap worker gunicorn menjalankan pool sendiri: total proses engine =
+# worker gunicorn x (1 + max_workers).
+# Bila proses worker pool mati, job yang sedang berjalan ditandai gagal dan pool dibuat ulang.
+class PlanJobQueue:
+    def __init__(self, app, engine_kwargs, max_workers=2, max_pending=32, result_ttl=600):
+        self.app = app
+        self.engine_kwargs = engine_kwargs
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.jobs = OrderedDict()
+        self._inflight = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: proses worker tidak mewarisi thread/koneksi DB proses utama
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(self.engine_kwargs, self.app.config['SQLALCHEMY_DATABASE_URI'])
+            )
+        return self._executor
+
+    # Pool rusak (worker mati): dilepas, request berikutnya membuat pool baru
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def pending(self):
+        return sum(1 for job in self.jobs.values() if job['state'] in ('queued', 'running'))
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.get('finished_at') and job['finished_at'] < cutoff]:
+            del self.jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    # Baris PlanJob yang sudah lewat result_ttl dibuang (dipanggil saat submit, ikut commit-nya)
+    def _prune_stored(self):
+        PlanJob.query.filter(PlanJob.finished_at < _utc(time.time() - self.result_ttl)).delete()
+
+    # `params`: argumen create_daily_meal_plan. Hasil (job, dibuat_baru); QueueFull bila antrian penuh.
+    def submit(self, user_id, plan_date, params):
+        key = (user_id, plan_date.isoformat(), repr(sorted(params.items())))
+        with self._lock:
+            self._prune()
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return self.jobs[job_id], False
+            if self.pending() >= self.max_pending:
+                raise QueueFull()
+            engine = self.app.config['MEAL_PLANNER_ENGINE']
+            job = {
+                'id': uuid.uuid4().hex, 'state': 'queued', 'user_id': user_id, 'plan_date': plan_date.isoformat(),
+                'created_at': time.time(), 'finished_at': None, 'error': None,
+            }
+            args = (_run_plan_job, engine.data_path, engine.dataset_version, (engine.dataset_version, engine.menu_ratings.version), params)
+            executor = self._get_executor()
+            try:
+                future = executor.submit(*args)
+            except BrokenProcessPool:
+                log.warning("Process pool meal plan rusak, dibuat ulang.")
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = self._get_executor()
+                future = executor.submit(*args)
+            self.jobs[job['id']] = job
+            self._inflight[key] = job['id']
+            self._futures[job['id']] = future
+        self._prune_stored()
+        save_job_status(job, overwrite=False)
+        db.session.commit()
+        future.add_done_callback(lambda f: self._finish(job, key, plan_date, f, executor))
+        log.debug("Job meal plan diantrikan.", extra={'job_id': job['id'], 'pending': self.pending()})
+        return job, True
+
+    def _finish(self, job, key, plan_date, future, executor):
+        try:
+            plan, duration = future.result()
+            with self.app.app_context():
+                persist_meal_plan(job['user_id'], plan_date, plan, job=dict(job, state='done', finished_at=time.time()))
+            job['state'] = 'done'
+            log.info("Job meal plan selesai.", extra={'job_id': job['id'], 'duration_ms': round(duration * 1000, 3)})
+        except BrokenProcessPool as e:
+            job['state'], job['error'] = 'failed', "Proses worker meal plan berhenti tak terduga."
+            log.error("Job meal plan gagal, process pool rusak: %s", e, extra={'job_id': job['id']})
+            self._discard_executor(executor)
+        except Exception as e:
+            job['state'], job['error'] = 'failed', str(e)
+            log.exception("Job meal plan gagal: %s", e)
+        finally:
+            job['finished_at'] = time.time()
+            if job['state'] == 'failed':
+                self._store_failure(job)
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._futures.pop(job['id'], None)
+
+    def _store_failure(self, job):
+        try:
+            with self.app.app_context():
+                save_job_status(job)
+                db.session.commit()
+        except Exception as e:
+            log.error("Status job meal plan gagal disimpan: %s", e, extra={'job_id': job['id']})
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if job is not None and job['state'] == 'queued' and future is not None and future.running():
+            job['state'] = 'running'
+        return job if job is not None else self._load(job_id)
+
+    # Job dari worker gunicorn lain. Job yang belum selesai setelah result_ttl dianggap gagal:
+    # proses yang menjalankannya sudah berhenti sebelum sempat menulis status akhir.
+    def _load(self, job_id):
+        row = db.session.get(PlanJob, job_id)
+        if row is None:
+            return None
+        job = {
+            'id': row.id, 'state': row.state, 'user_id': row.user_id, 'plan_date': row.plan_date.isoformat(),
+            'created_at': row.created_at.replace(tzinfo=timezone.utc).timestamp(),
+            'finished_at': row.finished_at.replace(tzinfo=timezone.utc).timestamp() if row.finished_at else None, 'error': row.error,
+        }
+        if job['state'] in ('queued', 'running') and job['created_at'] < time.time() - self.result_ttl:
+            job['state'], job['error'] = 'failed', "Job meal plan tidak selesai: proses yang menjalankannya berhenti."
+        return job
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
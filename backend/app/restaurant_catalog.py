@@ -0,0 +1,115 @@
+# app/restaurant_catalog.py
+
+import gzip
+import hashlib
+import threading
+
+import numpy as np
+
+from .serialization import dumps
+
+# brotli opsional; tanpa brotli hanya varian gzip yang disiapkan.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+# Payload /restaurants untuk satu versi dataset: tiap restoran di-encode sekali, payload penuh
+# (identity/gzip/br) dan ETag-nya dihitung sekali. Halaman & filter bbox hanya menyambung bytes
+# restoran yang terpilih. Urutan = id restoran (cursor = id terakhir halaman sebelumnya).
+class RestaurantCatalog:
+    def __init__(self, restaurants_data, dataset_version):
+        self.dataset_version = dataset_version
+        restaurants = sorted(restaurants_data or [], key=lambda r: r['id'])
+        self.ids = np.array([r['id'] for r in restaurants], dtype=np.int64)
+        self.items = [dumps(r) for r in restaurants]
+
+        coords = [r.get('koordinat') or {} for r in restaurants]
+        lat = np.array([_coordinate(c.get('latitude')) for c in coords], dtype=np.float64)
+        lon = np.array([_coordinate(c.get('longitude')) for c in coords], dtype=np.float64)
+        # Diurutkan per latitude: bbox = searchsorted rentang latitude + mask longitude
+        self._lat_order = np.argsort(lat, kind='stable')
+        self._lat_sorted = lat[self._lat_order]
+        self._lon = lon
+
+        body = b'[' + b','.join(self.items) + b']'
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def __len__(self):
+        return len(self.items)
+
+    # Pembeda ETag untuk halaman/bbox (body berbeda per query); None = list penuh
+    @staticmethod
+    def query_key(bbox=None, after_id=None, limit=None):
+        if bbox is None and after_id is None and limit is None:
+            return None
+        return hashlib.sha1(repr((bbox, after_id, limit)).encode()).hexdigest()[:12]
+
+    def _base_etag(self, query):
+        return self.etag if query is None else f'{self.etag}.{query}'
+
+    # ETag per encoding (strong ETag harus berbeda antar representasi) dan per query
+    def variant_etag(self, encoding='identity', query=None):
+        base = self._base_etag(query)
+        return f'"{base}"' if encoding == 'identity' else f'"{base}-{encoding}"'
+
+    # Cocok bila salah satu tag If-None-Match adalah ETag versi ini untuk query yang sama
+    # (encoding apa pun, weak/strong); cukup dicek sebelum body dibangun.
+    def matches(self, if_none_match, query=None):
+        if not if_none_match:
+            return False
+        base = self._base_etag(query)
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            tag = tag[2:] if tag.startswith('W/') else tag
+            if tag.strip('"').split('-', 1)[0] == base:
+                return True
+        return False
+
+    # `bbox`: (min_lon, min_lat, max_lon, max_lat) atau None. Hasil: (list bytes restoran, cursor berikutnya).
+    def page(self, bbox=None, after_id=None, limit=None):
+        if bbox is None:
+            positions = np.arange(len(self.ids))
+        else:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            lo = np.searchsorted(self._lat_sorted, min_lat, side='left')
+            hi = np.searchsorted(self._lat_sorted, max_lat, side='right')
+            candidates = self._lat_order[lo:hi]
+            lon = self._lon[candidates]
+            positions = np.sort(candidates[(lon >= min_lon) & (lon <= max_lon)])
+        if after_id is not None:
+            positions = positions[self.ids[positions] > after_id]
+        next_cursor = None
+        if limit is not None and len(positions) > limit:
+            positions = positions[:limit]
+            next_cursor = int(self.ids[positions[-1]])
+        return [self.items[i] for i in positions], next_cursor
+
+def _coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+_catalog_lock = threading.Lock()
+
+# Katalog untuk engine aktif (disimpan di app.config['RESTAURANT_CATALOG']); dibangun ulang
+# hanya bila versi dataset berganti (hot reload).
+def catalog_for(app):
+    engine = app.config['MEAL_PLANNER_ENGINE']
+    catalog = app.config.get('RESTAURANT_CATALOG')
+    if catalog is not None and catalog.dataset_version == engine.dataset_version:
+        return catalog
+    with _catalog_lock:
+        catalog = app.config.get('RESTAURANT_CATALOG')
+        if catalog is None or catalog.dataset_version != engine.dataset_version:
+            catalog = app.config['RESTAURANT_CATALOG'] = RestaurantCatalog(engine.restaurants_data, engine.dataset_version)
+        return catalog
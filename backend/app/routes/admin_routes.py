@@ -0,0 +1,35 @@
+# app/routes/admin_routes.py
+
+from flask import Blueprint, request, jsonify, current_app
+import hmac
+
+def create_admin_blueprint(engine_reloader):
+    admin_bp = Blueprint('admin_bp', __name__)
+
+    def is_authorized():
+        admin_token = current_app.config.get('ADMIN_TOKEN')
+        return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+    @admin_bp.route('/admin/reload-dataset', methods=['POST'])
+    def reload_dataset():
+        if not is_authorized(): return jsonify({"status": "error", "message": "Akses ditolak."}), 403
+        if not engine_reloader.trigger():
+            return jsonify({"status": "error", "message": "Reload dataset masih berjalan.", "reload": engine_reloader.last_status}), 409
+        return jsonify({"status": "success", "message": "Reload dataset dimulai."}), 202
+
+    @admin_bp.route('/admin/reload-dataset', methods=['GET'])
+    def reload_dataset_status():
+        if not is_authorized(): return jsonify({"status": "error", "message": "Akses ditolak."}), 403
+        engine = current_app.config['MEAL_PLANNER_ENGINE']
+        return jsonify({
+            "status": "success", "running": engine_reloader.is_running(),
+            "dataset_version": engine.dataset_version, "reload": engine_reloader.last_status
+        }), 200
+
+    @admin_bp.route('/admin/planner-cache', methods=['GET'])
+    def planner_cache_stats():
+        if not is_authorized(): return jsonify({"status": "error", "message": "Akses ditolak."}), 403
+        ranking_cache = current_app.config['MEAL_PLANNER_ENGINE'].ranking_cache
+        return jsonify({"status": "success", "cache": ranking_cache.stats() if ranking_cache else None}), 200
+
+    return admin_bp
@@ -1,8 +1,8 @@
 # app/routes/auth_routes.py
 
-from flask import Blueprint, request, jsonify
-from app.models import db, User
-import uuid
+from flask import Blueprint, request, jsonify, current_app
+from app.models import db, User, bump_cache_generation
+from app.auth import PROFILE_GENERATION, issue_token, current_profile, bearer_token
 import json
 
 def create_auth_blueprint():
@@ -21,17 +21,29 @@ def create_auth_blueprint():
     def login_user():
         data = request.json; email = data.get('email'); password = data.get('password')
         if not email or not password: return jsonify({'status': 'error', 'message': 'Email dan password dibutuhkan'}), 400
+        # Dibatasi sebelum hash pbkdf2 (mahal) dihitung
+        limiter = current_app.config['LOGIN_RATE_LIMITER']
+        retry_after = limiter.check(email, request.remote_addr)
+        if retry_after is not None:
+            response = jsonify({'status': 'error', 'message': 'Terlalu banyak percobaan login, coba lagi nanti.'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
         user = User.query.filter_by(email=email).first()
-        if not user or not user.check_password(password): return jsonify({'status': 'error', 'message': 'Email atau password salah'}), 401
-        token = str(uuid.uuid4())
+        if not user or not user.check_password(password):
+            limiter.failure(email, request.remote_addr)
+            return jsonify({'status': 'error', 'message': 'Email atau password salah'}), 401
+        limiter.success(email)
+        token = issue_token(user.id)
         return jsonify({'status': 'success', 'message': 'Login berhasil!', 'token': token, 'user': user.to_dict()}), 200
 
     @auth_bp.route('/update-profile', methods=['POST'])
     def update_profile():
         data = request.json
         email = data.get('email')
-        if not email: return jsonify({'status': 'error', 'message': 'Email dibutuhkan'}), 400
-        user = User.query.filter_by(email=email).first()
+        if not (email or bearer_token()): return jsonify({'status': 'error', 'message': 'Email dibutuhkan'}), 400
+        profile = current_profile(email)
+        if not profile: return jsonify({'status': 'error', 'message': 'Pengguna tidak ditemukan'}), 404
+        user = db.session.get(User, profile.id)
         if not user: return jsonify({'status': 'error', 'message': 'Pengguna tidak ditemukan'}), 404
         
         if 'nama' in data: user.nama = data['nama']
@@ -51,7 +63,9 @@ def create_auth_blueprint():
             multiplier = {'Sedentary': 1.2, 'Light': 1.375, 'Moderate': 1.55, 'Active': 1.725}.get(user.activity_level, 1.2)
             user.target_calories = bmr * multiplier
         
+        bump_cache_generation(PROFILE_GENERATION)
         db.session.commit()
+        current_app.config['PROFILE_CACHE'].invalidate(user.id)
         
         return jsonify({'status': 'success', 'message': 'Profil berhasil diupdate', 'user': user.to_dict()}), 200
 
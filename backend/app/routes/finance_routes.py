@@ -1,9 +1,86 @@
 # app/routes/finance_routes.py
 
-from flask import Blueprint, request, jsonify
-from app.models import db, User, Expense
-from datetime import datetime, date
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from app.models import db, User, Expense, bump_cache_generation
+from app.auth import PROFILE_GENERATION, current_profile, bearer_token
+from app.serialization import dumps
+from datetime import datetime, date, time, timedelta
+import csv
+import io
 import json
+import logging
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+EXPENSE_PAGE_MAX = 500
+# Batas jumlah pengeluaran per request bulk, dan jumlah error yang dikembalikan ke klien
+BULK_EXPENSE_MAX = 10000
+BULK_ERRORS_MAX = 50
+DEFAULT_DESCRIPTION = 'Pembelian makanan'
+DESCRIPTION_MAX = 200
+# Baris per query saat ekspor (keyset): transaksi baca tidak ditahan selama streaming
+EXPORT_CHUNK = 1000
+EXPORT_COLUMNS = ['amount', 'description', 'timestamp', 'plan_details']
+
+# Cursor keyset halaman pengeluaran: "<timestamp ISO>_<id>" dari item terakhir halaman sebelumnya
+def _parse_cursor(cursor):
+    timestamp_str, _, id_str = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(timestamp_str), int(id_str)
+    except ValueError:
+        return None
+
+# Validasi batch pengeluaran sekaligus (kolom pandas, satu query user per 500 email).
+# Hasil: (baris siap insert, daftar error {index, message}); baris hanya dipakai bila tidak ada error.
+def _validate_expense_batch(items, token_profile):
+    frame = pd.DataFrame.from_records([item if isinstance(item, dict) else {} for item in items], columns=['user_email', 'amount', 'description', 'timestamp', 'plan_details'])
+    frame = frame.astype(object).where(frame.notna(), None)
+    problems = pd.Series([None] * len(frame), dtype=object)
+
+    def reject(mask, message):
+        problems[mask & problems.isna()] = message
+
+    reject(pd.Series([not isinstance(item, dict) for item in items]), "Item harus berupa objek.")
+
+    # Tanpa token: user_email wajib; dengan token: boleh kosong (= pemilik token), selain itu harus sama
+    emails = frame['user_email']
+    if token_profile is not None:
+        reject(emails.notna() & emails.ne(token_profile.email), "Token bukan milik pengguna ini.")
+        emails = emails.fillna(token_profile.email)
+    reject(~emails.map(type).eq(str), "Email pengguna dibutuhkan.")
+    user_ids = {}
+    unique_emails = emails[emails.map(type).eq(str)].unique().tolist()
+    for start in range(0, len(unique_emails), 500):
+        user_ids.update((email, user_id) for user_id, email in db.session.query(User.id, User.email).filter(User.email.in_(unique_emails[start:start + 500])))
+    user_id = emails.map(user_ids)
+    reject(user_id.isna(), "Pengguna tidak ditemukan.")
+
+    amount = frame['amount']
+    numeric = amount.map(type).isin([int, float])
+    amount = pd.to_numeric(amount.where(numeric), errors='coerce')
+    reject(~numeric | ~(amount > 0) | amount.eq(float('inf')), "Jumlah pengeluaran harus angka positif.")
+
+    description = frame['description'].fillna(DEFAULT_DESCRIPTION)
+    reject(~description.map(type).eq(str), "Deskripsi harus berupa teks.")
+    reject(description.map(type).eq(str) & description.astype(str).str.len().gt(DESCRIPTION_MAX), f"Deskripsi maksimal {DESCRIPTION_MAX} karakter.")
+
+    # Timestamp ISO 8601 dari klien (zona waktu dikonversi ke UTC naif); kosong = waktu server
+    raw_timestamp = frame['timestamp']
+    timestamp = pd.to_datetime(raw_timestamp.where(raw_timestamp.map(type).eq(str)), errors='coerce', utc=True, format='ISO8601').dt.tz_convert(None)
+    reject(raw_timestamp.notna() & timestamp.isna(), "Timestamp harus format ISO 8601.")
+    timestamp = timestamp.fillna(pd.Timestamp(datetime.utcnow()))
+
+    errors = [{"index": int(index), "message": message} for index, message in problems.dropna().items()]
+    if errors:
+        return [], errors
+    plan_details = [json.dumps(details) if details else None for details in frame['plan_details']]
+    rows = [
+        {'user_id': int(uid), 'amount': float(value), 'description': text, 'timestamp': ts.to_pydatetime(), 'plan_details': details}
+        for uid, value, text, ts, details in zip(user_id, amount, description, timestamp, plan_details)
+    ]
+    return rows, []
 
 def create_finance_blueprint():
     finance_bp = Blueprint('finance_bp', __name__)
@@ -14,12 +91,17 @@ def create_finance_blueprint():
         user_email = data.get('user_email')
         daily_budget = data.get('daily_budget')
         monthly_budget = data.get('monthly_budget')
-        if not user_email: return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
-        user = User.query.filter_by(email=user_email).first()
+        if not (user_email or bearer_token()): return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        user = current_profile(user_email)
         if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
-        if daily_budget is not None: user.daily_budget = daily_budget if isinstance(daily_budget, (int, float)) and daily_budget >= 0 else None
-        if monthly_budget is not None: user.monthly_budget = monthly_budget if isinstance(monthly_budget, (int, float)) and monthly_budget >= 0 else None
-        db.session.commit()
+        values = {}
+        if daily_budget is not None: values['daily_budget'] = daily_budget if isinstance(daily_budget, (int, float)) and daily_budget >= 0 else None
+        if monthly_budget is not None: values['monthly_budget'] = monthly_budget if isinstance(monthly_budget, (int, float)) and monthly_budget >= 0 else None
+        if values:
+            User.query.filter_by(id=user.id).update(values)
+            bump_cache_generation(PROFILE_GENERATION)
+            db.session.commit()
+            current_app.config['PROFILE_CACHE'].invalidate(user.id)
         return jsonify({"status": "success", "message": "Anggaran berhasil diatur."}), 200
 
     @finance_bp.route('/record_expense', methods=['POST'])
@@ -27,62 +109,159 @@ def create_finance_blueprint():
         data = request.json
         user_email = data.get('user_email')
         amount = data.get('amount')
-        if not all([user_email, amount is not None]): return jsonify({"status": "error", "message": "Email dan jumlah dibutuhkan."}), 400
-        user = User.query.filter_by(email=user_email).first()
+        if not all([user_email or bearer_token(), amount is not None]): return jsonify({"status": "error", "message": "Email dan jumlah dibutuhkan."}), 400
+        user = current_profile(user_email)
         if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
-        if not isinstance(amount, (int, float)) or amount <= 0: return jsonify({"status": "error", "message": "Jumlah pengeluaran harus angka positif."}), 400
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not 0 < amount < float('inf'): return jsonify({"status": "error", "message": "Jumlah pengeluaran harus angka positif."}), 400
+        # Divalidasi penuh di sini: dengan write-behind, error saat batch ditulis tidak bisa lagi dilaporkan ke klien
+        description = data.get('description', DEFAULT_DESCRIPTION)
+        if not isinstance(description, str): return jsonify({"status": "error", "message": "Deskripsi harus berupa teks."}), 400
+        if len(description) > DESCRIPTION_MAX: return jsonify({"status": "error", "message": f"Deskripsi maksimal {DESCRIPTION_MAX} karakter."}), 400
         
-        new_expense = Expense(
+        new_expense = dict(
             amount=amount,
-            description=data.get('description', 'Pembelian makanan'),
+            description=description,
             timestamp=datetime.utcnow(),
-            author=user,
+            user_id=user.id,
             plan_details=json.dumps(data.get('plan_details')) if data.get('plan_details') else None
         )
-        db.session.add(new_expense)
-        db.session.commit()
+        # Dengan write-behind, baris masuk ke transaksi batch berikutnya (antrian penuh: tulis langsung).
+        # 201 di jalur itu berarti pengeluaran diterima, belum tentu sudah tersimpan; kegagalan saat
+        # batch ditulis hanya dicatat di log.
+        batcher = current_app.config.get('WRITE_BATCHER')
+        if batcher is None or not batcher.insert(Expense.__table__, new_expense):
+            db.session.add(Expense(**new_expense))
+            db.session.commit()
         
-        print(f"Pengeluaran baru untuk {user_email} sebesar {amount} telah disimpan ke DB.")
+        log.debug("Pengeluaran baru untuk %s sebesar %s telah disimpan ke DB.", user_email, amount)
         return jsonify({"status": "success", "message": "Pengeluaran berhasil dicatat."}), 201
 
+    # Sinkronisasi pengeluaran offline: {"expenses": [{user_email, amount, description?, timestamp?, plan_details?}]}.
+    # Semua atau tidak sama sekali: satu error -> 400 tanpa ada yang disimpan.
+    # Tanpa Bearer token (user_email per item) hanya bila ALLOW_EMAIL_AUTH aktif.
+    @finance_bp.route('/record_expenses_bulk', methods=['POST'])
+    def record_expenses_bulk():
+        data = request.get_json(silent=True) or {}
+        items = data.get('expenses')
+        if not isinstance(items, list) or not items: return jsonify({"status": "error", "message": "Daftar pengeluaran dibutuhkan."}), 400
+        if len(items) > BULK_EXPENSE_MAX: return jsonify({"status": "error", "message": f"Maksimal {BULK_EXPENSE_MAX} pengeluaran per request."}), 413
+        token_profile = current_profile()
+
+        rows, errors = _validate_expense_batch(items, token_profile)
+        if errors:
+            return jsonify({"status": "error", "message": f"{len(errors)} pengeluaran tidak valid.", "errors": errors[:BULK_ERRORS_MAX]}), 400
+
+        # Satu INSERT executemany dalam satu transaksi
+        db.session.execute(Expense.__table__.insert(), rows)
+        db.session.commit()
+        log.debug("%s pengeluaran disimpan lewat bulk insert.", len(rows))
+        return jsonify({"status": "success", "message": "Pengeluaran berhasil dicatat.", "inserted": len(rows)}), 201
+
+    # Seluruh riwayat pengeluaran user sebagai NDJSON (default) atau CSV, di-stream per EXPORT_CHUNK baris
+    @finance_bp.route('/export_expenses', methods=['GET'])
+    def export_expenses():
+        user_email = request.args.get('user_email')
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'): return jsonify({"status": "error", "message": "Format harus ndjson atau csv."}), 400
+        if not (user_email or bearer_token()): return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        user = current_profile(user_email)
+        if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
+        user_id = user.id
+
+        def chunks():
+            after = None
+            while True:
+                query = db.session.query(Expense.id, Expense.amount, Expense.description, Expense.timestamp, Expense.plan_details).filter(Expense.user_id == user_id)
+                if after is not None:
+                    query = query.filter(db.or_(Expense.timestamp > after[0], db.and_(Expense.timestamp == after[0], Expense.id > after[1])))
+                rows = query.order_by(Expense.timestamp, Expense.id).limit(EXPORT_CHUNK).all()
+                # Akhiri transaksi baca sebelum chunk dikirim (checkpoint WAL tidak tertahan klien lambat)
+                db.session.rollback()
+                if not rows:
+                    return
+                after = (rows[-1].timestamp, rows[-1].id)
+                if export_format == 'csv':
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows((e.amount, e.description, e.timestamp.isoformat(), e.plan_details or '') for e in rows)
+                    yield buffer.getvalue().encode('utf-8')
+                else:
+                    yield b''.join(dumps({"amount": e.amount, "description": e.description, "timestamp": e.timestamp.isoformat(), "plan_details": json.loads(e.plan_details) if e.plan_details else None}) + b'\n' for e in rows)
+                if len(rows) < EXPORT_CHUNK:
+                    return
+
+        def body():
+            if export_format == 'csv':
+                yield (','.join(EXPORT_COLUMNS) + '\r\n').encode('utf-8')
+            yield from chunks()
+
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(body()), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="expenses-{user_id}.{export_format}"'
+        return response
+
     @finance_bp.route('/get_expense_report', methods=['GET'])
     def get_expense_report():
         user_email = request.args.get('user_email')
         period = request.args.get('period', 'daily')
-        user = User.query.filter_by(email=user_email).first()
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if limit is not None and not 1 <= limit <= EXPENSE_PAGE_MAX:
+            return jsonify({"status": "error", "message": f"limit harus antara 1 dan {EXPENSE_PAGE_MAX}."}), 400
+        if cursor is not None and _parse_cursor(cursor) is None:
+            return jsonify({"status": "error", "message": "Cursor tidak valid."}), 400
+        user = current_profile(user_email)
         if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan di DB."}), 404
         
-        query = Expense.query.filter_by(user_id=user.id)
         today_utc = datetime.utcnow().date()
-        if period == 'daily':
-            query = query.filter(db.func.date(Expense.timestamp) == today_utc)
-        elif period == 'monthly':
-            query = query.filter(db.func.extract('month', Expense.timestamp) == today_utc.month, db.func.extract('year', Expense.timestamp) == today_utc.year)
-        
-        all_expenses_in_period = query.order_by(Expense.timestamp.desc()).all()
-        
-        filtered_expenses_list = [{"amount": e.amount, "description": e.description, "timestamp": e.timestamp.isoformat(), "plan_details": json.loads(e.plan_details) if e.plan_details else None} for e in all_expenses_in_period]
+        day_start = datetime.combine(today_utc, time.min)
+        day_end = day_start + timedelta(days=1)
+        month_start = day_start.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        period_start, period_end = {'daily': (day_start, day_end), 'monthly': (month_start, month_end)}.get(period, (None, None))
+
+        # Total periode, hari ini, dan bulan ini dalam satu query agregat atas indeks (user_id, timestamp)
+        def spent_between(start, end):
+            conditions = [c for c in (Expense.timestamp >= start if start else None, Expense.timestamp < end if end else None) if c is not None]
+            return db.func.sum(db.case((db.and_(*conditions), Expense.amount))) if conditions else db.func.sum(Expense.amount)
+
+        query = db.session.query(
+            spent_between(period_start, period_end), spent_between(day_start, day_end), spent_between(month_start, month_end)
+        ).filter(Expense.user_id == user.id)
+        if period_start is not None:
+            query = query.filter(Expense.timestamp >= min(period_start, month_start), Expense.timestamp < max(period_end, month_end))
+        total_spent_in_period, spent_today, spent_this_month = query.one()
+        total_spent_in_period = total_spent_in_period or 0
+
+        expense_query = db.session.query(Expense.id, Expense.amount, Expense.description, Expense.timestamp, Expense.plan_details).filter(Expense.user_id == user.id)
+        if period_start is not None:
+            expense_query = expense_query.filter(Expense.timestamp >= period_start, Expense.timestamp < period_end)
+        if cursor is not None:
+            cursor_timestamp, cursor_id = _parse_cursor(cursor)
+            expense_query = expense_query.filter(db.or_(Expense.timestamp < cursor_timestamp, db.and_(Expense.timestamp == cursor_timestamp, Expense.id < cursor_id)))
+        expense_query = expense_query.order_by(Expense.timestamp.desc(), Expense.id.desc())
+        rows = expense_query.limit(limit + 1).all() if limit is not None else expense_query.all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1].timestamp.isoformat()}_{rows[-1].id}"
         
-        total_spent_in_period = sum(e['amount'] for e in filtered_expenses_list)
+        filtered_expenses_list = [{"amount": e.amount, "description": e.description, "timestamp": e.timestamp.isoformat(), "plan_details": json.loads(e.plan_details) if e.plan_details else None} for e in rows]
         
         daily_budget, monthly_budget = user.daily_budget, user.monthly_budget
         remaining_daily_budget, remaining_monthly_budget = None, None
 
         if daily_budget is not None:
-            all_today_expenses = Expense.query.filter_by(user_id=user.id).filter(db.func.date(Expense.timestamp) == today_utc).all()
-            spent_today = sum(e.amount for e in all_today_expenses)
-            remaining_daily_budget = daily_budget - spent_today
+            remaining_daily_budget = daily_budget - (spent_today or 0)
         if monthly_budget is not None:
-            all_month_expenses = Expense.query.filter_by(user_id=user.id).filter(db.func.extract('year', Expense.timestamp) == today_utc.year, db.func.extract('month', Expense.timestamp) == today_utc.month).all()
-            spent_this_month = sum(e.amount for e in all_month_expenses)
-            remaining_monthly_budget = monthly_budget - spent_this_month
+            remaining_monthly_budget = monthly_budget - (spent_this_month or 0)
             
-        print(f"Laporan pengeluaran untuk {user_email} ({period}): Total={total_spent_in_period}")
+        log.debug("Laporan pengeluaran untuk %s (%s): Total=%s", user_email, period, total_spent_in_period)
         return jsonify({
             "status": "success", "period": period, "total_spent": total_spent_in_period,
             "daily_budget": daily_budget, "monthly_budget": monthly_budget,
             "remaining_daily_budget": remaining_daily_budget, "remaining_monthly_budget": remaining_monthly_budget,
-            "expenses": filtered_expenses_list
+            "expenses": filtered_expenses_list, "next_cursor": next_cursor
         }), 200
 
     return finance_bp
\ No newline at end of file
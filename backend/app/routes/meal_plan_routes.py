@@ -1,24 +1,37 @@
 # app/routes/meal_plan_routes.py
 
-from flask import Blueprint, request, jsonify, current_app
-from app.models import db, User, MealPlan
+from flask import Blueprint, request, jsonify, current_app, url_for
+from app.models import db, User, MealPlan, attach_menu_ratings
+from app.ml_engine.meal_planner import plan_seed, PLAN_MODES
+from app.serialization import dumps, json_response
+from app.plan_jobs import persist_meal_plan, QueueFull
+from app.auth import current_profile, bearer_token
 import json
-from datetime import datetime
-import pandas as pd
+import logging
+from datetime import date, datetime, timedelta
 
-saved_meal_plans = {}
+log = logging.getLogger(__name__)
 
-def create_meal_plan_blueprint():
+BATCH_MAX_REQUESTS = 5000
+BATCH_QUERY_CHUNK = 500
+WEEKLY_MAX_DAYS = 31
+JOB_RETRY_AFTER_S = 5
+
+def _plan_items(plans):
+    return [item for plan in plans for meal_list in plan.values() for item in meal_list]
+
+# `plan_jobs`: PlanJobQueue untuk ?async=1 (None = hanya mode sinkron)
+def create_meal_plan_blueprint(plan_jobs=None):
     meal_plan_bp = Blueprint('meal_plan_bp', __name__)
 
     @meal_plan_bp.route('/get-meal-plan', methods=['GET'])
     def get_meal_plan_endpoint():
         user_email = request.args.get('user_email')
         plan_date_str = request.args.get('plan_date')
-        if not all([user_email, plan_date_str]):
+        if not all([user_email or bearer_token(), plan_date_str]):
             return jsonify({"status": "error", "message": "Parameter user_email dan plan_date dibutuhkan."}), 400
         
-        user = User.query.filter_by(email=user_email).first()
+        user = current_profile(user_email)
         if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
         
         try:
@@ -26,10 +39,11 @@ def create_meal_plan_blueprint():
         except ValueError:
             return jsonify({"status": "error", "message": "Format tanggal tidak valid (YYYY-MM-DD)."}), 400
 
-        existing_plan = MealPlan.query.filter_by(user_id=user.id, plan_date=plan_date).first()
+        # plan_data sudah berupa JSON: dikirim apa adanya tanpa decode/encode ulang
+        plan_data = db.session.query(MealPlan.plan_data).filter_by(user_id=user.id, plan_date=plan_date).limit(1).scalar()
 
-        if existing_plan:
-            return jsonify({"status": "success", "meal_plan": json.loads(existing_plan.plan_data)}), 200
+        if plan_data is not None:
+            return json_response({"status": "success"}, 200, raw_fields={"meal_plan": plan_data.encode('utf-8')})
         else:
             return jsonify({"status": "error", "message": "Meal plan tidak ditemukan untuk tanggal ini."}), 404
 
@@ -38,15 +52,21 @@ def create_meal_plan_blueprint():
         data = request.json
         user_email = data.get('user_email')
         plan_date_str = data.get('plan_date', datetime.now().strftime('%Y-%m-%d'))
-        if not user_email: return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        mode = data.get('mode', current_app.config.get('PLANNER_MODE', 'greedy'))
+        # ?async=1: dikerjakan di process pool, respons 202 berisi job_id
+        run_async = request.args.get('async') in ('1', 'true')
+        if not (user_email or bearer_token()): return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        if mode not in PLAN_MODES: return jsonify({"status": "error", "message": f"Mode harus salah satu dari: {', '.join(PLAN_MODES)}."}), 400
+        if run_async and plan_jobs is None: return jsonify({"status": "error", "message": "Mode async tidak aktif."}), 400
 
-        user = User.query.filter_by(email=user_email).first()
+        user = current_profile(user_email)
         if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
         
+        user_id = user.id
         target_calories = user.target_calories
         daily_budget = user.daily_budget
-        preferences = json.loads(user.preferences) if user.preferences else []
-        allergies = json.loads(user.allergies) if user.allergies else []
+        preferences = user.preferences
+        allergies = user.allergies
 
         if not all([target_calories, daily_budget]):
             return jsonify({"status": "error", "message": "Target kalori dan budget harian harus diatur di profil."}), 400
@@ -54,28 +74,178 @@ def create_meal_plan_blueprint():
         meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
         
         try:
-            plan = meal_planner_engine.create_daily_meal_plan(
-                target_kalori_harian=target_calories, preferensi=preferences,
-                alergi=allergies, budget_harian=daily_budget
-            )
-            
-            for meal_type, meal_list in plan.items():
-                if isinstance(meal_list, list) and meal_list:
-                    temp_df = pd.DataFrame(meal_list)
-                    cleaned_df = temp_df.where(pd.notna(temp_df), None)
-                    plan[meal_type] = cleaned_df.to_dict(orient='records')
-            
             plan_date = datetime.strptime(plan_date_str, '%Y-%m-%d').date()
-            
-            MealPlan.query.filter_by(user_id=user.id, plan_date=plan_date).delete()
-            new_plan = MealPlan(user_id=user.id, plan_date=plan_date, plan_data=json.dumps(plan))
-            db.session.add(new_plan)
-            db.session.commit()
+            seed = data.get('seed')
+            if not isinstance(seed, int):
+                # Generate ulang untuk tanggal yang sama memakai id plan lama sebagai salt
+                previous_plan_id = db.session.query(MealPlan.id).filter_by(user_id=user_id, plan_date=plan_date).scalar()
+                seed = plan_seed(user_id, plan_date, salt=previous_plan_id)
+            # Koneksi DB dilepas selama planner berjalan
+            db.session.close()
+            params = dict(target_kalori_harian=target_calories, preferensi=preferences, alergi=allergies, budget_harian=daily_budget, seed=seed, mode=mode)
+
+            if run_async:
+                try:
+                    job, created = plan_jobs.submit(user_id, plan_date, params)
+                except QueueFull:
+                    response = jsonify({"status": "error", "message": "Antrian meal plan penuh, coba lagi nanti."})
+                    response.headers['Retry-After'] = str(JOB_RETRY_AFTER_S)
+                    return response, 503
+                # status_url (tabel PlanJob) dan plan_url (tabel MealPlan) bisa dilayani worker mana pun
+                return jsonify({"status": "accepted", "job_id": job['id'], "job_status": job['state'], "deduplicated": not created,
+                                "status_url": url_for('meal_plan_bp.get_meal_plan_job', job_id=job['id']),
+                                "plan_url": url_for('meal_plan_bp.get_meal_plan_endpoint', user_email=user.email, plan_date=plan_date.isoformat())}), 202
 
-            return jsonify({"status": "success", "message": "Meal plan berhasil dibuat.", "meal_plan": plan}), 201
+            plan = meal_planner_engine.create_daily_meal_plan(**params)
+            # Satu kali encode: bytes yang sama untuk kolom plan_data dan body respons
+            plan_json = persist_meal_plan(user_id, plan_date, plan)
+
+            return json_response({"status": "success", "message": "Meal plan berhasil dibuat."}, 201, raw_fields={"meal_plan": plan_json})
         
         except Exception as e:
-            print(f"ERROR saat membuat meal plan: {e}")
+            log.exception("Gagal membuat meal plan: %s", e)
             return jsonify({"status": "error", "message": "Gagal membuat meal plan."}), 500
 
+    @meal_plan_bp.route('/meal-plan-jobs/<job_id>', methods=['GET'])
+    def get_meal_plan_job(job_id):
+        job = plan_jobs.get(job_id) if plan_jobs is not None else None
+        if job is None: return jsonify({"status": "error", "message": "Job tidak ditemukan."}), 404
+        payload = {"status": "success", "job_id": job['id'], "job_status": job['state'], "plan_date": job['plan_date']}
+        if job['state'] == 'failed':
+            payload['error'] = job['error']
+        if job['state'] != 'done':
+            return jsonify(payload), 200
+        plan_data = db.session.query(MealPlan.plan_data).filter_by(user_id=job['user_id'], plan_date=date.fromisoformat(job['plan_date'])).limit(1).scalar()
+        return json_response(payload, 200, raw_fields={"meal_plan": plan_data.encode('utf-8')} if plan_data is not None else None)
+
+    @meal_plan_bp.route('/generate-meal-plan/weekly', methods=['POST'])
+    def generate_weekly_meal_plan_endpoint():
+        data = request.json or {}
+        user_email = data.get('user_email')
+        start_date_str = data.get('start_date', datetime.now().strftime('%Y-%m-%d'))
+        days = data.get('days', 7)
+        weekly_budget = data.get('weekly_budget')
+        if not (user_email or bearer_token()): return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        if not isinstance(days, int) or not 1 <= days <= WEEKLY_MAX_DAYS:
+            return jsonify({"status": "error", "message": f"Jumlah hari harus antara 1 dan {WEEKLY_MAX_DAYS}."}), 400
+        if weekly_budget is not None and (not isinstance(weekly_budget, (int, float)) or weekly_budget <= 0):
+            return jsonify({"status": "error", "message": "Budget mingguan harus angka positif."}), 400
+
+        user = current_profile(user_email)
+        if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
+
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({"status": "error", "message": "Format tanggal tidak valid (YYYY-MM-DD)."}), 400
+
+        if not user.target_calories or not (user.daily_budget or weekly_budget):
+            return jsonify({"status": "error", "message": "Target kalori dan budget harian harus diatur di profil."}), 400
+
+        meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
+
+        try:
+            weekly_plan = meal_planner_engine.create_weekly_meal_plan(
+                target_kalori_harian=user.target_calories,
+                preferensi=user.preferences, alergi=user.allergies,
+                budget_harian=user.daily_budget, n_hari=days, budget_mingguan=weekly_budget,
+                seed=data['seed'] if isinstance(data.get('seed'), int) else plan_seed(user.id, start_date)
+            )
+
+            plan_dates = [start_date + timedelta(days=i) for i in range(days)]
+            attach_menu_ratings(_plan_items(weekly_plan))
+            plans_json = [dumps(plan) for plan in weekly_plan]
+
+            MealPlan.query.filter(MealPlan.user_id == user.id, MealPlan.plan_date.between(plan_dates[0], plan_dates[-1])).delete(synchronize_session=False)
+            db.session.execute(MealPlan.__table__.insert(), [
+                {"user_id": user.id, "plan_date": plan_date, "plan_data": plan_json.decode('utf-8')} for plan_date, plan_json in zip(plan_dates, plans_json)
+            ])
+            db.session.commit()
+
+            total_cost = sum(item.get('Harga') or 0 for item in _plan_items(weekly_plan))
+            meal_plans_json = b'[' + b','.join(
+                b'{"plan_date":' + dumps(d.isoformat()) + b',"meal_plan":' + plan_json + b'}' for d, plan_json in zip(plan_dates, plans_json)
+            ) + b']'
+            return json_response({
+                "status": "success", "message": f"Meal plan {days} hari berhasil dibuat.", "total_cost": total_cost,
+            }, 201, raw_fields={"meal_plans": meal_plans_json})
+
+        except Exception as e:
+            db.session.rollback()
+            log.exception("Gagal membuat meal plan mingguan: %s", e)
+            return jsonify({"status": "error", "message": "Gagal membuat meal plan mingguan."}), 500
+
+    @meal_plan_bp.route('/generate-meal-plans/batch', methods=['POST'])
+    def generate_meal_plans_batch_endpoint():
+        data = request.json or {}
+        batch_requests = data.get('requests')
+        if not isinstance(batch_requests, list) or not batch_requests:
+            return jsonify({"status": "error", "message": "Daftar requests (user_email, plan_date) dibutuhkan."}), 400
+        if len(batch_requests) > BATCH_MAX_REQUESTS:
+            return jsonify({"status": "error", "message": f"Maksimal {BATCH_MAX_REQUESTS} request per batch."}), 400
+        mode = data.get('mode', current_app.config.get('PLANNER_MODE', 'greedy'))
+        if mode not in PLAN_MODES: return jsonify({"status": "error", "message": f"Mode harus salah satu dari: {', '.join(PLAN_MODES)}."}), 400
+
+        default_date_str = datetime.now().strftime('%Y-%m-%d')
+        emails = list({r.get('user_email') for r in batch_requests if isinstance(r, dict) and r.get('user_email')})
+        users_by_email = {}
+        for start in range(0, len(emails), BATCH_QUERY_CHUNK):
+            for user in User.query.filter(User.email.in_(emails[start:start + BATCH_QUERY_CHUNK])).all():
+                users_by_email[user.email] = user
+
+        results = []
+        jobs = {}
+        for item in batch_requests:
+            item = item if isinstance(item, dict) else {}
+            user_email = item.get('user_email')
+            plan_date_str = item.get('plan_date', default_date_str)
+            result = {"user_email": user_email, "plan_date": plan_date_str}
+            results.append(result)
+
+            user = users_by_email.get(user_email)
+            if not user:
+                result.update(status="error", message="Pengguna tidak ditemukan."); continue
+            if not all([user.target_calories, user.daily_budget]):
+                result.update(status="error", message="Target kalori dan budget harian harus diatur di profil."); continue
+            try:
+                plan_date = datetime.strptime(plan_date_str, '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                result.update(status="error", message="Format tanggal tidak valid (YYYY-MM-DD)."); continue
+
+            # (user, tanggal) ganda dalam satu batch: yang terakhir dipakai
+            previous = jobs.get((user.id, plan_date))
+            if previous:
+                previous['result'].update(status="skipped", message="Digantikan request lain dalam batch yang sama.")
+            jobs[(user.id, plan_date)] = {"result": result, "profile": {
+                "target_kalori_harian": user.target_calories, "budget_harian": user.daily_budget, "seed": plan_seed(user.id, plan_date), "mode": mode,
+                "preferensi": json.loads(user.preferences) if user.preferences else [],
+                "alergi": json.loads(user.allergies) if user.allergies else [],
+            }}
+
+        if jobs:
+            meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
+            keys = list(jobs.keys())
+            try:
+                plans = meal_planner_engine.create_daily_meal_plans_batch([jobs[k]['profile'] for k in keys])
+                attach_menu_ratings(_plan_items(plans))
+                rows = [{"user_id": user_id, "plan_date": plan_date, "plan_data": dumps(plan).decode('utf-8')}
+                        for (user_id, plan_date), plan in zip(keys, plans)]
+
+                for start in range(0, len(keys), BATCH_QUERY_CHUNK):
+                    db.session.execute(MealPlan.__table__.delete().where(
+                        db.tuple_(MealPlan.user_id, MealPlan.plan_date).in_(keys[start:start + BATCH_QUERY_CHUNK])
+                    ))
+                db.session.execute(MealPlan.__table__.insert(), rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                log.exception("Gagal membuat meal plan batch: %s", e)
+                return jsonify({"status": "error", "message": "Gagal membuat meal plan batch."}), 500
+
+            for key in keys:
+                jobs[key]['result']['status'] = "success"
+
+        created = sum(1 for r in results if r['status'] == "success")
+        return jsonify({"status": "success", "message": f"{created} meal plan berhasil dibuat.", "created": created, "results": results}), 201
+
     return meal_plan_bp
\ No newline at end of file
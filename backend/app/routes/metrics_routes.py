@@ -0,0 +1,31 @@
+# app/routes/metrics_routes.py
+
+from flask import Blueprint, Response, current_app
+from app.metrics import REGISTRY
+
+def create_metrics_blueprint():
+    metrics_bp = Blueprint('metrics_bp', __name__)
+
+    # Format teks Prometheus: histogram durasi route & tahap planner + statistik cache ranking
+    @metrics_bp.route('/metrics', methods=['GET'])
+    def metrics():
+        engine = current_app.config['MEAL_PLANNER_ENGINE']
+        gauges = []
+        if engine.ranking_cache is not None:
+            stats = engine.ranking_cache.stats()
+            gauges += [
+                ('kosankenyang_planner_cache_hits_total', 'counter', 'Cache hit daftar kandidat planner.', stats['hits'], {}),
+                ('kosankenyang_planner_cache_misses_total', 'counter', 'Cache miss daftar kandidat planner.', stats['misses'], {}),
+                ('kosankenyang_planner_cache_evictions_total', 'counter', 'Entri cache planner yang dibuang (LRU).', stats['evictions'], {}),
+                ('kosankenyang_planner_cache_size', 'gauge', 'Jumlah entri cache planner.', stats['size'], {}),
+            ]
+        profile_stats = current_app.config['PROFILE_CACHE'].stats()
+        gauges += [
+            ('kosankenyang_profile_cache_hits_total', 'counter', 'Cache hit profil user.', profile_stats['hits'], {}),
+            ('kosankenyang_profile_cache_misses_total', 'counter', 'Cache miss profil user.', profile_stats['misses'], {}),
+            ('kosankenyang_profile_cache_flushes_total', 'counter', 'Cache profil dikosongkan karena generasi profil berubah di worker lain.', profile_stats['flushes'], {}),
+        ]
+        gauges.append(('kosankenyang_dataset_info', 'gauge', 'Versi dataset restoran yang sedang dilayani.', 1, {'version': engine.dataset_version}))
+        return Response(REGISTRY.render(gauges), mimetype='text/plain; version=0.0.4')
+
+    return metrics_bp
@@ -1,11 +1,21 @@
 # app/routes/recommendation_routes.py
 
 from flask import Blueprint, request, jsonify, current_app
-from geopy.distance import geodesic
-import pandas as pd
-import json #
+from app.models import db, Review, attach_menu_ratings
+from app.auth import current_profile, bearer_token
+from app.metrics import stage_timer
+from app.serialization import clean_records, dumps, JSON_MIMETYPE
+import logging
+import numpy as np
 
-def create_recommendation_blueprint(users_db, restaurants_data):
+log = logging.getLogger(__name__)
+
+RECOMMENDATION_DEFAULT = 20
+RECOMMENDATION_MAX = 100
+# Target kalori & budget satu kali makan = porsi dari nilai harian
+MEAL_PORTION = 0.35
+
+def create_recommendation_blueprint():
     reco_bp = Blueprint('reco_bp', __name__)
 
     @reco_bp.route('/recommendations/nearby', methods=['GET'])
@@ -22,40 +32,95 @@ def create_recommendation_blueprint(users_db, restaurants_data):
         except (ValueError, TypeError):
             return jsonify({"status": "error", "message": "Latitude dan longitude harus berupa angka."}), 400
 
-        print(f"INFO: Menerima permintaan makanan terdekat untuk lokasi: {user_lat}, {user_lon}")
+        log.debug("Menerima permintaan makanan terdekat untuk lokasi: %s, %s", user_lat, user_lon)
         
         try:
             meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
-            df_all_food = meal_planner_engine.df.copy()
-
-            def calculate_distance(row):
-                resto_lat = row.get('latitude')
-                resto_lon = row.get('longitude')
-                if pd.notna(resto_lat) and pd.notna(resto_lon):
-                    return geodesic((user_lat, user_lon), (resto_lat, resto_lon)).km
-                return float('inf')
-
-            df_all_food['jarak_km'] = df_all_food.apply(calculate_distance, axis=1)
-            nearby_foods_df = df_all_food.sort_values(by='jarak_km').head(20)
+            nearby_foods_df = meal_planner_engine.find_nearby_foods(user_lat, user_lon, limit=20)
             
-            json_string = nearby_foods_df.to_json(orient='records')
-            nearby_foods_list = json.loads(json_string)
+            nearby_foods_list = attach_menu_ratings(clean_records(nearby_foods_df.to_dict(orient='records')))
 
-            print(f"INFO: Mengirim {len(nearby_foods_list)} rekomendasi makanan terdekat.")
-            return jsonify(nearby_foods_list), 200
+            log.debug("Mengirim %d rekomendasi makanan terdekat.", len(nearby_foods_list))
+            return current_app.response_class(dumps(nearby_foods_list), status=200, mimetype=JSON_MIMETYPE)
 
         except Exception as e:
-            print(f"ERROR saat menghitung rekomendasi terdekat: {e}")
+            log.exception("Gagal menghitung rekomendasi terdekat: %s", e)
             return jsonify({"status": "error", "message": "Terjadi kesalahan internal saat memproses permintaan."}), 500
 
     @reco_bp.route('/recommendations', methods=['POST'])
     def get_ai_recommendations():
-        print("INFO: Endpoint /recommendations dipanggil, tetapi saat ini tidak aktif.")
-        return jsonify([]), 200
+        data = request.get_json(silent=True) or {}
+        # Klien mengirim email di field `user_id`
+        user_email = data.get('user_email') or data.get('user_id')
+        limit = data.get('limit', RECOMMENDATION_DEFAULT)
+        if not (user_email or bearer_token()): return jsonify({"status": "error", "message": "Email pengguna dibutuhkan."}), 400
+        if not isinstance(limit, int) or not 1 <= limit <= RECOMMENDATION_MAX:
+            return jsonify({"status": "error", "message": f"limit harus antara 1 dan {RECOMMENDATION_MAX}."}), 400
+
+        user = current_profile(user_email)
+        if not user: return jsonify({"status": "error", "message": "Pengguna tidak ditemukan."}), 404
+
+        preferences, allergies = user.preferences, user.allergies
+        budget = user.daily_budget * MEAL_PORTION if user.daily_budget else np.inf
+        target_kalori = (user.target_calories or 0) * MEAL_PORTION
+
+        try:
+            meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
+            model = current_app.config.get('RECOMMENDER_MODEL')
+            rated = dict(db.session.query(Review.menu_name, Review.rating).filter_by(user_id=user.id))
+
+            items = []
+            if model is not None and rated:
+                with stage_timer('item_recommender'):
+                    personal = meal_planner_engine.menu_rows(model.recommend(rated, n=limit), allergies, budget)
+                items = clean_records(personal.assign(sumber_rekomendasi='personal').to_dict(orient='records'))
+            # Pengguna baru / tanpa model / hasil kurang: dilengkapi rekomendasi populer sesuai preferensi
+            if len(items) < limit:
+                popular = meal_planner_engine.recommend_popular(
+                    target_kalori, preferences, allergies, budget, n=limit - len(items), exclude=list(rated) + [item['Nama'] for item in items]
+                )
+                if not popular.empty:
+                    items += clean_records(popular.assign(sumber_rekomendasi='populer').to_dict(orient='records'))
+
+            attach_menu_ratings(items)
+            log.debug("Mengirim %d rekomendasi untuk user %s.", len(items), user.id, extra={'rated': len(rated), 'model': model.version if model is not None else None})
+            return current_app.response_class(dumps(items), status=200, mimetype=JSON_MIMETYPE)
+        except Exception as e:
+            log.exception("Gagal menghitung rekomendasi: %s", e)
+            return jsonify({"status": "error", "message": "Terjadi kesalahan internal saat memproses permintaan."}), 500
 
     @reco_bp.route('/cold_start_recommendations', methods=['POST'])
     def get_cold_start_recommendations():
-        print("INFO: Endpoint /cold_start_recommendations dipanggil.")
-        return jsonify([]), 200
+        data = request.get_json(silent=True) or {}
+        latitude, longitude = data.get('latitude'), data.get('longitude')
+        target_calories = data.get('target_calories') or 0
+        preferences = data.get('preferences') or []
+        allergies = data.get('allergies') or []
+        limit = data.get('limit', RECOMMENDATION_DEFAULT)
+        if (latitude is None) != (longitude is None):
+            return jsonify({"status": "error", "message": "Latitude dan longitude harus dikirim bersamaan."}), 400
+        try:
+            latitude = float(latitude) if latitude is not None else None
+            longitude = float(longitude) if longitude is not None else None
+            target_calories = float(target_calories)
+        except (ValueError, TypeError):
+            return jsonify({"status": "error", "message": "Latitude, longitude, dan target_calories harus berupa angka."}), 400
+        if not isinstance(preferences, list) or not isinstance(allergies, list):
+            return jsonify({"status": "error", "message": "preferences dan allergies harus berupa list."}), 400
+        if not isinstance(limit, int) or not 1 <= limit <= RECOMMENDATION_MAX:
+            return jsonify({"status": "error", "message": f"limit harus antara 1 dan {RECOMMENDATION_MAX}."}), 400
+
+        try:
+            meal_planner_engine = current_app.config['MEAL_PLANNER_ENGINE']
+            popular = meal_planner_engine.recommend_popular(
+                target_calories * MEAL_PORTION, [str(p) for p in preferences], [str(a) for a in allergies],
+                latitude=latitude, longitude=longitude, n=limit
+            )
+            items = attach_menu_ratings(clean_records(popular.to_dict(orient='records'))) if not popular.empty else []
+            log.debug("Mengirim %d rekomendasi cold start.", len(items))
+            return current_app.response_class(dumps(items), status=200, mimetype=JSON_MIMETYPE)
+        except Exception as e:
+            log.exception("Gagal menghitung rekomendasi cold start: %s", e)
+            return jsonify({"status": "error", "message": "Terjadi kesalahan internal saat memproses permintaan."}), 500
     
     return reco_bp
\ No newline at end of file
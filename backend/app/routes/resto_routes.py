@@ -1,16 +1,77 @@
 # app/routes/resto_routes.py
 
-from flask import Blueprint, request, jsonify
-from app.models import db, User, Review
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.models import db, User, Review, MenuRating, upsert_review
+from app.auth import current_profile, bearer_token
+from app.ml_engine.menu_rating import RATING_MIN, RATING_MAX
+from app.restaurant_catalog import catalog_for
+from app.serialization import json_response
+import logging
+import math
 
-def create_resto_blueprint(menu_reviews_db, restaurants_data_list, users_db):
+log = logging.getLogger(__name__)
+
+REVIEW_PAGE_MAX = 200
+MENU_NAME_MAX = 150
+RESTAURANT_PAGE_DEFAULT = 200
+RESTAURANT_PAGE_MAX = 1000
+# Klien wajib revalidasi (If-None-Match) sebelum memakai salinan cache
+RESTAURANT_CACHE_CONTROL = 'no-cache'
+
+# "min_lon,min_lat,max_lon,max_lat" (urutan bbox GeoJSON) -> tuple float, None bila tidak valid
+def _parse_bbox(value):
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        return None
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        return None
+    return min_lon, min_lat, max_lon, max_lat
+
+def create_resto_blueprint():
     resto_bp = Blueprint('resto_bp', __name__)
 
     @resto_bp.route('/restaurants', methods=['GET'])
     def get_all_restaurants():
-        if not restaurants_data_list:
+        limit = request.args.get('limit', type=int)
+        after_id = request.args.get('cursor', type=int)
+        bbox_arg = request.args.get('bbox')
+        if limit is not None and not 1 <= limit <= RESTAURANT_PAGE_MAX:
+            return jsonify({"status": "error", "message": f"limit harus antara 1 dan {RESTAURANT_PAGE_MAX}."}), 400
+        if 'cursor' in request.args and after_id is None:
+            return jsonify({"status": "error", "message": "Cursor tidak valid."}), 400
+        bbox = _parse_bbox(bbox_arg) if bbox_arg is not None else None
+        if bbox_arg is not None and bbox is None:
+            return jsonify({"status": "error", "message": "bbox harus min_lon,min_lat,max_lon,max_lat."}), 400
+
+        # Dari engine aktif (ikut tertukar saat dataset di-reload); di-encode sekali per versi dataset
+        catalog = catalog_for(current_app)
+        if not len(catalog):
             return jsonify({"status": "error", "message": "Data restoran tidak tersedia."}), 503
-        return jsonify(restaurants_data_list)
+
+        paged = not (limit is None and after_id is None and bbox is None)
+        if paged:
+            limit = limit or RESTAURANT_PAGE_DEFAULT
+            encoding, query = 'identity', catalog.query_key(bbox, after_id, limit)
+        else:
+            encoding, query = request.accept_encodings.best_match([e for e in ('br', 'gzip') if e in catalog.variants]) or 'identity', None
+
+        # ETag = hash payload versi dataset ini (+ query untuk halaman/bbox); dicek sebelum body dibangun
+        if catalog.matches(request.headers.get('If-None-Match'), query):
+            response = Response(status=304)
+        elif not paged:
+            # Tanpa parameter: list penuh seperti sebelumnya, varian terkompresi sudah disiapkan
+            response = Response(catalog.variants[encoding], mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        else:
+            # Halaman / bbox: bytes restoran yang sudah di-encode disambung tanpa encode ulang
+            items, next_cursor = catalog.page(bbox, after_id, limit)
+            response = json_response({"status": "success", "next_cursor": next_cursor}, raw_fields={'restaurants': b'[' + b','.join(items) + b']'})
+        response.headers['ETag'] = catalog.variant_etag(encoding, query)
+        response.headers['Cache-Control'] = RESTAURANT_CACHE_CONTROL
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
 
     @resto_bp.route('/submit_rating_review', methods=['POST'])
     def submit_rating_review():
@@ -21,55 +82,83 @@ def create_resto_blueprint(menu_reviews_db, restaurants_data_list, users_db):
         review_text = data.get('review_text', '')
         user_name_from_req = data.get('user_name')
 
-        if not all([user_email, menu_name, rating is not None]):
+        if not all([user_email or bearer_token(), menu_name, rating is not None]):
             return jsonify({"status": "error", "message": "Email, nama menu, dan rating dibutuhkan."}), 400
+        try:
+            rating = float(rating) if not isinstance(rating, bool) else None
+        except (TypeError, ValueError):
+            rating = None
+        if rating is None:
+            return jsonify({"status": "error", "message": "Rating harus berupa angka."}), 400
+        # Rating masuk ke jumlah berjalan menu_rating: nilai di luar skala (atau NaN/inf) merusak agregat
+        if not math.isfinite(rating) or not RATING_MIN <= rating <= RATING_MAX:
+            return jsonify({"status": "error", "message": f"Rating harus antara {RATING_MIN:g} dan {RATING_MAX:g}."}), 400
+        # Divalidasi penuh di sini: dengan write-behind, error saat batch ditulis tidak bisa lagi dilaporkan ke klien
+        if not isinstance(menu_name, str) or len(menu_name) > MENU_NAME_MAX:
+            return jsonify({"status": "error", "message": f"Nama menu harus teks maksimal {MENU_NAME_MAX} karakter."}), 400
+        if review_text is not None and not isinstance(review_text, str):
+            return jsonify({"status": "error", "message": "Ulasan harus berupa teks."}), 400
 
-        user = User.query.filter_by(email=user_email).first()
+        user = current_profile(user_email)
         if not user:
             return jsonify({"status": "error", "message": "Pengguna tidak terdaftar di database."}), 404
         
-        existing_review = Review.query.filter_by(user_id=user.id, menu_name=menu_name).first()
+        app = current_app._get_current_object()
 
-        if existing_review:
-            existing_review.rating = rating
-            existing_review.review_text = review_text
-        else:
-            new_review = Review(menu_name=menu_name, rating=rating, review_text=review_text, author=user)
-            db.session.add(new_review)
-        
-        db.session.commit()
+        # Agregat menu_rating diperbarui dalam transaksi yang sama dengan upsert ulasan;
+        # skor rating engine diperbarui setelah commit (hanya baris menu ini)
+        def save_review(session):
+            delta = upsert_review(user.id, menu_name, rating, review_text)
+            return lambda: app.config['MEAL_PLANNER_ENGINE'].menu_ratings.apply(menu_name, *delta)
+
+        # Dengan write-behind (DB_WRITE_BEHIND), 201 berarti ulasan diterima dan masuk antrian, belum
+        # tentu sudah tersimpan: commit terjadi di batch berikutnya (paling lama DB_WRITE_BEHIND_MS),
+        # dan kegagalan saat itu hanya dicatat di log.
+        batcher = app.config.get('WRITE_BATCHER')
+        if batcher is None or not batcher.submit(save_review):
+            after_commit = save_review(db.session)
+            db.session.commit()
+            after_commit()
         
         user_name_to_log = user_name_from_req or user.nama
-        print(f"Ulasan baru/update untuk '{menu_name}' dari '{user_name_to_log}' ({user_email}): Rating {rating}")
+        log.debug("Ulasan baru/update untuk '%s' dari '%s' (%s): Rating %s", menu_name, user_name_to_log, user_email, rating)
         return jsonify({"status": "success", "message": "Rating dan ulasan berhasil disimpan."}), 201
 
     @resto_bp.route('/get_menu_reviews', methods=['GET'])
     def get_menu_reviews():
         menu_name = request.args.get('menu_name')
+        limit = request.args.get('limit', type=int)
+        after_id = request.args.get('cursor', type=int)
         if not menu_name:
             return jsonify({"status": "error", "message": "Nama menu dibutuhkan."}), 400
+        if limit is not None and not 1 <= limit <= REVIEW_PAGE_MAX:
+            return jsonify({"status": "error", "message": f"limit harus antara 1 dan {REVIEW_PAGE_MAX}."}), 400
         
-        reviews_from_db = Review.query.filter_by(menu_name=menu_name).all()
-        
-        average_rating = 0.0
-        if reviews_from_db:
-            total_rating = sum(r.rating for r in reviews_from_db)
-            average_rating = total_rating / len(reviews_from_db)
-        
-        return_reviews = []
-        for review in reviews_from_db:
-            return_reviews.append({
-                "user_name": review.author.nama, 
-                "rating": review.rating,
-                "review": review.review_text
-            })
-
-        print(f"Mengirim {len(return_reviews)} ulasan untuk '{menu_name}'. Rata-rata: {average_rating:.2f}")
+        # Rata-rata dari agregat menu_rating; nama penulis ikut di-join (tanpa query per ulasan)
+        aggregate = db.session.get(MenuRating, menu_name)
+        average_rating = aggregate.average_rating if aggregate else 0.0
+
+        query = db.session.query(Review.id, Review.rating, Review.review_text, User.nama).join(User, Review.user_id == User.id).filter(Review.menu_name == menu_name)
+        if after_id is not None:
+            query = query.filter(Review.id > after_id)
+        query = query.order_by(Review.id)
+        rows = query.limit(limit + 1).all() if limit is not None else query.all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].id
+
+        return_reviews = [{"user_name": row.nama, "rating": row.rating, "review": row.review_text} for row in rows]
+
+        log.debug("Mengirim %d ulasan untuk '%s'. Rata-rata: %.2f", len(return_reviews), menu_name, average_rating)
         return jsonify({
             "status": "success",
             "menu_name": menu_name,
             "average_rating": average_rating,
-            "reviews": return_reviews
+            "review_count": aggregate.review_count if aggregate else 0,
+            "reviews": return_reviews,
+            "next_cursor": next_cursor
         }), 200
 
     return resto_bp
\ No newline at end of file
@@ -0,0 +1,69 @@
+# app/serialization.py
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+# orjson opsional (lebih cepat); tanpa orjson dipakai json bawaan dengan hasil yang setara.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+# Nilai hasil pandas/numpy -> tipe Python native yang aman untuk JSON (NaN/Inf/NA -> None).
+def to_native(value):
+    if isinstance(value, float):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, (str, bool, int)) or value is None:
+        return value
+    if isinstance(value, np.generic):
+        return to_native(value.item())
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_native(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_native(v) for k, v in value.items()}
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.isoformat()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+# List record (dict) -> record native dengan key seragam (key yang tidak ada diisi None),
+# setara dengan DataFrame(records).to_json(orient='records') tanpa round-trip string.
+def clean_records(records):
+    keys = {}
+    for record in records:
+        keys.update(dict.fromkeys(record))
+    return [{key: to_native(record.get(key)) for key in keys} for record in records]
+
+def _default(value):
+    value = to_native(value)
+    if isinstance(value, (dict, list, str, int, float, bool)) or value is None:
+        return value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Encode ke bytes JSON ringkas (UTF-8).
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=_default)
+    try:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), allow_nan=False, default=_default).encode('utf-8')
+    except ValueError:
+        # Ada NaN/Inf yang lolos: bersihkan dulu lalu encode ulang
+        return json.dumps(to_native(obj), ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+# Respons JSON dari `payload` + field yang sudah ter-encode (`raw_fields`: key -> bytes JSON),
+# disambung tanpa decode; body dikirim sebagai potongan bytes (Content-Length tetap dihitung).
+def json_response(payload, status=200, raw_fields=None):
+    head = dumps(payload)[:-1]
+    chunks, empty = [head], head == b'{'
+    for key, raw in (raw_fields or {}).items():
+        chunks += [b'' if empty else b',', dumps(key), b':', raw]
+        empty = False
+    chunks.append(b'}')
+    return Response(chunks, status=status, mimetype=JSON_MIMETYPE)
@@ -0,0 +1,222 @@
+# bench/run_bench.py
+#
+# Jalankan dari direktori backend:
+#   python -m bench.run_bench --scales 1 10 100 [--output bench/results/x.json] [--baseline lama.json]
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DATASET = os.path.join(BASE_DIR, 'data', 'dataset_restoran_sidoarjo_enriched.json')
+# Area Sidoarjo untuk koordinat acak /recommendations/nearby
+BBOX_SIDOARJO = (-7.55, -7.35, 112.55, 112.85)
+PREFERENSI = ['pedas', 'ayam', 'manis', 'gurih', 'soto', 'bakso', 'kopi', 'nasi', 'sapi', 'ikan', 'sayur', 'goreng']
+ALERGI = ['seafood', 'kacang', 'susu', 'telur', 'gluten', 'kedelai']
+
+def _stats(durations):
+    arr = np.asarray(durations) * 1000
+    return {
+        'n': len(arr), 'mean_ms': round(float(arr.mean()), 3), 'min_ms': round(float(arr.min()), 3),
+        'p50_ms': round(float(np.percentile(arr, 50)), 3), 'p95_ms': round(float(np.percentile(arr, 95)), 3),
+        'p99_ms': round(float(np.percentile(arr, 99)), 3),
+    }
+
+def _measure(fn, args_list):
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - start)
+    return _stats(durations)
+
+def _profiles(n, seed):
+    rng = random.Random(seed)
+    return [{
+        'target_kalori_harian': rng.randint(1500, 2800), 'budget_harian': rng.randint(20, 90) * 1000,
+        'preferensi': rng.sample(PREFERENSI, rng.randint(1, 3)),
+        'alergi': rng.sample(ALERGI, rng.randint(0, 2)),
+    } for _ in range(n)]
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_engine(data_path, workdir, iterations, seed):
+    from app.ml_engine.meal_planner import MealPlanner
+    from app.ml_engine.plan_cache import RankingCache
+
+    result = {}
+    snapshot_dir = os.path.join(workdir, 'snapshot')
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    start = time.perf_counter()
+    MealPlanner(data_path=data_path, snapshot_dir=snapshot_dir)
+    result['init_cold_s'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    engine = MealPlanner(data_path=data_path, snapshot_dir=snapshot_dir)
+    result['init_snapshot_s'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    MealPlanner(data_path=data_path)
+    result['init_no_snapshot_s'] = round(time.perf_counter() - start, 3)
+    result['menu_rows'] = len(engine.df)
+    result['restaurants'] = len(engine.restaurants_data)
+
+    profiles = _profiles(iterations, seed)
+    kandidat = engine.candidate_index.slot_rows('maincourse')
+    result['recommend_food'] = _measure(engine._recommend_food, [
+        (kandidat, p['target_kalori_harian'] * 0.4, p['preferensi'], p['alergi'], p['budget_harian'] * 0.4) for p in profiles
+    ])
+    # Tanpa cache ranking (biaya komputasi murni) lalu dengan cache (profil berulang seperti produksi)
+    for mode in ('greedy', 'optimal'):
+        result[f'create_daily_meal_plan_{mode}'] = _measure(
+            lambda p, i: engine.create_daily_meal_plan(p['target_kalori_harian'], p['preferensi'], p['alergi'], p['budget_harian'], seed=i, mode=mode),
+            [(p, i) for i, p in enumerate(profiles)]
+        )
+    engine.ranking_cache = RankingCache()
+    repeated = [profiles[i % 20] for i in range(iterations)]
+    result['create_daily_meal_plan_cached'] = _measure(
+        lambda p, i: engine.create_daily_meal_plan(p['target_kalori_harian'], p['preferensi'], p['alergi'], p['budget_harian'], seed=i),
+        [(p, i) for i, p in enumerate(repeated)]
+    )
+    result['ranking_cache'] = engine.ranking_cache.stats()
+    return result
+
+# User, pengeluaran, dan ulasan sintetis langsung lewat insert massal (bukan lewat endpoint).
+def _seed_database(db, models, engine, n_users, expenses_per_user, seed):
+    rng = random.Random(seed)
+    User, Expense, Review = models
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [{
+        'nama': f'Bench {i}', 'email': f'bench{i}@example.com', 'password_hash': 'x', 'setup_completed': True,
+        'target_calories': 2000.0, 'daily_budget': 50000.0, 'monthly_budget': 1500000.0, 'preferences': '[]', 'allergies': '[]',
+    } for i in range(n_users)])
+    user_ids = [row[0] for row in db.session.query(User.id).all()]
+    db.session.execute(Expense.__table__.insert(), [{
+        'user_id': user_id, 'amount': float(rng.randint(5, 60) * 1000), 'description': 'Pembelian makanan',
+        'timestamp': now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+    } for user_id in user_ids for _ in range(expenses_per_user)])
+    menu_names = list(engine.df['Nama'].value_counts().index[:50])
+    db.session.execute(Review.__table__.insert(), [{
+        'user_id': user_id, 'menu_name': menu_name, 'rating': float(rng.randint(1, 5)), 'review_text': 'Enak',
+    } for menu_name in menu_names for user_id in user_ids if rng.random() < 0.5])
+    db.session.commit()
+    return menu_names
+
+def bench_api(data_path, workdir, iterations, seed, n_users, expenses_per_user):
+    from app import create_app
+    from app.models import db, User, Expense, Review, backfill_menu_ratings, menu_rating_totals
+
+    db_path = os.path.join(workdir, 'bench.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    # User benchmark diakses lewat parameter email (tanpa login), jadi jalur email lama diaktifkan
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path, 'MEAL_PLANNER_DATA_PATH': data_path,
+                      'SECRET_KEY': 'bench', 'ALLOW_EMAIL_AUTH': True})
+    client = app.test_client()
+    with app.app_context():
+        menu_names = _seed_database(db, (User, Expense, Review), app.config['MEAL_PLANNER_ENGINE'], n_users, expenses_per_user, seed)
+        # Ulasan masuk lewat insert massal setelah create_app: agregat MenuRating dan skor rating
+        # engine diisi ulang seperti saat start-up dengan DB yang sudah berisi ulasan
+        backfill_menu_ratings()
+        app.config['MEAL_PLANNER_ENGINE'].menu_ratings.load(menu_rating_totals())
+
+    rng = random.Random(seed)
+    lat_lo, lat_hi, lon_lo, lon_hi = BBOX_SIDOARJO
+    return {
+        'nearby': _measure(lambda url: client.get(url), [
+            (f'/recommendations/nearby?latitude={rng.uniform(lat_lo, lat_hi)}&longitude={rng.uniform(lon_lo, lon_hi)}',) for _ in range(iterations)
+        ]),
+        'expense_report': _measure(lambda url: client.get(url), [
+            (f'/get_expense_report?user_email=bench{rng.randrange(n_users)}@example.com&period={rng.choice(["daily", "monthly"])}',) for _ in range(iterations)
+        ]),
+        'menu_reviews': _measure(lambda url: client.get(url), [
+            (f'/get_menu_reviews?menu_name={rng.choice(menu_names)}',) for _ in range(iterations)
+        ]),
+        'db': {'users': n_users, 'expenses': n_users * expenses_per_user},
+    }
+
+# Perbandingan p50 dengan hasil lama: rasio < 1 berarti lebih cepat
+def compare(results, baseline):
+    rows = []
+    for scale, current in results['scales'].items():
+        old = baseline.get('scales', {}).get(scale, {})
+        for section in ('engine', 'api'):
+            for name, value in current.get(section, {}).items():
+                old_value = old.get(section, {}).get(name)
+                if isinstance(value, dict) and 'p50_ms' in value and isinstance(old_value, dict) and old_value.get('p50_ms'):
+                    rows.append((scale, name, old_value['p50_ms'], value['p50_ms'], value['p50_ms'] / old_value['p50_ms']))
+    for scale, name, old_p50, new_p50, ratio in rows:
+        print(f"x{scale:<6} {name:<34} p50 {old_p50:>10.3f} -> {new_p50:>10.3f} ms  ({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MealPlanner dan endpoint API pada dataset berskala.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--expenses-per-user', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'kosankenyang-bench'))
+    parser.add_argument('--output')
+    parser.add_argument('--baseline', help="File JSON hasil benchmark sebelumnya untuk dibandingkan")
+    parser.add_argument('--skip-api', action='store_true')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    logging.basicConfig(level=logging.WARNING)
+    # create_app memakai snapshot/shared dir dari env; benchmark memakai direktori kerjanya sendiri
+    os.environ['MEAL_PLANNER_SNAPSHOT_DIR'] = os.path.join(args.workdir, 'app-snapshot')
+    os.environ.pop('MEAL_PLANNER_SHARED_DIR', None)
+    os.environ.pop('DATASET_RELOAD_INTERVAL', None)
+    sys.path.insert(0, BASE_DIR)
+    from app.metrics import REGISTRY, STAGE_METRIC
+
+    results = {
+        'meta': {
+            'commit': _git_commit(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'iterations': args.iterations, 'seed': args.seed,
+        },
+        'scales': {},
+    }
+    for factor in args.scales:
+        from bench.synth_dataset import scaled_dataset_path
+        workdir = os.path.join(args.workdir, f'x{factor}')
+        os.makedirs(workdir, exist_ok=True)
+        data_path = scaled_dataset_path(SOURCE_DATASET, factor, args.workdir, seed=args.seed)
+        print(f"== x{factor}: {data_path}")
+        REGISTRY.reset()
+        scale_result = {'engine': bench_engine(data_path, workdir, args.iterations, args.seed)}
+        if not args.skip_api:
+            scale_result['api'] = bench_api(data_path, workdir, args.iterations, args.seed, args.users, args.expenses_per_user)
+        scale_result['stages'] = REGISTRY.summary(STAGE_METRIC)
+        results['scales'][str(factor)] = scale_result
+        print(json.dumps({k: v for k, v in scale_result.items() if k != 'stages'}, indent=2))
+
+    output = args.output or os.path.join(BASE_DIR, 'bench', 'results', f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Hasil ditulis ke {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# bench/synth_dataset.py
+
+import argparse
+import json
+import os
+import random
+
+# Salinan ke-k setiap restoran: nama diberi akhiran "#k", koordinat digeser (~2 km),
+# harga & kalori menu diacak +-15% / +-10%. Salinan 0 = data asli, jadi faktor 1 = dataset asli.
+JITTER_DERAJAT = 0.02
+
+def _format_harga(harga):
+    return f"{harga:,}".replace(',', '.')
+
+def _parse_harga(harga):
+    try:
+        return int(str(harga).replace('.', ''))
+    except ValueError:
+        return None
+
+def _scaled_restaurant(resto, k, rng):
+    if k == 0:
+        return resto
+    copy = dict(resto)
+    copy['nama_restoran'] = f"{resto.get('nama_restoran')} #{k}"
+    if resto.get('latitude') is not None and resto.get('longitude') is not None:
+        copy['latitude'] = resto['latitude'] + rng.gauss(0, JITTER_DERAJAT)
+        copy['longitude'] = resto['longitude'] + rng.gauss(0, JITTER_DERAJAT)
+    if isinstance(resto.get('rating'), (int, float)):
+        copy['rating'] = round(min(5.0, max(1.0, resto['rating'] + rng.uniform(-0.2, 0.2))), 1)
+    menu = []
+    for item in resto.get('menu') or []:
+        item = dict(item)
+        harga = _parse_harga(item.get('Harga'))
+        if harga is not None:
+            item['Harga'] = _format_harga(int(round(harga * rng.uniform(0.85, 1.15) / 500) * 500))
+        if isinstance(item.get('kalori'), (int, float)):
+            item['kalori'] = round(item['kalori'] * rng.uniform(0.9, 1.1), 1)
+        menu.append(item)
+    copy['menu'] = menu
+    return copy
+
+# Tulis dataset `factor` kali lipat ke `out_path` secara streaming (satu restoran per baris).
+def write_scaled_dataset(source_path, factor, out_path, seed=0):
+    with open(source_path, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        first = True
+        for k in range(factor):
+            for resto in restaurants:
+                f.write(('' if first else ',\n') + json.dumps(_scaled_restaurant(resto, k, rng), ensure_ascii=False))
+                first = False
+        f.write('\n]\n')
+    os.replace(tmp_path, out_path)
+    return {'restaurants': len(restaurants) * factor, 'menu': sum(len(r.get('menu') or []) for r in restaurants) * factor}
+
+# Dataset hasil skala dipakai ulang bila sudah ada (nama file memuat faktor & seed).
+def scaled_dataset_path(source_path, factor, workdir, seed=0):
+    out_path = os.path.join(workdir, f"dataset_x{factor}_s{seed}.json")
+    if factor == 1:
+        return source_path
+    if not os.path.exists(out_path):
+        write_scaled_dataset(source_path, factor, out_path, seed=seed)
+    return out_path
+
+if __name__ == '__main__':
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Buat dataset restoran sintetis N kali lipat.")
+    parser.add_argument('factor', type=int)
+    parser.add_argument('out_path')
+    parser.add_argument('--source', default=os.path.join(base_dir, 'data', 'dataset_restoran_sidoarjo_enriched.json'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(write_scaled_dataset(args.source, args.factor, args.out_path, seed=args.seed))
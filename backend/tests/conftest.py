@@ -0,0 +1,17 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Paket `app` diimpor dari direktori backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'dataset_restoran_sidoarjo_enriched.json')
+
+# Engine dari dataset asli, dibangun sekali per sesi test (tanpa snapshot / shared arrays)
+@pytest.fixture(scope='session')
+def planner():
+    from app.ml_engine.meal_planner import MealPlanner
+    return MealPlanner(data_path=DATA_PATH)
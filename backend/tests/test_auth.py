@@ -0,0 +1,33 @@
+# tests/test_auth.py
+
+import os
+from multiprocessing import Pool
+
+from app.auth import LoginRateLimiter, load_or_create_secret_key
+
+def test_successful_logins_do_not_count_against_ip():
+    limiter = LoginRateLimiter(max_failures=3, max_failures_ip=5, window=60)
+    for i in range(50):
+        assert limiter.check(f'user{i}@example.com', '10.0.0.1') is None
+        limiter.success(f'user{i}@example.com')
+    assert limiter.check('user0@example.com', '10.0.0.1') is None
+
+def test_failures_block_email_and_ip():
+    limiter = LoginRateLimiter(max_failures=3, max_failures_ip=5, window=60)
+    for _ in range(3):
+        limiter.failure('a@example.com', '10.0.0.1')
+    assert limiter.check('a@example.com', '10.0.0.2') is not None
+    assert limiter.check('b@example.com', '10.0.0.1') is None
+    for i in range(2):
+        limiter.failure(f'c{i}@example.com', '10.0.0.1')
+    assert limiter.check('b@example.com', '10.0.0.1') is not None
+    assert limiter.check('b@example.com', '10.0.0.3') is None
+
+# Worker yang start bersamaan tanpa SECRET_KEY harus mendapat kunci yang sama
+def test_secret_key_file_is_shared(tmp_path):
+    path = os.path.join(tmp_path, 'keys', '.secret_key')
+    with Pool(4) as pool:
+        keys = pool.map(load_or_create_secret_key, [path] * 8)
+    assert len(set(keys)) == 1 and len(keys[0]) == 64
+    assert load_or_create_secret_key(path) == keys[0]
+    assert os.listdir(os.path.dirname(path)) == ['.secret_key']
@@ -0,0 +1,65 @@
+# tests/test_complement_index.py
+
+import numpy as np
+import pytest
+
+from app.ml_engine.complement_index import ComplementIndex, KATEGORI_PELENGKAP
+
+# Pencarian pelengkap versi lama (_recommend_combo_meal sebelum ComplementIndex): scan seluruh df
+def full_scan_best(df, nama_restoran, exclude_nama, gap_kalori, budget):
+    candidates = df[(df['nama_restoran'] == nama_restoran) & (df['Nama'] != exclude_nama)]
+    candidates = candidates[candidates['Kategori'].str.lower().isin(KATEGORI_PELENGKAP)]
+    candidates = candidates[candidates['Harga'] <= budget]
+    if candidates.empty:
+        return None
+    return (candidates['kalori'] - gap_kalori).abs().min()
+
+def random_anchors(df, count, seed):
+    rng = np.random.default_rng(seed)
+    for row in rng.integers(0, len(df), size=count):
+        yield int(row), float(rng.integers(100, 900)), float(rng.integers(3, 40) * 1000)
+
+@pytest.fixture(scope='module')
+def index(planner):
+    return planner.complement_index
+
+def test_single_complement_matches_full_scan(planner, index):
+    df = planner.df
+    for row, gap_kalori, budget in random_anchors(df, 800, seed=0):
+        nama_restoran, nama = df['nama_restoran'].iat[row], df['Nama'].iat[row]
+        expected = full_scan_best(df, nama_restoran, nama, gap_kalori, budget)
+        chosen = index.best_combo(nama_restoran, gap_kalori, budget, exclude_nama=nama)
+        if expected is None:
+            assert chosen == []
+            continue
+        assert len(chosen) == 1
+        pick = df.iloc[chosen[0]]
+        assert pick['nama_restoran'] == nama_restoran and pick['Nama'] != nama and pick['Harga'] <= budget
+        assert pick['Kategori'].lower() in KATEGORI_PELENGKAP
+        # Baris bisa berbeda bila seri; selisih kalorinya harus sama
+        assert abs(pick['kalori'] - gap_kalori) == pytest.approx(expected)
+
+# Knapsack beberapa pelengkap: taat budget, maksimal satu per kategori, dan tidak lebih jauh dari
+# target kalori dibanding satu pelengkap terbaik
+def test_multi_complement_constraints(planner, index):
+    df = planner.df
+    for row, gap_kalori, budget in random_anchors(df, 300, seed=1):
+        nama_restoran, nama = df['nama_restoran'].iat[row], df['Nama'].iat[row]
+        single = index.best_combo(nama_restoran, gap_kalori, budget, exclude_nama=nama)
+        for max_items in (2, 3):
+            chosen = index.best_combo(nama_restoran, gap_kalori, budget, exclude_nama=nama, max_items=max_items)
+            picks = df.iloc[chosen]
+            assert len(chosen) <= max_items and picks['Harga'].sum() <= budget
+            assert (picks['nama_restoran'] == nama_restoran).all() and (picks['Nama'] != nama).all()
+            assert picks['Kategori'].str.lower().is_unique
+            assert bool(chosen) == bool(single)
+            if single:
+                assert abs(picks['kalori'].sum() - gap_kalori) <= abs(df['kalori'].iat[single[0]] - gap_kalori)
+
+# Indeks yang dimuat dari shared arrays memberi hasil yang sama
+def test_from_arrays_roundtrip(planner, index):
+    restored = ComplementIndex.from_arrays(*index.to_arrays())
+    df = planner.df
+    for row, gap_kalori, budget in random_anchors(df, 200, seed=2):
+        args = (df['nama_restoran'].iat[row], gap_kalori, budget)
+        assert restored.best_combo(*args, exclude_nama=df['Nama'].iat[row], max_items=2) == index.best_combo(*args, exclude_nama=df['Nama'].iat[row], max_items=2)
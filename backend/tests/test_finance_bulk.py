@@ -0,0 +1,94 @@
+# tests/test_finance_bulk.py
+
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from app.auth import AuthError, ProfileCache, issue_token
+from app.models import db, User, Expense
+from app.routes.finance_routes import create_finance_blueprint
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'finance.db'), SECRET_KEY='test', AUTH_TOKEN_TTL=3600,
+                      ALLOW_EMAIL_AUTH=False, PROFILE_CACHE=ProfileCache(check_interval=0), WRITE_BATCHER=None)
+    db.init_app(app)
+    app.register_blueprint(create_finance_blueprint())
+
+    @app.errorhandler(AuthError)
+    def handle_auth_error(e):
+        return jsonify({"status": "error", "message": e.message}), e.status
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=i, nama=f'U{i}', email=f'u{i}@example.com', password_hash='x') for i in (1, 2)])
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def auth(app, user_id):
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + issue_token(user_id)}
+
+def stored(app):
+    with app.app_context():
+        return Expense.query.count()
+
+def test_bulk_inserts_all_rows(app, client):
+    expenses = [{'amount': 1000 + i, 'description': f'Item {i}', 'timestamp': f'2026-10-{1 + i % 28:02d}T12:00:00+07:00', 'plan_details': {'i': i}} for i in range(300)]
+    response = client.post('/record_expenses_bulk', json={'expenses': expenses}, headers=auth(app, 1))
+    assert response.status_code == 201 and response.get_json()['inserted'] == 300
+    with app.app_context():
+        rows = Expense.query.order_by(Expense.id).all()
+        assert len(rows) == 300 and {row.user_id for row in rows} == {1}
+        assert rows[0].timestamp.isoformat() == '2026-10-01T05:00:00' and json.loads(rows[5].plan_details) == {'i': 5}
+        assert rows[-1].amount == 1299 and rows[-1].description == 'Item 299'
+
+# Satu entri tidak valid: 400 dengan indeks & pesan per entri, tidak ada baris yang disimpan
+@pytest.mark.parametrize('bad, message', [
+    ({'amount': -5}, "Jumlah pengeluaran harus angka positif."),
+    ({'amount': True}, "Jumlah pengeluaran harus angka positif."),
+    ({'amount': '100'}, "Jumlah pengeluaran harus angka positif."),
+    ({'amount': 10, 'description': 'x' * 201}, "Deskripsi maksimal 200 karakter."),
+    ({'amount': 10, 'description': 5}, "Deskripsi harus berupa teks."),
+    ({'amount': 10, 'timestamp': 'kemarin'}, "Timestamp harus format ISO 8601."),
+    ({'amount': 10, 'user_email': 'u2@example.com'}, "Token bukan milik pengguna ini."),
+    ('bukan objek', "Item harus berupa objek."),
+])
+def test_bulk_is_all_or_nothing(app, client, bad, message):
+    expenses = [{'amount': 1000}] * 5 + [bad] + [{'amount': 2000}] * 5
+    response = client.post('/record_expenses_bulk', json={'expenses': expenses}, headers=auth(app, 1))
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 5, 'message': message}]
+    assert stored(app) == 0
+
+def test_bulk_requires_token_unless_email_auth(app, client):
+    expenses = [{'user_email': 'u1@example.com', 'amount': 1000}, {'user_email': 'u2@example.com', 'amount': 2000}]
+    assert client.post('/record_expenses_bulk', json={'expenses': expenses}).status_code == 401
+    app.config['ALLOW_EMAIL_AUTH'] = True
+    response = client.post('/record_expenses_bulk', json={'expenses': expenses + [{'user_email': 'u9@example.com', 'amount': 1}, {'amount': 1}]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 2, 'message': "Pengguna tidak ditemukan."}, {'index': 3, 'message': "Email pengguna dibutuhkan."}]
+    assert client.post('/record_expenses_bulk', json={'expenses': expenses}).status_code == 201
+    with app.app_context():
+        assert sorted(row.user_id for row in Expense.query) == [1, 2]
+
+def test_bulk_limits(client, app):
+    assert client.post('/record_expenses_bulk', json={'expenses': []}, headers=auth(app, 1)).status_code == 400
+    assert client.post('/record_expenses_bulk', json={'expenses': [{'amount': 1}] * 10001}, headers=auth(app, 1)).status_code == 413
+
+# Export stream memuat semua baris hasil bulk insert, berurutan menurut waktu
+def test_export_streams_bulk_rows(app, client):
+    expenses = [{'amount': i + 1, 'timestamp': f'2026-09-01T00:00:{i % 60:02d}'} for i in range(2500)]
+    headers = auth(app, 1)
+    assert client.post('/record_expenses_bulk', json={'expenses': expenses}, headers=headers).status_code == 201
+    lines = client.get('/export_expenses', headers=headers).get_data(as_text=True).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 2500
+    assert [r['timestamp'] for r in records] == sorted(r['timestamp'] for r in records)
+    assert len(client.get('/export_expenses?format=csv', headers=headers).get_data(as_text=True).splitlines()) == 1 + 2500
@@ -0,0 +1,95 @@
+# tests/test_meal_planner.py
+
+import numpy as np
+import pytest
+
+from app.ml_engine.meal_planner import SARAPAN_PERCENT, SARAPAN_TOP_N
+from app.ml_engine.plan_optimizer import TAG_UTAMA_SARAPAN, TAG_UTAMA_MAKAN
+
+TAGS = ['ayam', 'sapi', 'ikan', 'pedas', 'manis', 'goreng', 'bakar', 'kuah', 'nasi', 'mie', 'soto', 'bubur', 'sayur', 'telur']
+ALLERGENS = ['seafood', 'kacang', 'susu', 'gluten']
+
+def random_profiles(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [dict(
+        target_kalori_harian=float(rng.integers(1200, 3200)),
+        preferensi=list(rng.choice(TAGS, size=rng.integers(0, 4), replace=False)),
+        alergi=list(rng.choice(ALLERGENS, size=rng.integers(0, 3), replace=False)),
+        budget_harian=float(rng.integers(8, 120) * 1000),
+        seed=int(rng.integers(1 << 31)),
+    ) for _ in range(count)]
+
+def taste_vectors(planner, profiles):
+    return planner.scorer.taste_matrix(planner.tfidf.transform([' '.join(p['preferensi']).lower() for p in profiles]))
+
+def menu_names(meal_plan):
+    return {meal: [(item['nama_restoran'], item['Nama']) for item in items] for meal, items in meal_plan.items()}
+
+@pytest.fixture(scope='module')
+def profiles():
+    return random_profiles(150)
+
+# Ranking sarapan batch (mask alergen per grup, skor & top-n per blok) = _recommend_food per user
+def test_rank_sarapan_batch_matches_per_user(planner, profiles):
+    taste_matrix = taste_vectors(planner, profiles)
+    batch = planner._rank_sarapan_batch(profiles, taste_matrix)
+    kandidat = planner._kandidat_slot('sarapan', [])
+    for profile, taste, rekomendasi in zip(profiles, taste_matrix, batch):
+        expected = planner._recommend_food(kandidat, profile['target_kalori_harian'] * SARAPAN_PERCENT, profile['preferensi'], profile['alergi'],
+                                           profile['budget_harian'] * SARAPAN_PERCENT, top_n=SARAPAN_TOP_N, taste=taste)
+        assert list(rekomendasi.index) == list(expected.index)
+        np.testing.assert_allclose(rekomendasi['skor_akhir'], expected['skor_akhir'], rtol=1e-12)
+
+# Rencana batch = create_daily_meal_plan per profil dengan vektor rasa & seed yang sama,
+# juga saat chunk lebih kecil dari jumlah profil dan sebagian profil memakai mode 'optimal'
+def test_batch_plans_match_single_plans(planner, profiles):
+    taste_matrix = taste_vectors(planner, profiles)
+    plans = planner.create_daily_meal_plans_batch(profiles, chunk_size=64)
+    assert len(plans) == len(profiles)
+    for profile, taste, plan in zip(profiles, taste_matrix, plans):
+        expected = planner.create_daily_meal_plan(profile['target_kalori_harian'], profile['preferensi'], profile['alergi'], profile['budget_harian'],
+                                                  taste=taste, seed=profile['seed'])
+        assert menu_names(plan) == menu_names(expected)
+
+def test_batch_routes_optimal_profiles_per_user(planner, profiles):
+    mixed = [dict(profile, mode='optimal') if i % 3 == 0 else profile for i, profile in enumerate(profiles[:30])]
+    ranked = planner._rank_sarapan_batch(mixed, taste_vectors(planner, mixed))
+    assert all((rekomendasi is None) == (profile.get('mode') == 'optimal') for profile, rekomendasi in zip(mixed, ranked))
+    assert len(planner.create_daily_meal_plans_batch(mixed)) == len(mixed)
+
+# Tag utama yang dicatat _plan_day untuk satu hari (sarapan & makan siang, tag utama pertama per item)
+def recorded_main_tags(meal_plan):
+    tags = set()
+    for meal, tag_utama in (('sarapan', TAG_UTAMA_SARAPAN), ('makan_siang', TAG_UTAMA_MAKAN)):
+        for item in meal_plan.get(meal, []):
+            tags.update([tag for tag in item['tags'] if tag in tag_utama][:1])
+    return tags
+
+def plan_cost(meal_plan):
+    return sum(item['Harga'] for items in meal_plan.values() for item in items)
+
+@pytest.mark.parametrize('profile', random_profiles(6, seed=5))
+def test_weekly_plan_variety(planner, profile):
+    week = planner.create_weekly_meal_plan(profile['target_kalori_harian'], profile['preferensi'], profile['alergi'], budget_harian=max(profile['budget_harian'], 40000), seed=profile['seed'])
+    assert len(week) == 7
+    # Menu utama (anchor) tiap slot tidak berulang selama seminggu
+    anchors = [items[0]['Nama'] for day in week for items in day.values() if items]
+    assert len(anchors) == len(set(anchors))
+    # Tag utama hari sebelumnya tidak muncul di menu utama hari berikutnya
+    for kemarin, hari_ini in zip(week, week[1:]):
+        tags_kemarin = recorded_main_tags(kemarin)
+        for items in hari_ini.values():
+            if items:
+                assert not tags_kemarin & set(items[0]['tags'])
+
+# Budget mingguan dibagi rata ke sisa hari: sisa hari yang hemat terbawa ke hari berikutnya
+@pytest.mark.parametrize('profile', random_profiles(6, seed=6))
+def test_weekly_budget_carry_over(planner, profile):
+    budget_mingguan = profile['budget_harian'] * 7
+    week = planner.create_weekly_meal_plan(profile['target_kalori_harian'], profile['preferensi'], profile['alergi'], n_hari=7, budget_mingguan=budget_mingguan, seed=profile['seed'])
+    sisa = budget_mingguan
+    for hari, meal_plan in enumerate(week):
+        budget_hari = max(sisa, 0) / (7 - hari)
+        assert plan_cost(meal_plan) <= budget_hari + 1e-6
+        sisa -= plan_cost(meal_plan)
+    assert sisa >= -1e-6
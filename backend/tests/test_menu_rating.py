@@ -0,0 +1,80 @@
+# tests/test_menu_rating.py
+
+import numpy as np
+import pytest
+
+from app.ml_engine.menu_rating import MenuRatingVector, RATING_MIN, RATING_MAX
+
+def make_vector(planner, totals=None, prior_weight=5.0):
+    return MenuRatingVector(planner.df, planner.candidate_index, prior_weight=prior_weight, totals=totals)
+
+# Rata-rata Bayesian per baris dihitung langsung dari df (tanpa kode nama / array per menu)
+def expected_scores(planner, vector, totals):
+    merged = {}
+    for name, (count, total) in totals.items():
+        entry = merged.setdefault(name.lower(), [0.0, 0.0])
+        entry[0] += count
+        entry[1] += total
+    names = planner.df['Nama'].str.lower()
+    count = names.map(lambda n: merged.get(n, (0.0, 0.0))[0]).to_numpy(dtype=np.float64)
+    total = names.map(lambda n: merged.get(n, (0.0, 0.0))[1]).to_numpy(dtype=np.float64)
+    mean = (vector.prior_weight * vector.prior + total) / (vector.prior_weight + count)
+    return (np.clip(mean, RATING_MIN, RATING_MAX) - RATING_MIN) / (RATING_MAX - RATING_MIN)
+
+def random_reviews(planner, count, seed):
+    rng = np.random.default_rng(seed)
+    names = planner.df['Nama'].unique()
+    for _ in range(count):
+        name = str(rng.choice(names))
+        yield (name.upper() if rng.random() < 0.2 else name), int(rng.integers(1, 6))
+
+def test_scores_match_bayesian_mean(planner):
+    totals = {}
+    for name, rating in random_reviews(planner, 3000, seed=0):
+        count, total = totals.get(name, (0, 0.0))
+        totals[name] = (count + 1, total + rating)
+    totals['Menu yang tidak ada di dataset'] = (3, 15.0)
+    vector = make_vector(planner, totals)
+    np.testing.assert_allclose(vector.scores, expected_scores(planner, vector, totals), rtol=1e-12)
+    assert ((vector.scores >= 0) & (vector.scores <= 1)).all()
+    # Tanpa ulasan: skor = rating restoran (prior) ter-normalisasi
+    np.testing.assert_allclose(make_vector(planner).scores, (make_vector(planner).prior - RATING_MIN) / (RATING_MAX - RATING_MIN))
+
+# Update inkremental per ulasan (delta upsert_review, termasuk ulasan yang diubah) = memuat
+# ulang semua agregat dari DB
+def test_incremental_apply_matches_full_load(planner):
+    vector = make_vector(planner)
+    rng = np.random.default_rng(1)
+    reviews, versions = {}, [vector.version]
+    for name, rating in random_reviews(planner, 500, seed=1):
+        key = (int(rng.integers(3)), name.lower())
+        delta = (0, rating - reviews[key]) if key in reviews else (1, rating)
+        reviews[key] = rating
+        vector.apply(name, *delta)
+        versions.append(vector.version)
+    totals = {}
+    for (_, name), rating in reviews.items():
+        count, total = totals.get(name, (0, 0.0))
+        totals[name] = (count + 1, total + rating)
+    np.testing.assert_allclose(vector.scores, make_vector(planner, totals).scores, rtol=1e-12)
+    assert all(b > a for a, b in zip(versions, versions[1:]))
+
+# Versi (bagian kunci cache ranking) hanya naik bila skor berubah
+def test_version_changes_only_with_scores(planner):
+    name = str(planner.df['Nama'].iat[0])
+    vector = make_vector(planner)
+    assert vector.load({name: (2, 9.0)}) is True
+    version = vector.version
+    assert vector.load({name.upper(): (2, 9.0)}) is False
+    assert vector.version == version
+    assert vector.load({}) is True and vector.version == version + 1
+
+# Komponen rating ditambahkan ke skor rasa + kalori dengan bobot w_rating
+@pytest.mark.parametrize('w_rating', [0.0, 0.2, 1.0])
+def test_rating_component_in_score(planner, w_rating):
+    vector = make_vector(planner, {str(planner.df['Nama'].iat[i]): (10, 50.0) for i in range(0, 200, 7)})
+    rows = planner.candidate_index.slot_rows('maincourse')
+    user_vector = planner.tfidf.transform(['ayam pedas'])
+    base = planner.scorer.score(rows, user_vector, 700)
+    scores = planner.scorer.score(rows, user_vector, 700, rating=vector.scores, w_rating=w_rating)
+    np.testing.assert_allclose(scores, base + w_rating * vector.scores[rows], rtol=1e-12)
@@ -0,0 +1,58 @@
+# tests/test_plan_jobs.py
+
+import time
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from app.models import db, User, MealPlan, PlanJob
+from app.plan_jobs import PlanJobQueue, persist_meal_plan, save_job_status
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'jobs.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, nama='U1', email='u1@example.com', password_hash='x'))
+        db.session.commit()
+    return app
+
+def make_job(job_id, state='queued', created_at=None):
+    return {'id': job_id, 'state': state, 'user_id': 1, 'plan_date': '2026-01-05',
+            'created_at': created_at or time.time(), 'finished_at': None, 'error': None}
+
+# Worker lain (antrian lain tanpa job di memori) membaca status dari tabel PlanJob
+def test_status_is_visible_from_another_worker(app):
+    accepting, polling = PlanJobQueue(app, {}), PlanJobQueue(app, {})
+    job = make_job('a' * 32)
+    with app.app_context():
+        save_job_status(job, overwrite=False)
+        db.session.commit()
+        assert polling.get(job['id'])['state'] == 'queued'
+        plan = {'Sarapan': [], 'Makan Siang': [], 'Makan Malam': []}
+        persist_meal_plan(1, date(2026, 1, 5), plan, job=dict(job, state='done', finished_at=time.time()))
+        stored = polling.get(job['id'])
+        assert stored['state'] == 'done' and stored['plan_date'] == '2026-01-05' and stored['finished_at']
+        assert MealPlan.query.filter_by(user_id=1).count() == 1
+        assert accepting.get('b' * 32) is None
+
+# Callback job yang selesai sebelum submit sempat menulis 'queued' tidak tertimpa
+def test_queued_insert_does_not_overwrite_final_status(app):
+    job = make_job('c' * 32)
+    with app.app_context():
+        save_job_status(dict(job, state='failed', error='boom', finished_at=time.time()))
+        save_job_status(job, overwrite=False)
+        db.session.commit()
+        assert db.session.get(PlanJob, job['id']).state == 'failed'
+
+def test_unfinished_job_past_ttl_reported_failed(app):
+    queue = PlanJobQueue(app, {}, result_ttl=60)
+    job = make_job('d' * 32, created_at=time.time() - 120)
+    with app.app_context():
+        save_job_status(job, overwrite=False)
+        db.session.commit()
+        stored = queue.get(job['id'])
+        assert stored['state'] == 'failed' and stored['error']
@@ -0,0 +1,47 @@
+# tests/test_plan_optimizer.py
+
+import time
+
+import numpy as np
+
+from app.ml_engine.plan_optimizer import PlanOptimizer
+
+# Target kalori & budget besar: hampir setiap anchor makan siang/malam butuh varian pelengkap
+PROFILE = dict(target_kalori_harian=3000, preferensi=['ayam'], alergi=[], budget_harian=100000)
+
+def slow_best_combo(monkeypatch, planner, delay):
+    calls = []
+    best_combo = planner.complement_index.best_combo
+
+    def slow(*args, **kwargs):
+        calls.append(time.perf_counter())
+        time.sleep(delay)
+        return best_combo(*args, **kwargs)
+
+    monkeypatch.setattr(planner.complement_index, 'best_combo', slow)
+    monkeypatch.setattr(planner, 'max_pelengkap', 3)
+    return calls
+
+def test_optimizer_finds_plan_within_limit(planner):
+    solusi = PlanOptimizer(time_limit_ms=5000).solve(planner, **PROFILE)
+    assert solusi is not None and set(solusi) == {'sarapan', 'makan_siang', 'makan_malam'}
+    assert sum(opsi.harga for opsi in solusi.values() if opsi is not None) <= PROFILE['budget_harian']
+
+# Batas waktu juga berlaku di tengah penyusunan varian pelengkap, bukan hanya antar ekspansi beam
+def test_deadline_checked_while_building_options(monkeypatch, planner):
+    calls = slow_best_combo(monkeypatch, planner, delay=0.01)
+    optimizer = PlanOptimizer(top_k=8, time_limit_ms=30)
+    mulai = time.perf_counter()
+    assert optimizer.solve(planner, **PROFILE) is None
+    # Tanpa cek di dalam _slot_options seluruh varian makan siang (14 panggilan) tetap disusun dulu
+    assert len(calls) <= 30 / 10 + 2
+    assert time.perf_counter() - mulai < 0.03 + 0.05
+
+def test_optimal_mode_falls_back_to_greedy(monkeypatch, planner):
+    planner.optimizer = PlanOptimizer(time_limit_ms=30)
+    slow_best_combo(monkeypatch, planner, delay=0.01)
+    rng_seed = 7
+    optimal = planner.create_daily_meal_plan(**PROFILE, seed=rng_seed, mode='optimal')
+    greedy = planner.create_daily_meal_plan(**PROFILE, seed=rng_seed, mode='greedy')
+    assert optimal == greedy
+    planner.optimizer = PlanOptimizer()
@@ -0,0 +1,76 @@
+# tests/test_reviews.py
+
+import threading
+
+import pytest
+from flask import Flask
+
+from app.models import db, User, Review, MenuRating, upsert_review, dedupe_reviews, ensure_indexes, backfill_menu_ratings
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'reviews.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=i, nama=f'U{i}', email=f'u{i}@example.com', password_hash='x') for i in (1, 2)])
+        db.session.commit()
+    return app
+
+def aggregate(menu_name):
+    row = db.session.get(MenuRating, menu_name)
+    return (row.review_count, row.rating_sum) if row else None
+
+def test_upsert_review_updates_existing_row(app):
+    with app.app_context():
+        assert upsert_review(1, 'Nasi Goreng', 4.0, 'Enak') == (1, 4.0)
+        assert upsert_review(2, 'Nasi Goreng', 2.0, '') == (1, 2.0)
+        db.session.commit()
+        assert upsert_review(1, 'Nasi Goreng', 5.0, 'Enak sekali') == (0, 1.0)
+        db.session.commit()
+        assert Review.query.filter_by(menu_name='Nasi Goreng').count() == 2
+        assert Review.query.filter_by(user_id=1).one().review_text == 'Enak sekali'
+        assert aggregate('Nasi Goreng') == (2, 7.0)
+
+# Submit bersamaan (mis. dua worker / dua op write-behind) untuk user & menu yang sama
+def test_concurrent_first_reviews_count_once(app):
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def submit(rating):
+        with app.app_context():
+            try:
+                barrier.wait()
+                upsert_review(1, 'Soto Ayam', rating, '')
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(float(1 + i % 5),)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        assert not errors
+        review = Review.query.filter_by(user_id=1, menu_name='Soto Ayam').one()
+        assert aggregate('Soto Ayam') == (1, review.rating)
+
+# DB lama tanpa indeks unik: duplikat dibuang (sisakan yang terbaru), agregat dibangun ulang
+def test_dedupe_legacy_duplicates(app):
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ux_review_user_menu'))
+        db.session.execute(Review.__table__.insert(), [
+            {'user_id': 1, 'menu_name': 'Bakso', 'rating': 2.0}, {'user_id': 1, 'menu_name': 'Bakso', 'rating': 4.0},
+            {'user_id': 2, 'menu_name': 'Bakso', 'rating': 5.0},
+        ])
+        db.session.execute(MenuRating.__table__.insert().values(menu_name='Bakso', review_count=3, rating_sum=11.0))
+        db.session.commit()
+        dedupe_reviews()
+        ensure_indexes()
+        backfill_menu_ratings()
+        assert sorted(r.rating for r in Review.query.filter_by(menu_name='Bakso')) == [4.0, 5.0]
+        assert aggregate('Bakso') == (2, 9.0)
+        dedupe_reviews()
+        assert upsert_review(1, 'Bakso', 3.0, '') == (0, -1.0)
@@ -0,0 +1,115 @@
+# tests/test_scoring.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.ml_engine.scoring import ScoringEngine
+
+TAGS = ['ayam', 'sapi', 'ikan', 'pedas', 'manis', 'goreng', 'bakar', 'kuah', 'nasi', 'mie', 'sarapan', 'maincourse', 'sayur', 'telur']
+ALLERGENS = ['seafood', 'kacang', 'susu']
+
+# Dataset sintetis; sebagian baris disalin persis agar ada skor seri sungguhan.
+def make_dataset(n=400, n_duplicates=60, seed=0):
+    rng = np.random.default_rng(seed)
+    records = [{
+        'tags': list(rng.choice(TAGS, size=rng.integers(1, 5), replace=False)),
+        'Harga': int(rng.integers(3, 60)) * 1000,
+        'kalori': int(rng.integers(50, 900)),
+        **{f'alergen_{name}': bool(rng.random() < 0.15) for name in ALLERGENS},
+    } for _ in range(n)]
+    records += [dict(records[i]) for i in rng.integers(0, n, size=n_duplicates)]
+    df = pd.DataFrame(records).sample(frac=1, random_state=seed).reset_index(drop=True)
+    tfidf = TfidfVectorizer()
+    tfidf_matrix = tfidf.fit_transform(df['tags'].apply(' '.join))
+    return df, tfidf, tfidf_matrix
+
+# Implementasi DataFrame sebelum ScoringEngine (MealPlanner._recommend_food versi awal).
+# Hasil: (semua baris lolos filter + skor_akhir, top-n), None bila tidak ada yang lolos.
+def reference_recommend_food(df, tfidf, tfidf_matrix, dataframe, target_kalori, preferensi, alergi, budget, top_n=10, w_taste=0.6, w_calorie=0.4):
+    df_filtered = dataframe.copy()
+    for a in alergi:
+        alergen_col = f'alergen_{a.lower()}'
+        if alergen_col in df_filtered.columns:
+            df_filtered = df_filtered[~df_filtered[alergen_col]]
+    df_filtered = df_filtered[df_filtered['Harga'] <= budget]
+    if df_filtered.empty:
+        return None
+    user_vector = tfidf.transform([' '.join(preferensi).lower()])
+    taste_scores = cosine_similarity(user_vector, tfidf_matrix[df_filtered.index])
+    if target_kalori > 0:
+        calorie_scores = 1 / (1 + abs(df_filtered['kalori'] - target_kalori) / target_kalori)
+    else:
+        calorie_scores = pd.Series([0] * len(df_filtered), index=df_filtered.index)
+    df_filtered['skor_akhir'] = (w_taste * taste_scores.flatten()) + (w_calorie * calorie_scores.values)
+    return df_filtered, df_filtered.sort_values(by='skor_akhir', ascending=False).head(top_n)
+
+# Jalur ScoringEngine yang sama dengan MealPlanner._rank_food
+def engine_rank(scorer, tfidf, candidates, target_kalori, preferensi, alergi, budget, top_n, w_taste, w_calorie):
+    rows = scorer.filter_rows(candidates, alergi, budget)
+    scores = scorer.score(rows, tfidf.transform([' '.join(preferensi).lower()]), target_kalori, w_taste=w_taste, w_calorie=w_calorie)
+    return scorer.top_n(rows, scores, top_n)
+
+def random_profiles(df, count=300, seed=1):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        slot_tag = rng.choice(['sarapan', 'maincourse', None])
+        candidates = np.arange(len(df)) if slot_tag is None else np.flatnonzero(df['tags'].apply(lambda tags: slot_tag in tags).to_numpy())
+        yield dict(
+            candidates=candidates,
+            target_kalori=float(rng.choice([0, rng.integers(100, 900)])),
+            preferensi=list(rng.choice(TAGS + ['rendang', 'Pedas'], size=rng.integers(0, 4), replace=False)),
+            alergi=list(rng.choice(ALLERGENS + ['gluten'], size=rng.integers(0, 3), replace=False)),
+            budget=float(rng.choice([np.inf, rng.integers(5, 60) * 1000])),
+            top_n=int(rng.choice([1, 3, 5, 10, 50])),
+            w_taste=float(rng.choice([0.6, 0.5, 1.0])),
+            w_calorie=float(rng.choice([0.4, 0.2, 0.0])),
+        )
+
+@pytest.fixture(scope='module')
+def dataset():
+    df, tfidf, tfidf_matrix = make_dataset()
+    return df, tfidf, tfidf_matrix, ScoringEngine(df, tfidf_matrix)
+
+# Skor sama dengan implementasi lama (toleransi pembulatan float: dot product ter-normalisasi vs
+# cosine_similarity bisa beda ~1 ulp); himpunan top-n sama kecuali baris yang seri di batas potong.
+def test_ranking_matches_dataframe_implementation(dataset):
+    df, tfidf, tfidf_matrix, scorer = dataset
+    for profile in random_profiles(df):
+        candidates = profile.pop('candidates')
+        reference = reference_recommend_food(df, tfidf, tfidf_matrix, df.iloc[candidates], **profile)
+        rows, scores = engine_rank(scorer, tfidf, candidates, **profile)
+        if reference is None:
+            assert len(rows) == 0
+            continue
+        all_scores, expected = reference
+        assert len(rows) == len(expected)
+        np.testing.assert_allclose(scores, all_scores['skor_akhir'].loc[rows].to_numpy(), rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(np.sort(scores)[::-1], expected['skor_akhir'].to_numpy(), rtol=1e-12, atol=1e-15)
+        cutoff = scores.min()
+        left_out = all_scores['skor_akhir'].drop(index=rows)
+        assert (left_out <= cutoff + 1e-12).all()
+
+# Aturan urutan ScoringEngine.top_n: skor menurun, skor yang sama persis diurutkan menurut posisi
+# baris (naik). sort_values versi lama (quicksort, tidak stabil) tidak menjamin urutan seri.
+def test_top_n_orders_ties_by_row_position(dataset):
+    df, tfidf, tfidf_matrix, scorer = dataset
+    for profile in random_profiles(df, count=100, seed=2):
+        candidates = profile.pop('candidates')
+        rows, scores = engine_rank(scorer, tfidf, candidates, **profile)
+        assert (np.diff(scores) <= 0).all()
+        ties = np.diff(scores) == 0
+        assert (np.diff(rows)[ties] > 0).all()
+
+def test_top_n_tie_break_with_duplicate_rows():
+    scorer = ScoringEngine.__new__(ScoringEngine)
+    rows = np.array([9, 2, 7, 5, 4])
+    scores = np.array([0.5, 0.8, 0.5, 0.8, 0.1])
+    top_rows, top_scores = scorer.top_n(rows, scores, 3)
+    assert top_rows.tolist() == [2, 5, 7]
+    assert top_scores.tolist() == [0.8, 0.8, 0.5]
+    # Seri di batas potong: baris dengan posisi lebih kecil yang masuk
+    top_rows, _ = scorer.top_n(rows, scores, 1)
+    assert top_rows.tolist() == [2]
@@ -0,0 +1,48 @@
+# tests/test_snapshot.py
+
+import json
+import os
+
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.ml_engine.shared_arrays import export_arrays, prune_shared
+from app.ml_engine.snapshot import load_snapshot, save_snapshot, snapshot_key
+
+def write_dataset(path, names):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'nama_restoran': name} for name in names], f)
+    return str(path)
+
+def save(snapshot_dir, data_path):
+    df = pd.DataFrame({'tags': ['ayam goreng', 'sapi bakar']})
+    tfidf = TfidfVectorizer()
+    matrix = tfidf.fit_transform(df['tags'])
+    return save_snapshot(snapshot_dir, snapshot_key(data_path), data_path, df, tfidf, matrix, [])
+
+# Dua dataset (mis. staging & benchmark) di direktori snapshot yang sama tidak saling menghapus;
+# versi baru dataset yang sama menghapus versi lamanya.
+def test_prune_keeps_other_datasets(tmp_path):
+    snapshot_dir = str(tmp_path / 'snapshots')
+    prod = write_dataset(tmp_path / 'prod.json', ['A'])
+    bench = write_dataset(tmp_path / 'bench.json', ['A'])
+    prod_key, bench_key = save(snapshot_dir, prod), save(snapshot_dir, bench)
+    assert prod_key != bench_key
+    assert sorted(os.listdir(snapshot_dir)) == sorted([prod_key, bench_key])
+
+    write_dataset(tmp_path / 'prod.json', ['A', 'B'])
+    new_prod_key = save(snapshot_dir, prod)
+    assert sorted(os.listdir(snapshot_dir)) == sorted([new_prod_key, bench_key])
+    assert load_snapshot(snapshot_dir, bench_key) is not None
+
+def test_prune_shared_keeps_other_datasets(tmp_path):
+    shared_dir = str(tmp_path / 'shared')
+    prod = write_dataset(tmp_path / 'prod.json', ['A'])
+    bench = write_dataset(tmp_path / 'bench.json', ['B'])
+    old_prod_key, bench_key = snapshot_key(prod), snapshot_key(bench)
+    write_dataset(tmp_path / 'prod.json', ['A', 'B'])
+    prod_key = snapshot_key(prod)
+    for key in (old_prod_key, bench_key, prod_key):
+        export_arrays(os.path.join(shared_dir, key), {})
+    prune_shared(shared_dir, keep=prod_key)
+    assert sorted(os.listdir(shared_dir)) == sorted([prod_key, bench_key])
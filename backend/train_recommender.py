@@ -0,0 +1,35 @@
+# train_recommender.py
+#
+# Latih model rekomendasi item-item secara offline (mis. lewat cron) dari tabel review + fitur TF-IDF.
+# Worker yang berjalan memuat versi baru otomatis pada refresh berikutnya (RATING_REFRESH_INTERVAL):
+#   python train_recommender.py [--model-dir data/.recommender] [--k 20] [--alpha 0.7] [--shrinkage 10]
+
+import argparse
+import os
+
+# Proses training tidak butuh thread refresh milik app
+os.environ.setdefault('RATING_REFRESH_INTERVAL', '0')
+
+from app import create_app
+from app.models import db, Review
+from app.ml_engine.item_recommender import ItemRecommender
+
+def main():
+    parser = argparse.ArgumentParser(description="Latih model rekomendasi item-item dari ulasan pengguna.")
+    parser.add_argument('--model-dir', help="Default: RECOMMENDER_MODEL_DIR aplikasi")
+    parser.add_argument('--k', type=int, default=20, help="Jumlah tetangga per menu")
+    parser.add_argument('--alpha', type=float, default=0.7, help="Porsi kemiripan kolaboratif (sisanya konten TF-IDF)")
+    parser.add_argument('--shrinkage', type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = create_app()
+    model_dir = args.model_dir or app.config['RECOMMENDER_MODEL_DIR']
+    engine = app.config['MEAL_PLANNER_ENGINE']
+    with app.app_context():
+        reviews = db.session.query(Review.user_id, Review.menu_name, Review.rating).all()
+    model = ItemRecommender.train(engine.df, engine.tfidf_matrix, reviews, k=args.k, alpha=args.alpha, shrinkage=args.shrinkage)
+    version = model.save(model_dir)
+    print(f"Model '{version}' ({model.meta['n_reviews']} ulasan, {len(model.names)} menu) ditulis ke {model_dir}")
+
+if __name__ == '__main__':
+    main()